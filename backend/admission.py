@@ -0,0 +1,268 @@
+"""
+Contrôle d'admission et délestage de charge
+
+- Limite de concurrence par préfixe de route avec file d'attente bornée
+- Rejet rapide en 503 + Retry-After si la file est pleine ou l'attente trop longue
+- Limitation de débit par user_id (seau à jetons) avec rejet 429, l'id étant
+  lu dans le chemin (/analyze/12) ou dans le corps JSON (POST /data)
+
+Tout est en mémoire dans le processus : un middleware ASGI, sans verrou
+ni thread, dont le coût est négligeable pour les routes non limitées.
+"""
+
+import asyncio
+import json
+import math
+import re
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Optional, Tuple
+
+from backend import config
+
+# /analyze/12, /data/12, /recommend/12 ...
+USER_PATH_RE = re.compile(r"^/(?:analyze|data|recommend)/(\d+)")
+
+# Routes dont l'utilisateur est dans le corps JSON ({"user_id": 12, ...})
+USER_BODY_ROUTES = {("POST", "/data")}
+# Au-delà, le corps n'est pas analysé (la validation de la route le rejettera)
+MAX_USER_BODY = 64 * 1024
+
+
+class RouteGate:
+    """Sémaphore asyncio avec file d'attente bornée et statistiques"""
+
+    def __init__(self, prefix: str, concurrency: int, queue_size: int):
+        self.prefix = prefix
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.active = 0
+        self.waiters = deque()
+        self.stats = {
+            "admitted": 0,
+            "queued": 0,
+            "rejected_queue_full": 0,
+            "rejected_timeout": 0,
+            "max_waiting": 0,
+        }
+
+    async def acquire(self, timeout: float) -> bool:
+        if self.active < self.concurrency and not self.waiters:
+            self.active += 1
+            self.stats["admitted"] += 1
+            return True
+
+        if len(self.waiters) >= self.queue_size:
+            self.stats["rejected_queue_full"] += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        self.stats["queued"] += 1
+        self.stats["max_waiting"] = max(self.stats["max_waiting"], len(self.waiters))
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            # Le créneau a pu être transmis juste avant l'expiration
+            if not (waiter.done() and not waiter.cancelled()):
+                self._discard(waiter)
+                self.stats["rejected_timeout"] += 1
+                return False
+        except asyncio.CancelledError:
+            # Client déconnecté : un créneau déjà transmis est rendu, sinon il serait perdu
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                self._discard(waiter)
+            raise
+        self.stats["admitted"] += 1
+        return True
+
+    def release(self) -> None:
+        # Transmettre directement le créneau au prochain en attente
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(True)
+                return
+        self.active -= 1
+
+    def _discard(self, waiter) -> None:
+        try:
+            self.waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def snapshot(self) -> Dict:
+        return {
+            "concurrency": self.concurrency,
+            "queue_size": self.queue_size,
+            "active": self.active,
+            "waiting": len(self.waiters),
+            **self.stats,
+        }
+
+
+class UserRateLimiter:
+    """Seau à jetons par user_id, au plus MAX_TRACKED_USERS seaux (éviction des moins récents)"""
+
+    MAX_TRACKED_USERS = 10000
+
+    def __init__(self, rate_per_min: float, burst: int, max_tracked: int = MAX_TRACKED_USERS):
+        self.rate = rate_per_min / 60.0
+        self.burst = burst
+        self.max_tracked = max_tracked
+        self.buckets: "OrderedDict[int, Tuple[float, float]]" = OrderedDict()
+        self.rejected = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def check(self, user_id: int) -> Optional[float]:
+        """Retourne None si la requête est acceptée, sinon le délai (s) avant un nouveau jeton"""
+        now = time.monotonic()
+        tokens, last = self.buckets.get(user_id, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        if tokens < 1:
+            self._store(user_id, tokens, now)
+            self.rejected += 1
+            return (1 - tokens) / self.rate
+        self._store(user_id, tokens - 1, now)
+        return None
+
+    def _store(self, user_id: int, tokens: float, now: float) -> None:
+        # Le seau oublié est celui de l'utilisateur inactif depuis le plus longtemps,
+        # le plus souvent déjà plein : il repartira d'une rafale complète
+        self.buckets[user_id] = (tokens, now)
+        self.buckets.move_to_end(user_id)
+        while len(self.buckets) > self.max_tracked:
+            self.buckets.popitem(last=False)
+
+
+class AdmissionController:
+    def __init__(self, route_limits: Dict[str, Tuple[int, int]], queue_timeout: float,
+                 rate_per_min: float, burst: int):
+        # Préfixes les plus longs en premier
+        self.gates = [
+            RouteGate(prefix, concurrency, queue_size)
+            for prefix, (concurrency, queue_size) in sorted(
+                route_limits.items(), key=lambda item: -len(item[0])
+            )
+        ]
+        self.queue_timeout = queue_timeout
+        self.rate_limiter = UserRateLimiter(rate_per_min, burst)
+
+    @classmethod
+    def from_config(cls) -> "AdmissionController":
+        return cls(config.ROUTE_LIMITS, config.QUEUE_TIMEOUT_S,
+                   config.USER_RATE_PER_MIN, config.USER_RATE_BURST)
+
+    def gate_for(self, path: str) -> Optional[RouteGate]:
+        for gate in self.gates:
+            if path == gate.prefix or path.startswith(gate.prefix + "/"):
+                return gate
+        return None
+
+    def stats(self) -> Dict:
+        return {
+            "routes": {gate.prefix: gate.snapshot() for gate in self.gates},
+            "rate_limited": self.rate_limiter.rejected,
+            "tracked_users": len(self.rate_limiter.buckets),
+        }
+
+
+controller = AdmissionController.from_config()
+
+
+class AdmissionMiddleware:
+    """Middleware ASGI appliquant le contrôle d'admission"""
+
+    def __init__(self, app, controller: AdmissionController = controller):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        limiter = self.controller.rate_limiter
+        if limiter.enabled:
+            user_id = None
+            match = USER_PATH_RE.match(path)
+            if match:
+                user_id = int(match.group(1))
+            elif (scope["method"], path) in USER_BODY_ROUTES:
+                user_id, receive = await _read_body_user_id(receive)
+            if user_id is not None:
+                retry_after = limiter.check(user_id)
+                if retry_after is not None:
+                    await _reject(send, 429, "Trop de requêtes pour cet utilisateur", retry_after)
+                    return
+
+        gate = self.controller.gate_for(path)
+        if gate is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not await gate.acquire(self.controller.queue_timeout):
+            await _reject(send, 503, "Serveur surchargé, réessayez plus tard",
+                          self.controller.queue_timeout)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release()
+
+
+async def _read_body_user_id(receive):
+    """
+    Lit le corps de la requête pour en extraire "user_id"
+    Retourne (user_id ou None, receive) : le receive retourné rejoue les
+    messages déjà lus avant de reprendre la lecture, l'application reçoit le corps intact
+    """
+    messages, size = [], 0
+    while True:
+        message = await receive()
+        messages.append(message)
+        if message["type"] != "http.request":
+            break
+        size += len(message.get("body", b""))
+        if not message.get("more_body", False) or size > MAX_USER_BODY:
+            break
+
+    user_id = None
+    complete = messages[-1]["type"] == "http.request" and not messages[-1].get("more_body", False)
+    if complete and size <= MAX_USER_BODY:
+        try:
+            body = json.loads(b"".join(m.get("body", b"") for m in messages))
+        except ValueError:
+            body = None
+        if isinstance(body, dict) and isinstance(body.get("user_id"), int) \
+                and not isinstance(body["user_id"], bool):
+            user_id = body["user_id"]
+
+    pending = deque(messages)
+
+    async def replay_receive():
+        if pending:
+            return pending.popleft()
+        return await receive()
+
+    return user_id, replay_receive
+
+
+async def _reject(send, status: int, detail: str, retry_after: float) -> None:
+    body = json.dumps({"detail": detail}).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
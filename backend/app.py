@@ -1,17 +1,45 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from backend import capture, config, retention, feature_store, precompute
 from backend.database import init_db
-from backend.routers import users, data, analysis,recommend
+from backend.writer import stop_writers
+from backend.ml.inference import shutdown_executor
+from backend.admission import AdmissionMiddleware
+from backend.routers import users, data, analysis,recommend, admin, events
 
 # Initialiser la base de données
 init_db()
 
+@asynccontextmanager
+async def lifespan(app):
+    # Tâches de fond
+    tasks = []
+    # Vecteurs de features absents ou d'une ancienne version de la normalisation
+    tasks.append(asyncio.create_task(asyncio.to_thread(feature_store.run_backfill)))
+    if config.COMPACTION_INTERVAL_S > 0:
+        tasks.append(asyncio.create_task(retention.run_periodic_compaction()))
+    if config.PRECOMPUTE_AT:
+        tasks.append(asyncio.create_task(precompute.run_scheduled()))
+    yield
+    for task in tasks:
+        task.cancel()
+    # Vider les files d'écriture avant l'arrêt
+    stop_writers()
+    shutdown_executor()
+    capture.stop()
+
 app = FastAPI(
     title="ElevAI API",
     description="API pour le suivi du bien-être avec IA",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Contrôle d'admission (ajouté avant CORS pour que les rejets portent les en-têtes CORS)
+app.add_middleware(AdmissionMiddleware)
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -21,11 +49,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Capture du trafic (optionnelle), ajoutée en dernier : durées mesurées au plus près du client
+if config.CAPTURE_LOG:
+    app.add_middleware(capture.CaptureMiddleware)
+
 # Routers
 app.include_router(users.router)
 app.include_router(data.router)
 app.include_router(analysis.router)
 app.include_router(recommend.router)
+app.include_router(admin.router)
+app.include_router(events.router)
 
 @app.get("/")
 def read_root():
@@ -0,0 +1,129 @@
+"""
+Benchmark de l'inférence : thread appelant vs pool de processus avec micro-batching
+
+Entraîne une forêt de la taille de production (100 arbres, profondeur 10)
+sur des données synthétiques, puis mesure le débit et la latence de
+prédictions unitaires à 1, 8 et 64 clients concurrents. Une sonde mesure
+en parallèle le retard d'un thread d'E/S (sleep de 1 ms) pour montrer la
+contention sur le GIL.
+
+Utilisation : python -m backend.benchmarks.inference --workers 4 --requests 2000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+
+
+def _train_model(path: str, seed: int) -> None:
+    rng = np.random.default_rng(seed)
+    X = rng.uniform(0, 1, size=(5000, 7))
+    weights = np.array([0.20, 0.15, 0.15, 0.10, 0.20, 0.15, 0.05])
+    y = np.clip(X @ weights * 100 + rng.normal(0, 3, size=len(X)), 0, 100)
+    model = RandomForestRegressor(n_estimators=100, max_depth=10, min_samples_split=5,
+                                  random_state=42, n_jobs=-1)
+    model.fit(X, y)
+    joblib.dump(model, path)
+
+
+class IOProbe(threading.Thread):
+    """Mesure le retard de réveil d'un thread qui dort 1 ms en boucle"""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.delays = []
+        self.running = True
+
+    def run(self):
+        while self.running:
+            started = time.perf_counter()
+            time.sleep(0.001)
+            self.delays.append(time.perf_counter() - started - 0.001)
+
+
+def run(predict, clients: int, requests: int, seed: int):
+    rng = np.random.default_rng(seed)
+    rows = rng.uniform(0, 1, size=(requests, 7))
+    latencies = []
+    lock = threading.Lock()
+    per_client = requests // clients
+
+    def client(index: int):
+        local = []
+        for row in rows[index * per_client:(index + 1) * per_client]:
+            started = time.perf_counter()
+            predict(row)
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+
+    probe = IOProbe()
+    probe.start()
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    probe.running = False
+    probe.join()
+
+    lat = np.array(latencies) * 1000
+    probe_delays = np.array(probe.delays or [0.0]) * 1000
+    return {
+        "throughput": len(latencies) / elapsed,
+        "p50": np.percentile(lat, 50),
+        "p99": np.percentile(lat, 99),
+        "probe_p99": np.percentile(probe_delays, 99),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=max(1, min(4, os.cpu_count() or 1)))
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--clients", default="1,8,64")
+    parser.add_argument("--window-ms", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    model_path = os.path.join(tempfile.mkdtemp(prefix="elevai_bench_"), "model.pkl")
+    print("Entraînement d'une forêt de référence...")
+    _train_model(model_path, args.seed)
+    # Avant l'import du modèle : les processus du pool héritent de la variable
+    os.environ["ELEVAI_MODEL_PATH"] = model_path
+
+    from backend.ml.inference import InferenceExecutor
+    from backend.ml.model import score_features
+
+    executor = InferenceExecutor(args.workers, args.window_ms, max_batch=64)
+    executor.start()
+    executor.predict(np.zeros(7))  # préchauffage des processus
+
+    modes = {
+        "thread": lambda row: float(score_features(row.reshape(1, -1))[0]),
+        f"pool x{args.workers}": executor.predict,
+    }
+    print(f"\n{'mode':<12}{'clients':>8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'sonde E/S p99 ms':>18}")
+    for clients in (int(c) for c in args.clients.split(",")):
+        for name, predict in modes.items():
+            result = run(predict, clients, args.requests, args.seed)
+            print(f"{name:<12}{clients:>8}{result['throughput']:>10.0f}{result['p50']:>10.2f}"
+                  f"{result['p99']:>10.2f}{result['probe_p99']:>18.2f}")
+
+    stats = executor.snapshot()
+    print(f"\nPool: {stats['requests']} prédictions en {stats['batches']} lots "
+          f"(taille moyenne {stats['mean_batch_size']}), histogramme {stats['batch_sizes']}")
+    executor.shutdown()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
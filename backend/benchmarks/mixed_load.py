@@ -0,0 +1,163 @@
+"""
+Benchmark de charge mixte lecture/écriture sur SQLite
+
+Compare deux modes sur une base temporaire :
+- "legacy" : chaque requête ouvre sa propre connexion lecture/écriture et
+  commit elle-même (comportement historique, journal rollback)
+- "writer" : écritures via l'écrivain unique (group commit, WAL), lectures
+  sur des connexions en lecture seule (mode=ro)
+
+Utilisation : python -m backend.benchmarks.mixed_load --threads 16 --ops 300
+"""
+
+import argparse
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+
+from backend.database import SQLiteStorage, init_db
+from backend.models import DailyDataCreate
+from backend.routers.data import insert_daily_data
+from backend.writer import WriteQueue
+
+READ_QUERY = """
+    SELECT date, sommeil_h, pas, sport_min, calories, humeur_0_5, stress_0_5, fc_repos
+    FROM daily_data WHERE user_id = ? ORDER BY date DESC LIMIT 30
+"""
+
+
+def _setup(path: Path, n_users: int, wal: bool) -> SQLiteStorage:
+    storage = SQLiteStorage(path)
+    init_db(storage)
+    conn = storage.connect()
+    if not wal:
+        conn.execute("PRAGMA journal_mode=DELETE")
+    conn.cursor().executemany(
+        "INSERT INTO users (age, genre, taille_cm, poids_kg, objectif) VALUES (?, ?, ?, ?, ?)",
+        [(30, "M", 175.0, 70.0, None) for _ in range(n_users)],
+    )
+    conn.commit()
+    conn.close()
+    return storage
+
+
+def _random_entry(rng: random.Random, n_users: int) -> DailyDataCreate:
+    return DailyDataCreate(
+        user_id=rng.randint(1, n_users),
+        date=date(2025, 1, 1) + timedelta(days=rng.randint(0, 90)),
+        sommeil_h=round(rng.uniform(5, 9), 1),
+        pas=rng.randint(2000, 15000),
+        sport_min=rng.randint(0, 90),
+        calories=rng.randint(1500, 3000),
+        humeur_0_5=rng.randint(1, 5),
+        stress_0_5=rng.randint(1, 5),
+        fc_repos=rng.randint(50, 90),
+    )
+
+
+def run_mode(mode: str, threads: int, ops: int, write_ratio: float, n_users: int, seed: int):
+    tmp = tempfile.mkdtemp(prefix=f"elevai_bench_{mode}_")
+    storage = _setup(Path(tmp) / "bench.db", n_users, wal=(mode == "writer"))
+    writer = WriteQueue(storage.connect_writer, max_batch=64) if mode == "writer" else None
+
+    latencies = {"read": [], "write": []}
+    errors = {"locked": 0, "other": 0}
+    lock = threading.Lock()
+
+    def do_write(entry):
+        if writer is not None:
+            writer.execute(insert_daily_data, entry)
+            return
+        conn = storage.connect()
+        try:
+            insert_daily_data(conn.cursor(), entry)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def do_read(user_id):
+        conn = storage.connect_reader() if writer is not None else storage.connect()
+        try:
+            conn.execute(READ_QUERY, (user_id,)).fetchall()
+        finally:
+            conn.close()
+
+    def worker(worker_id: int):
+        rng = random.Random(seed + worker_id)
+        local = {"read": [], "write": []}
+        local_errors = {"locked": 0, "other": 0}
+        for _ in range(ops):
+            kind = "write" if rng.random() < write_ratio else "read"
+            started = time.perf_counter()
+            try:
+                if kind == "write":
+                    do_write(_random_entry(rng, n_users))
+                else:
+                    do_read(rng.randint(1, n_users))
+            except sqlite3.OperationalError as e:
+                local_errors["locked" if "locked" in str(e) else "other"] += 1
+                continue
+            except Exception:
+                local_errors["other"] += 1
+                continue
+            local[kind].append(time.perf_counter() - started)
+        with lock:
+            for key in latencies:
+                latencies[key].extend(local[key])
+            for key in errors:
+                errors[key] += local_errors[key]
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    if writer is not None:
+        writer.stop()
+
+    return {"elapsed": elapsed, "latencies": latencies, "errors": errors,
+            "writer": writer.snapshot() if writer is not None else None}
+
+
+def _percentiles(values):
+    if not values:
+        return "-"
+    p50, p95, p99 = np.percentile(np.array(values) * 1000, [50, 95, 99])
+    return f"p50={p50:7.2f}ms  p95={p95:7.2f}ms  p99={p99:7.2f}ms"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--ops", type=int, default=300, help="opérations par thread")
+    parser.add_argument("--write-ratio", type=float, default=0.3)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--modes", default="legacy,writer")
+    args = parser.parse_args(argv)
+
+    for mode in args.modes.split(","):
+        result = run_mode(mode, args.threads, args.ops, args.write_ratio, args.users, args.seed)
+        total = sum(len(v) for v in result["latencies"].values())
+        print(f"\n=== Mode {mode} ({args.threads} threads, {args.write_ratio:.0%} écritures)")
+        print(f"  Débit       : {total / result['elapsed']:8.1f} ops/s ({total} ops en {result['elapsed']:.2f}s)")
+        print(f"  Lectures    : {_percentiles(result['latencies']['read'])}")
+        print(f"  Écritures   : {_percentiles(result['latencies']['write'])}")
+        print(f"  Erreurs     : {result['errors']['locked']} 'database is locked', {result['errors']['other']} autres")
+        if result["writer"]:
+            writer = result["writer"]
+            print(f"  Group commit: {writer['ops']} opérations en {writer['commits']} commits "
+                  f"(lot max {writer['max_batch']})")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""
+Benchmark du rafraîchissement incrémental du modèle face à un réentraînement complet
+
+Pour chaque taille d'historique, une forêt de production est entraînée sur
+l'historique (séries synthétiques de backend.ml.train), puis un lot de
+journées nouvelles arrive :
+- "complet" : nouvelle forêt sur l'historique et les journées nouvelles
+- "incrémental" : REFRESH_TREES arbres ajustés sur les seules journées
+  nouvelles, autant d'anciens arbres retirés (backend.ml.train.refresh_forest)
+
+Les deux modèles sont évalués sur une part réservée des journées nouvelles.
+La durée du complet croît avec l'historique, celle de l'incrémental ne
+dépend que du lot de journées nouvelles.
+
+Utilisation : python -m backend.benchmarks.model_refresh --history 10000,50000,200000 --new 5000
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+from sklearn.metrics import mean_squared_error
+from sklearn.model_selection import train_test_split
+
+from backend.ml.model import RAW_COLUMNS, normalize_batch
+from backend.ml.train import REFRESH_HOLDOUT, REFRESH_TREES, build_forest, generate_user_series, refresh_forest
+
+N_DAYS = 50
+
+
+def _dataset(n_rows: int, seed: int):
+    cols = generate_user_series(max(1, n_rows // N_DAYS), N_DAYS, seed=seed)
+    raw = np.column_stack([cols[c] for c in RAW_COLUMNS]).astype(float)
+    return normalize_batch(raw)[:n_rows], cols["score"][:n_rows]
+
+
+def run_size(n_history: int, n_new: int, n_trees: int, seed: int):
+    X_history, y_history = _dataset(n_history, seed)
+    X_new, y_new = _dataset(n_new, seed + 1)
+    X_fit, X_holdout, y_fit, y_holdout = train_test_split(
+        X_new, y_new, test_size=REFRESH_HOLDOUT, random_state=42
+    )
+
+    model = build_forest()
+    model.fit(X_history, y_history)
+    previous_mse = mean_squared_error(y_holdout, model.predict(X_holdout))
+
+    started = time.perf_counter()
+    refresh_forest(model, X_fit, y_fit, n_trees)
+    refresh_s = time.perf_counter() - started
+    refresh_mse = mean_squared_error(y_holdout, model.predict(X_holdout))
+
+    started = time.perf_counter()
+    full = build_forest()
+    full.fit(np.vstack([X_history, X_fit]), np.concatenate([y_history, y_fit]))
+    full_s = time.perf_counter() - started
+    full_mse = mean_squared_error(y_holdout, full.predict(X_holdout))
+
+    return {"full_s": full_s, "refresh_s": refresh_s, "previous_mse": previous_mse,
+            "full_mse": full_mse, "refresh_mse": refresh_mse}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--history", default="10000,50000,200000", help="tailles d'historique (journées)")
+    parser.add_argument("--new", type=int, default=5000, help="journées nouvelles par rafraîchissement")
+    parser.add_argument("--trees", type=int, default=REFRESH_TREES, help="arbres remplacés")
+    parser.add_argument("--seed", type=int, default=76)
+    args = parser.parse_args(argv)
+
+    print(f"{args.new} journées nouvelles, {args.trees} arbres remplacés sur 100\n")
+    print(f"{'historique':>10}{'complet s':>11}{'incrém. s':>11}{'gain':>8}"
+          f"{'MSE avant':>11}{'MSE complet':>13}{'MSE incrém.':>13}")
+    for n_history in (int(n) for n in args.history.split(",")):
+        result = run_size(n_history, args.new, args.trees, args.seed)
+        print(f"{n_history:>10}{result['full_s']:>11.2f}{result['refresh_s']:>11.2f}"
+              f"{result['full_s'] / result['refresh_s']:>7.1f}x"
+              f"{result['previous_mse']:>11.2f}{result['full_mse']:>13.2f}{result['refresh_mse']:>13.2f}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,251 @@
+"""
+Rejeu d'un trafic capturé (backend/capture.py) contre une instance locale
+
+Les requêtes du journal sont réémises dans leur ordre et à leur rythme
+d'origine, ou accéléré (--speed 10 : dix fois plus vite, --speed 0 : aussi
+vite que possible), par au plus --concurrency requêtes simultanées. Le
+rapport donne, par route, les latences rejouées (p50/p95/p99), les erreurs,
+les nouvelles tentatives et la latence capturée à l'origine.
+
+Les chemins et corps référencent des utilisateurs : rejouer contre une copie
+de la base d'origine, ou remapper les ids sur une base de test avec
+--remap-users N (ex. remplie par python -m backend.ml.train --synthetic-users N --to-db).
+
+Utilisation :
+    python -m backend.benchmarks.replay backend/logs/capture.log --speed 10 --concurrency 16
+    python -m backend.benchmarks.replay capture.log.1 capture.log --output avant.json
+"""
+
+import argparse
+import http.client
+import json
+import re
+import select
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from backend.admission import USER_PATH_RE
+
+
+def load_capture(paths: List[str]) -> List[Dict]:
+    """Entrées des journaux (fichiers rotatifs compris), triées par heure d'arrivée"""
+    entries = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    entries.append(json.loads(line))
+    entries.sort(key=lambda entry: entry["t"])
+    return entries
+
+
+def remap_users(entry: Dict, n_users: int) -> Dict:
+    """Ramène les ids d'utilisateurs du chemin et du corps dans 1..n_users"""
+    def remap(user_id: int) -> int:
+        return (user_id - 1) % n_users + 1
+
+    entry = dict(entry)
+    if USER_PATH_RE.match(entry["p"]):
+        entry["p"] = re.sub(r"^(/\w+/)(\d+)", lambda m: f"{m.group(1)}{remap(int(m.group(2)))}",
+                            entry["p"], count=1)
+    if entry.get("b") and '"user_id"' in entry["b"]:
+        try:
+            body = json.loads(entry["b"])
+            if isinstance(body, dict) and isinstance(body.get("user_id"), int):
+                body["user_id"] = remap(body["user_id"])
+                entry["b"] = json.dumps(body)
+        except ValueError:
+            pass
+    return entry
+
+
+class Replayer:
+    """
+    Connexions HTTP persistantes, une par thread
+
+    Une requête n'est réémise que si elle n'a pas pu partir : connexion
+    inactive fermée par le serveur (détectée avant l'envoi) ou échec à
+    l'envoi sur une connexion réutilisée. Une erreur après l'envoi n'est
+    jamais rejouée : un POST aurait pu être traité deux fois.
+    """
+
+    def __init__(self, base_url: str, timeout: float):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and conn.sock is not None and _dropped(conn.sock):
+            # Connexion inactive fermée par le serveur (délai de keep-alive)
+            self._discard()
+            conn = None
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return conn
+
+    def _discard(self) -> None:
+        self._local.conn.close()
+        self._local.conn = None
+
+    @property
+    def last_retries(self) -> int:
+        """Nouvelles tentatives de la dernière requête envoyée par ce thread"""
+        return getattr(self._local, "retries", 0)
+
+    def send(self, entry: Dict) -> int:
+        path = entry["p"] + (f"?{entry['q']}" if entry.get("q") else "")
+        body = entry.get("b")
+        headers = {"Content-Type": entry.get("c", "application/json")} if body is not None else {}
+        self._local.retries = 0
+        while True:
+            conn = self._connection()
+            reused = conn.sock is not None
+            try:
+                conn.request(entry["m"], path, body=body.encode("utf-8") if body is not None else None,
+                             headers=headers)
+            except (http.client.HTTPException, ConnectionError):
+                # Rien n'est parti : une seule nouvelle tentative, sur une connexion neuve
+                self._discard()
+                if not reused or self._local.retries:
+                    raise
+                self._local.retries += 1
+                continue
+            try:
+                response = conn.getresponse()
+                response.read()
+                return response.status
+            except (http.client.HTTPException, ConnectionError):
+                self._discard()
+                raise
+
+
+def _dropped(sock) -> bool:
+    """Une connexion inactive lisible a été fermée (ou a reçu des données inattendues)"""
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+    except (OSError, ValueError):
+        return True
+    return bool(readable)
+
+
+def replay(entries: List[Dict], base_url: str, speed: float, concurrency: int,
+           timeout: float = 30) -> List[Dict]:
+    """Réémet les entrées ; retourne une mesure par requête (route, statut, latence, retard)"""
+    replayer = Replayer(base_url, timeout)
+    slots = threading.Semaphore(concurrency)
+    results = []
+    lock = threading.Lock()
+
+    def run(entry: Dict, due: float):
+        started = time.perf_counter()
+        try:
+            status = replayer.send(entry)
+        except Exception:
+            status = 0
+        latency = (time.perf_counter() - started) * 1000
+        retries = replayer.last_retries
+        slots.release()
+        with lock:
+            results.append({"route": f"{entry['m']} {entry.get('r', entry['p'])}", "status": status,
+                            "ms": latency, "lag_ms": max(0.0, (started - due) * 1000),
+                            "captured_ms": entry.get("d"), "retries": retries})
+
+    first = entries[0]["t"] if entries else 0
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for entry in entries:
+            due = started + ((entry["t"] - first) / speed if speed > 0 else 0)
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            # Toutes les connexions occupées : la requête part en retard (mesuré par lag_ms)
+            slots.acquire()
+            pool.submit(run, entry, due)
+    return results
+
+
+def summarize(results: List[Dict]) -> Dict[str, Dict]:
+    by_route: Dict[str, List[Dict]] = {}
+    for result in results:
+        by_route.setdefault(result["route"], []).append(result)
+    summary = {}
+    for route, items in sorted(by_route.items(), key=lambda item: -len(item[1])):
+        latencies = np.array([item["ms"] for item in items])
+        captured = [item["captured_ms"] for item in items if item["captured_ms"] is not None]
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        summary[route] = {
+            "count": len(items),
+            "errors": sum(1 for item in items if item["status"] == 0 or item["status"] >= 500),
+            "client_errors": sum(1 for item in items if 400 <= item["status"] < 500),
+            "retries": sum(item.get("retries", 0) for item in items),
+            "p50_ms": round(float(p50), 2),
+            "p95_ms": round(float(p95), 2),
+            "p99_ms": round(float(p99), 2),
+            "captured_p50_ms": round(float(np.median(captured)), 2) if captured else None,
+        }
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("logs", nargs="+", help="journaux de capture (ELEVAI_CAPTURE_LOG)")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--speed", type=float, default=1.0, help="accélération (1 = rythme réel, 0 = au plus vite)")
+    parser.add_argument("--concurrency", type=int, default=16, help="requêtes simultanées au plus")
+    parser.add_argument("--limit", type=int, default=0, help="ne rejouer que les N premières requêtes")
+    parser.add_argument("--remap-users", type=int, default=0, metavar="N",
+                        help="ramener les ids d'utilisateurs dans 1..N")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--output", metavar="FICHIER.json", help="écrire le résumé par route")
+    args = parser.parse_args(argv)
+
+    entries = load_capture(args.logs)
+    skipped = sum(1 for entry in entries if entry.get("bt"))
+    entries = [entry for entry in entries if not entry.get("bt")]
+    if args.limit:
+        entries = entries[:args.limit]
+    if args.remap_users:
+        entries = [remap_users(entry, args.remap_users) for entry in entries]
+    if not entries:
+        print("Aucune requête à rejouer")
+        return 1
+
+    span = entries[-1]["t"] - entries[0]["t"]
+    print(f"{len(entries)} requêtes capturées sur {span:.1f}s ({skipped} ignorées, corps non gardé), "
+          f"vitesse {'max' if args.speed <= 0 else f'x{args.speed:g}'}, {args.concurrency} simultanées")
+    started = time.perf_counter()
+    results = replay(entries, args.base_url, args.speed, args.concurrency, args.timeout)
+    elapsed = time.perf_counter() - started
+
+    lags = np.array([result["lag_ms"] for result in results])
+    print(f"Rejoué en {elapsed:.1f}s ({len(results) / elapsed:.1f} req/s), "
+          f"retard au départ p95={np.percentile(lags, 95):.1f}ms\n")
+    summary = summarize(results)
+    print(f"{'route':<36}{'n':>7}{'err':>6}{'4xx':>6}{'retry':>7}"
+          f"{'p50':>9}{'p95':>9}{'p99':>9}{'capt. p50':>11}")
+    for route, stats in summary.items():
+        captured = f"{stats['captured_p50_ms']:.2f}" if stats["captured_p50_ms"] is not None else "-"
+        print(f"{route:<36}{stats['count']:>7}{stats['errors']:>6}{stats['client_errors']:>6}{stats['retries']:>7}"
+              f"{stats['p50_ms']:>9.2f}{stats['p95_ms']:>9.2f}{stats['p99_ms']:>9.2f}{captured:>11}")
+    retries = sum(stats["retries"] for stats in summary.values())
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"requests": len(results), "retries": retries, "seconds": round(elapsed, 2),
+                       "speed": args.speed, "concurrency": args.concurrency, "routes": summary}, f, indent=2)
+        print(f"\nRésumé écrit dans {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""
+Benchmark du débit d'ingestion selon le nombre de bases (DB_SHARDS)
+
+Pour chaque nombre de bases, crée des fichiers SQLite temporaires (un par
+base, chacun avec son écrivain unique) et envoie des journées depuis
+plusieurs threads clients, routées vers la base de l'utilisateur comme dans
+l'API (backend.database.shard_of).
+
+Deux modes :
+- "thread" : tous les écrivains dans le même processus, comme l'API avec un
+  seul worker. La partie Python des opérations reste sérialisée par le GIL,
+  seuls les commits et l'attente disque se recouvrent entre bases : le gain
+  n'apparaît que si les commits dominent (disque lent, petits lots).
+- "process" : un processus d'ingestion par base, avec son écrivain et ses
+  clients. Chaque fichier a son propre verrou d'écriture, le débit cumulé
+  mesure ce que le découpage permet quand le CPU n'est plus partagé
+  (à lancer sur une machine avec au moins autant de cœurs que de bases).
+
+Utilisation : python -m backend.benchmarks.sharded_ingest --shards 1,2,4 --mode process
+"""
+
+import argparse
+import multiprocessing
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from backend.benchmarks.mixed_load import _percentiles, _random_entry
+from backend.database import SQLiteStorage, init_db, shard_path
+from backend.routers.data import insert_daily_data
+from backend.writer import WriteQueue
+
+
+def _setup(base: Path, shards: int, n_users: int):
+    storages = []
+    for shard in range(shards):
+        storage = SQLiteStorage(shard_path(base, shard, shards))
+        init_db(storage)
+        conn = storage.connect()
+        # Mêmes identifiants que l'API : l'utilisateur id vit dans la base (id - 1) % shards
+        conn.cursor().executemany(
+            "INSERT INTO users (id, age, genre, taille_cm, poids_kg, objectif) VALUES (?, ?, ?, ?, ?, ?)",
+            [(user_id, 30, "M", 175.0, 70.0, None)
+             for user_id in range(shard + 1, n_users + 1, shards)],
+        )
+        conn.commit()
+        conn.close()
+        storages.append(storage)
+    return storages
+
+
+def run_shards(shards: int, threads: int, ops: int, n_users: int, max_batch: int, seed: int):
+    tmp = tempfile.mkdtemp(prefix=f"elevai_bench_shards{shards}_")
+    storages = _setup(Path(tmp) / "bench.db", shards, n_users)
+    writers = [WriteQueue(storage.connect_writer, max_batch, name=f"elevai-writer-{shard}")
+               for shard, storage in enumerate(storages)]
+
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def worker(worker_id: int):
+        rng = random.Random(seed + worker_id)
+        local, failed = [], 0
+        for _ in range(ops):
+            entry = _random_entry(rng, n_users)
+            started = time.perf_counter()
+            try:
+                writers[(entry.user_id - 1) % shards].execute(insert_daily_data, entry)
+            except Exception:
+                failed += 1
+                continue
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    for writer in writers:
+        writer.stop()
+
+    return {"elapsed": elapsed, "latencies": latencies, "errors": errors[0],
+            "writers": [writer.snapshot() for writer in writers]}
+
+
+def _ingest_shard(path: str, shard: int, shards: int, threads: int, ops: int, n_users: int,
+                  max_batch: int, seed: int, barrier):
+    """Processus d'ingestion d'une base : clients limités aux utilisateurs de cette base"""
+    writer = WriteQueue(SQLiteStorage(Path(path)).connect_writer, max_batch)
+    members = list(range(shard + 1, n_users + 1, shards))
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(worker_id: int):
+        rng = random.Random(seed + shard * 1000 + worker_id)
+        local = []
+        for _ in range(ops):
+            entry = _random_entry(rng, n_users)
+            entry.user_id = rng.choice(members)
+            started = time.perf_counter()
+            writer.execute(insert_daily_data, entry)
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+
+    # Départ simultané de toutes les bases, une fois les processus importés
+    barrier.wait()
+    started = time.time()
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    finished = time.time()
+    writer.stop()
+    return started, finished, latencies, writer.snapshot()
+
+
+def run_processes(shards: int, threads: int, ops: int, n_users: int, max_batch: int, seed: int):
+    tmp = tempfile.mkdtemp(prefix=f"elevai_bench_shards{shards}_")
+    storages = _setup(Path(tmp) / "bench.db", shards, n_users)
+    # Même charge totale quel que soit le nombre de bases
+    per_shard = max(1, threads // shards)
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as manager, \
+            ProcessPoolExecutor(max_workers=shards, mp_context=context) as pool:
+        barrier = manager.Barrier(shards)
+        futures = [pool.submit(_ingest_shard, str(storage.path), shard, shards, per_shard,
+                               ops * threads // (per_shard * shards), n_users, max_batch, seed, barrier)
+                   for shard, storage in enumerate(storages)]
+        results = [future.result() for future in futures]
+
+    # Fenêtre commune : du premier départ à la dernière fin (hors lancement des processus)
+    elapsed = max(r[1] for r in results) - min(r[0] for r in results)
+    return {"elapsed": elapsed, "latencies": [l for r in results for l in r[2]], "errors": 0,
+            "writers": [r[3] for r in results]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shards", default="1,2,4", help="nombres de bases à comparer")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--ops", type=int, default=300, help="journées par thread")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--max-batch", type=int, default=64, help="taille max d'un group commit")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mode", choices=["thread", "process"], default="thread")
+    args = parser.parse_args(argv)
+
+    run = run_shards if args.mode == "thread" else run_processes
+    baseline = None
+    for shards in (int(n) for n in args.shards.split(",")):
+        result = run(shards, args.threads, args.ops, args.users, args.max_batch, args.seed)
+        done = len(result["latencies"])
+        rate = done / result["elapsed"]
+        baseline = baseline or rate
+        commits = sum(writer["commits"] for writer in result["writers"])
+        per_shard = np.array([writer["ops"] for writer in result["writers"]])
+        print(f"\n=== {shards} base(s), mode {args.mode} ({args.threads} threads)")
+        print(f"  Débit       : {rate:8.1f} journées/s (x{rate / baseline:.2f}), "
+              f"{done} en {result['elapsed']:.2f}s")
+        print(f"  Latence     : {_percentiles(result['latencies'])}")
+        print(f"  Commits     : {commits} ({done / max(commits, 1):.1f} opérations par commit), "
+              f"répartition {per_shard.min()}-{per_shard.max()} opérations par base")
+        print(f"  Erreurs     : {result['errors']}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
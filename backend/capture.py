@@ -0,0 +1,142 @@
+"""
+Capture du trafic pour les tests de charge (ELEVAI_CAPTURE_LOG)
+
+Middleware ASGI optionnel : une part des requêtes (ELEVAI_CAPTURE_SAMPLE) est
+enregistrée avec ses métadonnées, une ligne JSON compacte par requête :
+
+    {"t":1735812000.123,"m":"POST","p":"/data","r":"/data","b":"{...}","c":"application/json","s":201,"d":12.4}
+
+- t : heure d'arrivée (epoch, s) ; m, p, q : méthode, chemin et query string
+- r : route (gabarit, ex. /analyze/{user_id}) pour regrouper les latences ;
+  pour une requête non routée (rejet de l'admission, 404), chemin dont
+  l'identifiant utilisateur est remplacé par {user_id}
+- b, c : corps et type de contenu (absents si vide) ; bt : corps trop long, non gardé
+- s : statut HTTP ; d : durée de traitement (ms)
+
+Les lignes passent par une file et sont écrites par un thread dédié, jamais
+par la boucle d'événements. Le journal contient les corps des requêtes
+(données de santé) : à n'activer que sur une instance dont on maîtrise les
+journaux. backend.benchmarks.replay rejoue ces journaux.
+"""
+
+import json
+import logging
+import os
+import queue
+import random
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict
+
+from backend import config
+from backend.admission import USER_PATH_RE
+
+_logger = None
+_listener = None
+stats = {"captured": 0, "bodies_truncated": 0}
+
+
+def _get_logger():
+    global _logger, _listener
+    if _logger is None:
+        os.makedirs(os.path.dirname(os.path.abspath(config.CAPTURE_LOG)), exist_ok=True)
+        handler = RotatingFileHandler(config.CAPTURE_LOG, maxBytes=config.CAPTURE_LOG_MAX_BYTES,
+                                      backupCount=config.CAPTURE_LOG_BACKUPS, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        records = queue.SimpleQueue()
+        _listener = QueueListener(records, handler)
+        _listener.start()
+        logger = logging.getLogger("elevai.capture")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        logger.addHandler(QueueHandler(records))
+        _logger = logger
+    return _logger
+
+
+def stop() -> None:
+    """Écrit les lignes en attente (arrêt de l'application)"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def route_template(path: str) -> str:
+    """Gabarit d'un chemin non routé : /analyze/12/history -> /analyze/{user_id}/history"""
+    match = USER_PATH_RE.match(path)
+    if match is None:
+        return path
+    return path[:match.start(1)] + "{user_id}" + path[match.end(1):]
+
+
+def record(entry: Dict) -> None:
+    _get_logger().info(json.dumps(entry, ensure_ascii=False, separators=(",", ":")))
+
+
+class CaptureMiddleware:
+    """Middleware ASGI : enregistre un échantillon des requêtes HTTP"""
+
+    def __init__(self, app, sample: float = None, max_body: int = None, exclude=None):
+        self.app = app
+        self.sample = config.CAPTURE_SAMPLE if sample is None else sample
+        self.max_body = config.CAPTURE_MAX_BODY if max_body is None else max_body
+        self.exclude = config.CAPTURE_EXCLUDE if exclude is None else tuple(exclude)
+
+    def _sampled(self, scope) -> bool:
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            return False
+        if scope["path"].startswith(self.exclude):
+            return False
+        return random.random() < self.sample
+
+    async def __call__(self, scope, receive, send):
+        if not self._sampled(scope):
+            await self.app(scope, receive, send)
+            return
+
+        arrived = time.time()
+        started = time.perf_counter()
+        body = bytearray()
+        truncated = False
+        status = 0
+
+        async def capture_receive():
+            nonlocal truncated
+            message = await receive()
+            if message["type"] == "http.request" and not truncated:
+                chunk = message.get("body", b"")
+                if len(body) + len(chunk) > self.max_body:
+                    truncated = True
+                    body.clear()
+                else:
+                    body.extend(chunk)
+            return message
+
+        async def capture_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, capture_receive, capture_send)
+        finally:
+            entry = {"t": round(arrived, 3), "m": scope["method"], "p": scope["path"]}
+            # Route résolue par le routeur FastAPI, absente si aucune route ne correspond
+            # ou si l'admission a rejeté la requête avant le routage
+            route = scope.get("route")
+            entry["r"] = route.path if route is not None else route_template(scope["path"])
+            if scope.get("query_string"):
+                entry["q"] = scope["query_string"].decode("latin-1")
+            if truncated:
+                entry["bt"] = True
+                stats["bodies_truncated"] += 1
+            elif body:
+                entry["b"] = body.decode("utf-8", errors="replace")
+                headers = dict(scope.get("headers") or ())
+                entry["c"] = headers.get(b"content-type", b"application/json").decode("latin-1")
+            entry["s"] = status
+            entry["d"] = round((time.perf_counter() - started) * 1000, 2)
+            stats["captured"] += 1
+            record(entry)
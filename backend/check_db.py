@@ -1,4 +1,4 @@
-"""Vérifier la base de données MySQL"""
+"""Vérifier la base de données (SQLite ou MySQL selon DB_BACKEND)"""
 import sys
 import os
 
@@ -6,33 +6,42 @@ backend_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(backend_dir)
 sys.path.insert(0, parent_dir)
 
-from backend.database import get_db, DB_CONFIG
+from backend.database import get_db, get_storage, DB_BACKEND, DB_CONFIG, SHARDS
 
-print(f"Configuration MySQL:")
-print(f"  Host: {DB_CONFIG['host']}")
-print(f"  Database: {DB_CONFIG['database']}")
-print(f"  User: {DB_CONFIG['user']}")
+print(f"Backend: {DB_BACKEND} ({', '.join(get_storage(shard).describe() for shard in SHARDS)})")
+if DB_BACKEND == "mysql":
+    print(f"Configuration MySQL:")
+    print(f"  Host: {DB_CONFIG['host']}")
+    print(f"  Database: {DB_CONFIG['database']}")
+    print(f"  User: {DB_CONFIG['user']}")
 
 try:
-    with get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT DATABASE()")
-        db_name = cursor.fetchone()["DATABASE()"]
-        print(f"\nBase de donnees connectee: {db_name}")
-        
-        cursor.execute("SHOW TABLES")
-        tables = [row[f"Tables_in_{db_name}"] for row in cursor.fetchall()]
-        print(f"Tables trouvees: {tables}")
-        
-        # Compter les utilisateurs
-        cursor.execute("SELECT COUNT(*) as count FROM users")
-        user_count = cursor.fetchone()["count"]
-        print(f"Nombre d'utilisateurs: {user_count}")
-        
-        print("\nOK: Base de donnees fonctionnelle!")
+    for shard in SHARDS:
+        with get_db(shard=shard) as conn:
+            cursor = conn.cursor()
+            if DB_BACKEND == "mysql":
+                cursor.execute("SELECT DATABASE() AS db_name")
+                db_name = cursor.fetchone()["db_name"]
+                print(f"\nBase de donnees connectee: {db_name}")
+                cursor.execute("""
+                    SELECT table_name AS name FROM information_schema.tables
+                    WHERE table_schema = DATABASE()
+                """)
+            else:
+                print(f"\nBase {shard}: {get_storage(shard).describe()}")
+                cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+            tables = [row["name"] for row in cursor.fetchall()]
+            print(f"Tables trouvees: {tables}")
+            
+            # Compter les utilisateurs
+            cursor.execute("SELECT COUNT(*) as count FROM users")
+            user_count = cursor.fetchone()["count"]
+            print(f"Nombre d'utilisateurs: {user_count}")
+    
+    print("\nOK: Base de donnees fonctionnelle!")
 except Exception as e:
     print(f"\nERREUR: {e}")
     print("\nVerifiez que:")
-    print("1. MySQL est demarre")
-    print("2. Les identifiants dans database.py sont corrects")
+    print("1. MySQL est demarre (si DB_BACKEND=mysql)")
+    print("2. Les variables DB_HOST, DB_USER, DB_PASSWORD, DB_NAME sont correctes")
     print("3. La base de donnees existe (executez init_database.py)")
@@ -0,0 +1,154 @@
+"""
+Configuration de l'API ElevAI
+Toutes les valeurs peuvent être surchargées par variables d'environnement
+"""
+
+import os
+from typing import Dict, Tuple
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.environ.get(name)
+    return float(value) if value not in (None, "") else default
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _parse_route_limits(raw: str) -> Dict[str, Tuple[int, int]]:
+    """
+    Format: "/analyze=4:16,/data=8:32"
+    (préfixe de route = requêtes simultanées : taille de la file d'attente)
+    """
+    limits = {}
+    for item in raw.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        prefix, _, spec = item.partition("=")
+        concurrency, _, queue = spec.partition(":")
+        limits[prefix.strip()] = (int(concurrency), int(queue or 0))
+    return limits
+
+
+# -------------------
+# ADMISSION CONTROL
+# -------------------
+
+# Limites de concurrence par préfixe de route (les autres routes, dont /health, ne sont pas limitées)
+ROUTE_LIMITS = _parse_route_limits(os.environ.get(
+    "ELEVAI_ROUTE_LIMITS",
+    "/analyze=4:16,/recommend=4:16,/data=8:32,/users=8:32"
+))
+
+# Attente maximale dans la file avant rejet 503 (secondes)
+QUEUE_TIMEOUT_S = _env_float("ELEVAI_QUEUE_TIMEOUT_S", 2.0)
+
+# Limitation de débit par user_id (requêtes par minute, 0 = désactivée) et rafale autorisée
+USER_RATE_PER_MIN = _env_float("ELEVAI_USER_RATE_PER_MIN", 120)
+USER_RATE_BURST = _env_int("ELEVAI_USER_RATE_BURST", 20)
+
+# -------------------
+# ÉCRITURES
+# -------------------
+
+# Nombre maximal d'opérations d'écriture regroupées dans un même commit
+WRITER_MAX_BATCH = _env_int("ELEVAI_WRITER_MAX_BATCH", 64)
+
+# -------------------
+# UTILISATEURS
+# -------------------
+
+# Ids d'utilisateurs gardés en cache d'existence, et durée de mémorisation d'un id inconnu
+# (secondes, 0 = jamais : avec plusieurs workers, un utilisateur créé par un autre serait refusé)
+USER_CACHE_SIZE = _env_int("ELEVAI_USER_CACHE_SIZE", 100000)
+USER_CACHE_MISSING_TTL_S = _env_float("ELEVAI_USER_CACHE_MISSING_TTL_S", 0)
+# Taille de page par défaut et maximale de GET /users
+USERS_PAGE_SIZE = _env_int("ELEVAI_USERS_PAGE_SIZE", 50)
+USERS_PAGE_MAX = _env_int("ELEVAI_USERS_PAGE_MAX", 500)
+
+# -------------------
+# INFÉRENCE
+# -------------------
+
+# Processus d'inférence (0 = prédiction dans le thread de la requête)
+INFERENCE_WORKERS = _env_int("ELEVAI_INFERENCE_WORKERS", 0)
+# Micro-batching : fenêtre de regroupement et taille maximale d'un lot
+INFERENCE_BATCH_WINDOW_MS = _env_float("ELEVAI_INFERENCE_BATCH_WINDOW_MS", 2.0)
+INFERENCE_MAX_BATCH = _env_int("ELEVAI_INFERENCE_MAX_BATCH", 64)
+
+# -------------------
+# SIMULATION (POST /analyze/{user_id}/simulate)
+# -------------------
+
+# Nombre maximal de scénarios d'une grille (produit des listes d'écarts)
+SIMULATION_MAX_SCENARIOS = _env_int("ELEVAI_SIMULATION_MAX_SCENARIOS", 2000)
+
+# -------------------
+# PRÉCALCUL DES ANALYSES
+# -------------------
+
+# Heure locale du précalcul quotidien ("HH:MM", vide = désactivé)
+PRECOMPUTE_AT = os.environ.get("ELEVAI_PRECOMPUTE_AT", "")
+# Processus de calcul (0 = dans le processus appelant) et utilisateurs par bloc
+PRECOMPUTE_WORKERS = _env_int("ELEVAI_PRECOMPUTE_WORKERS", 2)
+PRECOMPUTE_CHUNK = _env_int("ELEVAI_PRECOMPUTE_CHUNK", 500)
+
+# -------------------
+# ÉVÉNEMENTS (SSE)
+# -------------------
+
+# Messages en attente par connexion avant abandon des plus anciens
+EVENTS_QUEUE_SIZE = _env_int("ELEVAI_EVENTS_QUEUE_SIZE", 16)
+# Commentaire de maintien envoyé aux connexions inactives (secondes)
+EVENTS_KEEPALIVE_S = _env_float("ELEVAI_EVENTS_KEEPALIVE_S", 15)
+
+# -------------------
+# REQUÊTES LENTES
+# -------------------
+
+# Seuil de journalisation (ms, 0 = désactivé) et requêtes lentes gardées en mémoire pour /admin
+SLOW_QUERY_MS = _env_float("ELEVAI_SLOW_QUERY_MS", 100)
+SLOW_QUERY_RECENT = _env_int("ELEVAI_SLOW_QUERY_RECENT", 200)
+# Journal rotatif (JSON, une requête par ligne)
+SLOW_QUERY_LOG = os.environ.get(
+    "ELEVAI_SLOW_QUERY_LOG",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs", "slow_queries.log")
+)
+SLOW_QUERY_LOG_MAX_BYTES = _env_int("ELEVAI_SLOW_QUERY_LOG_MAX_BYTES", 5 * 1024 * 1024)
+SLOW_QUERY_LOG_BACKUPS = _env_int("ELEVAI_SLOW_QUERY_LOG_BACKUPS", 3)
+
+# -------------------
+# CAPTURE DU TRAFIC
+# -------------------
+
+# Journal des requêtes échantillonnées (vide = capture désactivée), rejoué par backend.benchmarks.replay
+CAPTURE_LOG = os.environ.get("ELEVAI_CAPTURE_LOG", "")
+# Part des requêtes capturées, corps gardés jusqu'à cette taille (octets)
+CAPTURE_SAMPLE = _env_float("ELEVAI_CAPTURE_SAMPLE", 0.1)
+CAPTURE_MAX_BODY = _env_int("ELEVAI_CAPTURE_MAX_BODY", 4096)
+# Préfixes jamais capturés (administration, flux SSE, documentation)
+CAPTURE_EXCLUDE = tuple(
+    prefix.strip() for prefix in
+    os.environ.get("ELEVAI_CAPTURE_EXCLUDE", "/admin,/events,/docs,/redoc,/openapi.json").split(",")
+    if prefix.strip()
+)
+CAPTURE_LOG_MAX_BYTES = _env_int("ELEVAI_CAPTURE_LOG_MAX_BYTES", 20 * 1024 * 1024)
+CAPTURE_LOG_BACKUPS = _env_int("ELEVAI_CAPTURE_LOG_BACKUPS", 5)
+
+# -------------------
+# RÉTENTION DES ANALYSES
+# -------------------
+
+# "daily" : garder le dernier résultat par utilisateur et par jour ; "last_n" : les N derniers
+ANALYSIS_RETENTION = os.environ.get("ELEVAI_ANALYSIS_RETENTION", "daily")
+ANALYSIS_KEEP_LAST = _env_int("ELEVAI_ANALYSIS_KEEP_LAST", 30)
+
+# Taille des lots de compaction (une transaction courte par lot) et période (0 = désactivée)
+COMPACTION_BATCH = _env_int("ELEVAI_COMPACTION_BATCH", 500)
+COMPACTION_INTERVAL_S = _env_float("ELEVAI_COMPACTION_INTERVAL_S", 3600)
+# Âge minimal (secondes) d'un résultat avant agrégation : laisse aux transactions en cours
+# le temps de valider leurs ids (MySQL attribue les ids à l'insertion, pas au commit)
+COMPACTION_LAG_S = _env_int("ELEVAI_COMPACTION_LAG_S", 60)
@@ -1,28 +1,557 @@
+"""
+Couche de stockage d'ElevAI
+
+Le backend est choisi par la variable d'environnement DB_BACKEND :
+- "sqlite" (défaut) : fichier unique DB_PATH
+- "mysql" : pool de connexions PyMySQL configuré par DB_CONFIG
+
+Les routes écrivent leurs requêtes avec des placeholders "?" ; le dialecte
+les traduit pour le backend actif et fournit les constructions non portables
+(upsert, clé primaire auto-incrémentée, index).
+
+Avec DB_SHARDS=N (SQLite uniquement), les données sont réparties par
+utilisateur sur N fichiers (elevai.shard0.db, ...) : l'utilisateur `id` vit
+dans la base (id - 1) % N, avec toutes ses tables (daily_data,
+analysis_results, risk_state, analysis_history, feature_store). Chaque base a
+sa propre connexion d'écriture (backend.writer). Les requêtes d'un
+utilisateur passent `user_id` à get_read_connection ; les requêtes
+transverses (liste des utilisateurs, entraînement, tâches de fond) parcourent
+toutes les bases (fan_out, SHARDS).
+"""
+
+import itertools
+import os
+import queue
 import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+from backend import slow_queries
+
+DB_BACKEND = os.environ.get("DB_BACKEND", "sqlite").lower()
+
+DB_PATH = Path(os.environ.get("DB_PATH", Path(__file__).parent / "elevai.db"))
+
+DB_CONFIG = {
+    "host": os.environ.get("DB_HOST", "localhost"),
+    "port": int(os.environ.get("DB_PORT", "3306")),
+    "user": os.environ.get("DB_USER", "root"),
+    "password": os.environ.get("DB_PASSWORD", ""),
+    "database": os.environ.get("DB_NAME", "elevai"),
+    "charset": "utf8mb4",
+}
+
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "10"))
+
+# Nombre de bases SQLite entre lesquelles les utilisateurs sont répartis
+DB_SHARDS = int(os.environ.get("DB_SHARDS", "1"))
+
+# Attente maximale sur un verrou SQLite avant "database is locked"
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+
+# -------------------
+# DIALECTES
+# -------------------
+
+class Dialect:
+    """Constructions SQL propres à chaque backend"""
+
+    name = "sqlite"
+    placeholder = "?"
+    autoincrement_pk = "INTEGER PRIMARY KEY AUTOINCREMENT"
+    key_text = "TEXT"
+    # Colonne TEXT dans un index (MySQL n'indexe qu'un préfixe)
+    text_index = "{}"
+    # Prend le verrou d'écriture dès le début du lot (pas d'escalade en cours de transaction)
+    begin = "BEGIN IMMEDIATE"
+
+    # Plan d'exécution : une ligne par étape, "SCAN t" sans index = parcours complet
+    explain = "EXPLAIN QUERY PLAN "
+
+    # Horodatage d'il y a N secondes, comparable à CURRENT_TIMESTAMP
+    seconds_ago = "datetime('now', '-{} seconds')"
+
+    def sql(self, query: str) -> str:
+        return query
+
+    def ping(self, raw) -> None:
+        """Vérifie une connexion gardée ouverte ; une connexion SQLite locale ne se perd pas"""
+
+    def plan_details(self, rows: List[Dict]) -> List[str]:
+        return [row["detail"] for row in rows]
+
+    def full_scans(self, plan: Sequence[str]) -> List[str]:
+        # "SCAN t", "SCAN TABLE t AS a" (SQLite < 3.36) ; pas les lignes constantes ni les
+        # sous-requêtes ("SCAN CONSTANT ROW", "SCAN (subquery-2)", "SCAN x" après "CO-ROUTINE x")
+        subqueries = {step.split()[-1] for step in plan if step.startswith(("CO-ROUTINE ", "MATERIALIZE "))}
+        scans = []
+        for step in plan:
+            if not step.startswith("SCAN ") or " USING " in step or step.startswith("SCAN CONSTANT ROW"):
+                continue
+            words = step.split()
+            name = words[2] if words[1] in ("TABLE", "SUBQUERY") else words[1]
+            if words[1] == "SUBQUERY" or name.startswith("(") or name in subqueries:
+                continue
+            scans.append(name)
+        return scans
+
+    def upsert(self, table: str, columns: Sequence[str], keys: Sequence[str],
+               update: Sequence[str] = None, timestamps: Sequence[str] = ()) -> str:
+        """
+        INSERT qui met à jour les colonnes `update` si la clé `keys` existe déjà
+        Les colonnes `timestamps` reçoivent CURRENT_TIMESTAMP dans les deux cas
+        """
+        update = [c for c in (update if update is not None else columns) if c not in keys]
+        insert_columns = ", ".join(list(columns) + list(timestamps))
+        values = ", ".join(["?"] * len(columns) + ["CURRENT_TIMESTAMP"] * len(timestamps))
+        assignments = ", ".join(
+            [f"{c} = excluded.{c}" for c in update] + [f"{c} = CURRENT_TIMESTAMP" for c in timestamps]
+        )
+        action = f"DO UPDATE SET {assignments}" if assignments else "DO NOTHING"
+        return (
+            f"INSERT INTO {table} ({insert_columns}) VALUES ({values}) "
+            f"ON CONFLICT({', '.join(keys)}) {action}"
+        )
+
+
+class MySQLDialect(Dialect):
+    name = "mysql"
+    placeholder = "%s"
+    autoincrement_pk = "INTEGER PRIMARY KEY AUTO_INCREMENT"
+    key_text = "VARCHAR(32)"
+    text_index = "{}(191)"
+    begin = "START TRANSACTION"
+    explain = "EXPLAIN "
+    seconds_ago = "(CURRENT_TIMESTAMP - INTERVAL {} SECOND)"
+
+    def ping(self, raw) -> None:
+        # Reconnexion si le serveur a fermé la connexion (wait_timeout, redémarrage)
+        raw.ping(reconnect=True)
+
+    def plan_details(self, rows: List[Dict]) -> List[str]:
+        return [f"{row['table']}: type={row['type']} key={row['key']} rows={row['rows']}" for row in rows]
+
+    def full_scans(self, plan: Sequence[str]) -> List[str]:
+        return [step.split(":")[0] for step in plan if " type=ALL " in step]
+
+    def sql(self, query: str) -> str:
+        # "?" -> "%s" hors chaînes littérales ; "%" littéral doublé pour PyMySQL
+        out, quote = [], None
+        for char in query:
+            if quote:
+                if char == quote:
+                    quote = None
+                out.append("%%" if char == "%" else char)
+            elif char in ("'", '"'):
+                quote = char
+                out.append(char)
+            elif char == "?":
+                out.append("%s")
+            elif char == "%":
+                out.append("%%")
+            else:
+                out.append(char)
+        return "".join(out)
+
+    def upsert(self, table: str, columns: Sequence[str], keys: Sequence[str],
+               update: Sequence[str] = None, timestamps: Sequence[str] = ()) -> str:
+        update = [c for c in (update if update is not None else columns) if c not in keys]
+        insert_columns = ", ".join(list(columns) + list(timestamps))
+        values = ", ".join(["?"] * len(columns) + ["CURRENT_TIMESTAMP"] * len(timestamps))
+        # Sans colonne à mettre à jour, on réaffecte la clé à elle-même (équivalent DO NOTHING)
+        assignments = ", ".join(
+            [f"{c} = VALUES({c})" for c in update] + [f"{c} = CURRENT_TIMESTAMP" for c in timestamps]
+        ) or f"{keys[0]} = {keys[0]}"
+        return (
+            f"INSERT INTO {table} ({insert_columns}) VALUES ({values}) "
+            f"ON DUPLICATE KEY UPDATE {assignments}"
+        )
+
+
+# -------------------
+# CONNEXIONS
+# -------------------
+
+class Cursor:
+    """
+    Curseur traduisant les requêtes "?" dans le dialecte du backend
+    Chaque requête est chronométrée, lecture des lignes comprise : SQLite rend la main
+    dès la première ligne, un parcours complet se paie dans fetchall. La mesure est
+    close à la fin de la lecture (ou à la requête suivante, à la fermeture) ; au-dessus
+    du seuil, la requête va au journal des requêtes lentes
+    """
+
+    def __init__(self, raw, dialect: Dialect):
+        self.raw = raw
+        self.dialect = dialect
+        self._pending = None
+
+    def execute(self, query: str, params: Sequence = ()):
+        self._finish()
+        sql, params = self.dialect.sql(query), tuple(params)
+        started = time.perf_counter()
+        self.raw.execute(sql, params)
+        self._pending = (sql, params, time.perf_counter() - started)
+        if self.raw.description is None:
+            # Pas de lignes à lire : mesure complète
+            self._finish()
+        return self
+
+    def executemany(self, query: str, seq_of_params):
+        self._finish()
+        sql, rows = self.dialect.sql(query), [tuple(p) for p in seq_of_params]
+        started = time.perf_counter()
+        self.raw.executemany(sql, rows)
+        elapsed = time.perf_counter() - started
+        if elapsed >= slow_queries.threshold_s and rows:
+            slow_queries.record(self, sql, rows[0], elapsed, many=len(rows))
+        return self
+
+    def _fetched(self, started: float, done: bool) -> None:
+        if self._pending is not None:
+            sql, params, elapsed = self._pending
+            self._pending = (sql, params, elapsed + time.perf_counter() - started)
+            if done:
+                self._finish()
+
+    def _finish(self) -> None:
+        pending, self._pending = self._pending, None
+        if pending is not None and pending[2] >= slow_queries.threshold_s:
+            slow_queries.record(self, *pending)
+
+    def fetchone(self):
+        # Lecture unitaire : en pratique la seule lecture de la requête
+        started = time.perf_counter()
+        row = self.raw.fetchone()
+        self._fetched(started, done=True)
+        return row
+
+    def fetchall(self) -> List:
+        started = time.perf_counter()
+        rows = self.raw.fetchall()
+        self._fetched(started, done=True)
+        return rows
+
+    def fetchmany(self, size: int) -> List:
+        started = time.perf_counter()
+        rows = self.raw.fetchmany(size)
+        self._fetched(started, done=len(rows) < size)
+        return rows
+
+    @property
+    def lastrowid(self):
+        return self.raw.lastrowid
+
+    @property
+    def rowcount(self) -> int:
+        return self.raw.rowcount
+
+    def close(self):
+        self._finish()
+        self.raw.close()
+
+
+class Connection:
+    """Connexion commune aux backends (les lignes se lisent par nom de colonne)"""
+
+    def __init__(self, raw, dialect: Dialect, on_close=None):
+        self.raw = raw
+        self.dialect = dialect
+        self._on_close = on_close
+
+    def cursor(self) -> Cursor:
+        return Cursor(self.raw.cursor(), self.dialect)
+
+    def execute(self, query: str, params: Sequence = ()) -> Cursor:
+        return self.cursor().execute(query, params)
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def ping(self):
+        self.dialect.ping(self.raw)
+
+    def close(self):
+        if self._on_close is not None:
+            self._on_close(self.raw)
+        else:
+            self.raw.close()
+
+
+class SQLiteStorage:
+    dialect = Dialect()
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    def connect(self) -> Connection:
+        conn = sqlite3.connect(self.path, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000)
+        conn.row_factory = sqlite3.Row
+        return Connection(conn, self.dialect)
+
+    def connect_reader(self) -> Connection:
+        """Connexion en lecture seule (mode=ro) : ne prend jamais le verrou d'écriture"""
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True,
+                               timeout=SQLITE_BUSY_TIMEOUT_MS / 1000)
+        conn.row_factory = sqlite3.Row
+        return Connection(conn, self.dialect)
+
+    def connect_writer(self) -> Connection:
+        """Connexion unique du thread d'écriture (transactions gérées explicitement)"""
+        conn = sqlite3.connect(self.path, isolation_level=None,
+                               timeout=SQLITE_BUSY_TIMEOUT_MS / 1000)
+        conn.row_factory = sqlite3.Row
+        # WAL : durable au checkpoint, synchronous=NORMAL suffit
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return Connection(conn, self.dialect)
+
+    def index_exists(self, cursor: Cursor, table: str, name: str) -> bool:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name = ?", (name,))
+        return cursor.fetchone() is not None
+
+    def column_exists(self, cursor: Cursor, table: str, name: str) -> bool:
+        cursor.execute(f"PRAGMA table_info({table})")
+        return any(row["name"] == name for row in cursor.fetchall())
+
+    def describe(self) -> str:
+        return f"sqlite:{self.path}"
+
+
+class MySQLStorage:
+    """Backend MySQL avec un pool de connexions PyMySQL réutilisées"""
 
-DB_PATH = Path(__file__).parent / "elevai.db"
+    dialect = MySQLDialect()
 
-def get_connection():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    def __init__(self, db_config: Dict, pool_size: int):
+        self.db_config = db_config
+        self.pool = queue.LifoQueue(maxsize=pool_size)
+        self.pool_size = pool_size
+        self._created = 0
+        self._lock = threading.Lock()
 
-def get_db():
+    def _new_raw(self, with_database: bool = True):
+        import pymysql.cursors
+
+        params = dict(self.db_config)
+        if not with_database:
+            params.pop("database")
+        return pymysql.connect(cursorclass=pymysql.cursors.DictCursor, autocommit=False, **params)
+
+    def create_database(self):
+        raw = self._new_raw(with_database=False)
+        try:
+            with raw.cursor() as cursor:
+                cursor.execute(
+                    f"CREATE DATABASE IF NOT EXISTS `{self.db_config['database']}` "
+                    "CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci"
+                )
+        finally:
+            raw.close()
+
+    def connect(self) -> Connection:
+        try:
+            raw = self.pool.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_create = self._created < self.pool_size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    raw = self._new_raw()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                raw = self.pool.get(timeout=30)
+        raw.ping(reconnect=True)
+        return Connection(raw, self.dialect, on_close=self._release)
+
+    def connect_reader(self) -> Connection:
+        return self.connect()
+
+    def connect_writer(self) -> Connection:
+        """Connexion dédiée au thread d'écriture, hors pool (vérifiée par ping avant chaque lot)"""
+        return Connection(self._new_raw(), self.dialect)
+
+    def _release(self, raw):
+        try:
+            raw.rollback()
+            self.pool.put_nowait(raw)
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raw.close()
+
+    def index_exists(self, cursor: Cursor, table: str, name: str) -> bool:
+        cursor.execute("""
+            SELECT 1 FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = ? AND index_name = ?
+        """, (table, name))
+        return cursor.fetchone() is not None
+
+    def column_exists(self, cursor: Cursor, table: str, name: str) -> bool:
+        cursor.execute("""
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name = ? AND column_name = ?
+        """, (table, name))
+        return cursor.fetchone() is not None
+
+    def describe(self) -> str:
+        return f"mysql://{self.db_config['user']}@{self.db_config['host']}/{self.db_config['database']}"
+
+
+def shard_path(path: Path, shard: int, count: int) -> Path:
+    """Fichier de la base `shard` : DB_PATH tel quel sans partitionnement"""
+    if count == 1:
+        return path
+    return path.with_name(f"{path.stem}.shard{shard}{path.suffix}")
+
+
+def _create_storages() -> List:
+    if DB_SHARDS < 1:
+        raise ValueError(f"DB_SHARDS invalide: {DB_SHARDS}")
+    if DB_BACKEND == "mysql":
+        if DB_SHARDS != 1:
+            raise ValueError("DB_SHARDS > 1 n'est disponible qu'avec DB_BACKEND=sqlite")
+        return [MySQLStorage(DB_CONFIG, DB_POOL_SIZE)]
+    if DB_BACKEND == "sqlite":
+        return [SQLiteStorage(shard_path(DB_PATH, shard, DB_SHARDS)) for shard in range(DB_SHARDS)]
+    raise ValueError(f"DB_BACKEND inconnu: {DB_BACKEND}")
+
+
+storages = _create_storages()
+storage = storages[0]
+SHARDS = range(len(storages))
+
+
+def shard_of(user_id: int) -> int:
+    """Base qui contient l'utilisateur"""
+    return (user_id - 1) % len(storages)
+
+
+def _resolve(user_id: Optional[int], shard: Optional[int]):
+    if shard is not None:
+        return storages[shard]
+    if user_id is not None:
+        return storages[shard_of(user_id)]
+    if len(storages) > 1:
+        raise ValueError("Base ambiguë : préciser user_id ou shard (DB_SHARDS > 1)")
+    return storage
+
+
+def get_storage(shard: int = 0):
+    return storages[shard]
+
+
+_user_shards = itertools.count()
+
+
+def new_user_shard() -> int:
+    """Base qui recevra le prochain utilisateur créé (tourniquet)"""
+    return next(_user_shards) % len(storages)
+
+
+def next_user_id(cursor: Cursor, shard: int) -> Optional[int]:
+    """
+    Identifiant du prochain utilisateur de la base `shard`, tel que shard_of(id) == shard
+    None sans partitionnement : l'AUTOINCREMENT s'en charge
+    (sûr avec SQLite : l'écrivain tient le verrou d'écriture pendant toute la transaction)
+    """
+    if len(storages) == 1:
+        return None
+    cursor.execute("SELECT MAX(id) AS max_id FROM users")
+    max_id = cursor.fetchone()["max_id"]
+    return shard + 1 if max_id is None else max_id + len(storages)
+
+
+def get_connection(user_id: int = None, shard: int = None) -> Connection:
+    return _resolve(user_id, shard).connect()
+
+
+def get_read_connection(user_id: int = None, shard: int = None) -> Connection:
+    """Connexion pour les routes GET ; les écritures passent par backend.writer"""
+    return _resolve(user_id, shard).connect_reader()
+
+
+@contextmanager
+def get_db(readonly: bool = False, user_id: int = None, shard: int = None):
     """Utilisation avec 'with': 'with get_db() as conn:'"""
-    conn = get_connection()
+    if readonly:
+        conn = get_read_connection(user_id, shard)
+    else:
+        conn = get_connection(user_id, shard)
     try:
         yield conn
     finally:
         conn.close()
 
-def init_db():
-    conn = get_connection()
+
+_fan_out_pool = ThreadPoolExecutor(max_workers=len(storages)) if len(storages) > 1 else None
+
+
+def fan_out(query: Callable, readonly: bool = True) -> List:
+    """
+    Exécute query(cursor) sur chaque base, en parallèle s'il y en a plusieurs
+    Retourne les résultats dans l'ordre des bases
+    """
+    def run(shard: int):
+        with get_db(readonly=readonly, shard=shard) as conn:
+            return query(conn.cursor())
+
+    if _fan_out_pool is None:
+        return [run(0)]
+    return list(_fan_out_pool.map(run, SHARDS))
+
+
+# -------------------
+# SCHÉMA
+# -------------------
+
+def _ensure_index(cursor: Cursor, table: str, name: str, columns: str, unique: bool = False,
+                  target=None):
+    if (target or storage).index_exists(cursor, table, name):
+        return
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    cursor.execute(f"CREATE {kind} {name} ON {table} ({columns})")
+
+
+def _ensure_column(cursor: Cursor, table: str, name: str, definition: str, target=None):
+    """Ajoute une colonne aux bases créées avant son introduction"""
+    if (target or storage).column_exists(cursor, table, name):
+        return
+    cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+
+
+def init_db(target=None):
+    """Crée le schéma sur toutes les bases actives (ou sur `target`)"""
+    if target is None:
+        for shard_storage in storages:
+            init_db(shard_storage)
+        return
+    if isinstance(target, MySQLStorage):
+        target.create_database()
+
+    conn = target.connect()
     cursor = conn.cursor()
+    if isinstance(target, SQLiteStorage):
+        # WAL : les lecteurs (mode=ro) ne bloquent pas l'unique écrivain et inversement
+        cursor.execute("PRAGMA journal_mode=WAL")
+    pk = target.dialect.autoincrement_pk
+    key_text = target.dialect.key_text
     # Table users
-    cursor.execute("""
+    cursor.execute(f"""
     CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        id {pk},
         age INTEGER NOT NULL,
         genre TEXT NOT NULL,
         taille_cm REAL NOT NULL,
@@ -31,11 +560,11 @@ def init_db():
     )
     """)
     # Table daily_data
-    cursor.execute("""
+    cursor.execute(f"""
     CREATE TABLE IF NOT EXISTS daily_data (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        id {pk},
         user_id INTEGER NOT NULL,
-        date TEXT NOT NULL,
+        date {key_text} NOT NULL,
         sommeil_h REAL,
         pas INTEGER,
         sport_min REAL,
@@ -44,22 +573,87 @@ def init_db():
         stress_0_5 REAL,
         fc_repos INTEGER,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP NULL,
         FOREIGN KEY(user_id) REFERENCES users(id)
     )
     """)
     # Table analysis_results (optionnel si tu veux stocker les analyses)
-    cursor.execute("""
+    cursor.execute(f"""
     CREATE TABLE IF NOT EXISTS analysis_results (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        id {pk},
         user_id INTEGER NOT NULL,
         score REAL,
         category TEXT,
         risk_prediction TEXT,
         explanations TEXT,
         recommendations TEXT,
+        model_version TEXT,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         FOREIGN KEY(user_id) REFERENCES users(id)
     )
     """)
+    # Table risk_state : sommes courantes des tendances (mises à jour à l'ingestion)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS risk_state (
+        user_id INTEGER PRIMARY KEY,
+        state TEXT NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY(user_id) REFERENCES users(id)
+    )
+    """)
+    # Table analysis_history : agrégats journaliers des analyses (alimentée par la compaction)
+    cursor.execute(f"""
+    CREATE TABLE IF NOT EXISTS analysis_history (
+        user_id INTEGER NOT NULL,
+        day {key_text} NOT NULL,
+        score_sum REAL NOT NULL,
+        score_min REAL,
+        score_max REAL,
+        n_results INTEGER NOT NULL,
+        category TEXT,
+        risk_prediction TEXT,
+        last_result_id INTEGER,
+        PRIMARY KEY(user_id, day)
+    )
+    """)
+    # Table maintenance_state : curseurs des tâches de fond (compaction, ...)
+    cursor.execute(f"""
+    CREATE TABLE IF NOT EXISTS maintenance_state (
+        name {key_text} PRIMARY KEY,
+        value TEXT
+    )
+    """)
+    # Table feature_store : vecteurs normalisés et lissés par jour (voir backend/feature_store.py)
+    cursor.execute(f"""
+    CREATE TABLE IF NOT EXISTS feature_store (
+        user_id INTEGER NOT NULL,
+        date {key_text} NOT NULL,
+        version INTEGER NOT NULL,
+        features BLOB NOT NULL,
+        smoothed BLOB NOT NULL,
+        PRIMARY KEY(user_id, date)
+    )
+    """)
+    # Dernière écriture d'une journée par l'ingestion (insertion ou correction) : filigrane du rafraîchissement
+    _ensure_column(cursor, "daily_data", "updated_at", "TIMESTAMP NULL", target=target)
+    _ensure_index(cursor, "daily_data", "idx_daily_data_updated", "updated_at", target=target)
+    # Modèle qui a produit le résultat : un résultat d'un autre modèle n'est plus servi
+    _ensure_column(cursor, "analysis_results", "model_version", "TEXT", target=target)
+    _ensure_index(cursor, "analysis_results", "idx_analysis_results_user_created", "user_id, created_at",
+                  target=target)
+    # Filtres de GET /users, parcourus dans l'ordre des id (pagination par curseur)
+    _ensure_index(cursor, "users", "idx_users_objectif",
+                  f"{target.dialect.text_index.format('objectif')}, id", target=target)
+    _ensure_index(cursor, "users", "idx_users_age", "age, id", target=target)
+
+    # Une seule entrée par utilisateur et par jour (clé de l'upsert d'ingestion)
+    if not target.index_exists(cursor, "daily_data", "idx_daily_data_user_date"):
+        cursor.execute("""
+            DELETE FROM daily_data WHERE id NOT IN (
+                SELECT id FROM (SELECT MAX(id) AS id FROM daily_data GROUP BY user_id, date) AS latest
+            )
+        """)
+        _ensure_index(cursor, "daily_data", "idx_daily_data_user_date", "user_id, date", unique=True,
+                      target=target)
     conn.commit()
     conn.close()
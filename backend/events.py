@@ -0,0 +1,87 @@
+"""
+Hub de publication/abonnement en mémoire pour les flux SSE (GET /events/{user_id})
+
+Chaque connexion SSE ouverte est une file asyncio bornée, abonnée aux
+événements d'un utilisateur : une connexion inactive ne coûte qu'une file et
+une coroutine en attente, sans thread ni requête en base.
+
+publish() peut être appelé depuis n'importe quel thread (routes synchrones,
+tâches de fond) : le message est sérialisé une seule fois puis remis aux
+files dans la boucle d'événements. Si un client ne lit pas assez vite, ses
+plus anciens messages sont abandonnés plutôt que de bloquer l'émetteur.
+
+Le hub est propre au processus : avec plusieurs workers uvicorn, un client ne
+reçoit que les ingestions traitées par le worker auquel il est connecté.
+"""
+
+import asyncio
+import json
+import threading
+from typing import Dict, Set
+
+from backend import config
+
+
+def format_event(event: str, data) -> str:
+    """Message SSE : type d'événement et données JSON"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+class EventHub:
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = {}
+        self._lock = threading.Lock()
+        self._loop = None
+        self.stats = {"published": 0, "delivered": 0, "dropped": 0}
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        """Abonne une nouvelle file (à appeler depuis la boucle d'événements)"""
+        self._loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: int, queue: asyncio.Queue) -> None:
+        with self._lock:
+            queues = self._subscribers.get(user_id)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self._subscribers[user_id]
+
+    def has_subscribers(self, user_id: int) -> bool:
+        return user_id in self._subscribers
+
+    def publish(self, user_id: int, event: str, data) -> int:
+        """Publie un événement aux abonnés de l'utilisateur ; retourne leur nombre"""
+        with self._lock:
+            queues = list(self._subscribers.get(user_id, ()))
+        if not queues or self._loop is None:
+            return 0
+        message = format_event(event, data)
+        self.stats["published"] += 1
+        try:
+            self._loop.call_soon_threadsafe(self._deliver, queues, message)
+        except RuntimeError:
+            # Boucle fermée (arrêt de l'application)
+            return 0
+        return len(queues)
+
+    def _deliver(self, queues, message: str) -> None:
+        for queue in queues:
+            if queue.full():
+                queue.get_nowait()
+                self.stats["dropped"] += 1
+            queue.put_nowait(message)
+            self.stats["delivered"] += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            connections = sum(len(queues) for queues in self._subscribers.values())
+            users = len(self._subscribers)
+        return {"users": users, "connections": connections, **self.stats}
+
+
+hub = EventHub(config.EVENTS_QUEUE_SIZE)
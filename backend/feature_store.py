@@ -0,0 +1,169 @@
+"""
+Feature store : vecteurs de features prêts à l'emploi par utilisateur et par jour
+
+Pour chaque journée de daily_data, la table feature_store contient le vecteur
+normalisé (features) et sa variante lissée sur 3 jours (smoothed), encodés en
+float64 little-endian. Ils sont écrits dans la transaction d'ingestion
+(record_day) ; le scoring et l'entraînement les lisent au lieu de recalculer
+la normalisation.
+
+Chaque vecteur porte la version de la normalisation (ml.model.FEATURE_VERSION) :
+un vecteur d'une autre version est ignoré à la lecture et recalculé par
+backfill, lancé au démarrage de l'API ou en ligne de commande :
+python -m backend.feature_store
+"""
+
+import sys
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from backend.database import SHARDS, get_read_connection
+from backend.ml.model import FEATURE_VERSION, RAW_COLUMNS, normalize_batch, raw_matrix, smooth_batch
+from backend.writer import get_writer, stop_writers
+
+VECTOR_DTYPE = "<f8"
+COLUMNS = ["user_id", "date", "version", "features", "smoothed"]
+# Journées précédentes nécessaires au lissage sur 3 jours
+SMOOTHING_CONTEXT = 2
+
+
+def encode(vector: np.ndarray) -> bytes:
+    return np.asarray(vector, dtype=VECTOR_DTYPE).tobytes()
+
+
+def decode(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype=VECTOR_DTYPE).reshape(1, -1)
+
+
+def _vectors(rows: List[Dict]):
+    """Journées d'un utilisateur (ordre chronologique) -> (features, smoothed)"""
+    raw = raw_matrix(rows)
+    features = normalize_batch(raw)
+    return features, smooth_batch(raw, features)
+
+
+def _upsert_rows(cursor, user_id: int, rows: List[Dict], start: int = 0) -> int:
+    """Calcule et écrit les vecteurs des journées rows[start:]"""
+    features, smoothed = _vectors(rows)
+    params = [
+        (user_id, str(rows[i]["date"])[:10], FEATURE_VERSION, encode(features[i]), encode(smoothed[i]))
+        for i in range(start, len(rows))
+    ]
+    if params:
+        cursor.executemany(
+            cursor.dialect.upsert("feature_store", COLUMNS, keys=["user_id", "date"]), params
+        )
+    return len(params)
+
+
+def record_day(cursor, user_id: int, day: str) -> None:
+    """
+    Opération d'écriture (dans la transaction d'ingestion) : vecteurs de la
+    journée `day` et des 2 journées suivantes, dont le lissage en dépend
+    """
+    columns = ", ".join(("date",) + RAW_COLUMNS)
+    cursor.execute(f"""
+        SELECT {columns} FROM daily_data
+        WHERE user_id = ? AND date < ?
+        ORDER BY date DESC LIMIT ?
+    """, (user_id, day, SMOOTHING_CONTEXT))
+    before = [dict(row) for row in cursor.fetchall()][::-1]
+    cursor.execute(f"""
+        SELECT {columns} FROM daily_data
+        WHERE user_id = ? AND date >= ?
+        ORDER BY date LIMIT ?
+    """, (user_id, day, SMOOTHING_CONTEXT + 1))
+    after = [dict(row) for row in cursor.fetchall()]
+    _upsert_rows(cursor, user_id, before + after, start=len(before))
+
+
+def load_vector(cursor, user_id: int, day: str, smoothed: bool = True) -> Optional[np.ndarray]:
+    """Vecteur (1, 7) stocké pour la journée, ou None s'il est absent ou d'une autre version"""
+    cursor.execute(
+        "SELECT version, features, smoothed FROM feature_store WHERE user_id = ? AND date = ?",
+        (user_id, str(day)[:10]),
+    )
+    row = cursor.fetchone()
+    if row is None or row["version"] != FEATURE_VERSION:
+        return None
+    return decode(row["smoothed"] if smoothed else row["features"])
+
+
+# -------------------
+# BACKFILL
+# -------------------
+
+def stale_users(cursor, after_id: int, limit: int) -> List[int]:
+    """Utilisateurs (id > after_id) ayant des journées sans vecteur à jour"""
+    cursor.execute("""
+        SELECT DISTINCT d.user_id FROM daily_data d
+        LEFT JOIN feature_store f ON f.user_id = d.user_id AND f.date = d.date
+        WHERE d.user_id > ? AND (f.user_id IS NULL OR f.version <> ?)
+        ORDER BY d.user_id
+        LIMIT ?
+    """, (after_id, FEATURE_VERSION, limit))
+    return [row["user_id"] for row in cursor.fetchall()]
+
+
+def recompute_users(cursor, user_ids: List[int]) -> int:
+    """Opération d'écriture : recalcule tous les vecteurs des utilisateurs donnés"""
+    placeholders = ", ".join("?" for _ in user_ids)
+    columns = ", ".join(("user_id", "date") + RAW_COLUMNS)
+    cursor.execute(f"""
+        SELECT {columns} FROM daily_data
+        WHERE user_id IN ({placeholders})
+        ORDER BY user_id, date
+    """, list(user_ids))
+    by_user = {}
+    for row in cursor.fetchall():
+        by_user.setdefault(row["user_id"], []).append(dict(row))
+    return sum(_upsert_rows(cursor, user_id, rows) for user_id, rows in by_user.items())
+
+
+def backfill(batch_users: int = 200, progress: bool = False) -> Dict[str, int]:
+    """Recalcule par lots d'utilisateurs, base par base, les vecteurs absents ou périmés"""
+    stats = {"users": 0, "vectors": 0, "batches": 0}
+    started = time.perf_counter()
+    for shard in SHARDS:
+        writer = get_writer(shard=shard)
+        after_id = 0
+        while True:
+            conn = get_read_connection(shard=shard)
+            try:
+                user_ids = stale_users(conn.cursor(), after_id, batch_users)
+            finally:
+                conn.close()
+            if not user_ids:
+                break
+            stats["vectors"] += writer.execute(recompute_users, user_ids)
+            stats["users"] += len(user_ids)
+            stats["batches"] += 1
+            after_id = user_ids[-1]
+            if progress:
+                elapsed = time.perf_counter() - started
+                print(f"  {stats['users']} utilisateurs, {stats['vectors']} vecteurs "
+                      f"({stats['vectors'] / max(elapsed, 1e-9):.0f} vecteurs/s)")
+    return stats
+
+
+def run_backfill() -> None:
+    """Tâche de démarrage : met le feature store à la version courante"""
+    try:
+        stats = backfill()
+    except Exception as e:
+        print(f"Erreur de backfill du feature store: {e}", file=sys.stderr)
+        return
+    if stats["vectors"]:
+        print(f"Feature store v{FEATURE_VERSION}: {stats['vectors']} vecteurs recalculés "
+              f"pour {stats['users']} utilisateurs")
+
+
+if __name__ == "__main__":
+    print(f"Backfill du feature store (version {FEATURE_VERSION})...")
+    started = time.perf_counter()
+    result = backfill(progress=True)
+    stop_writers()
+    print(f"Terminé en {time.perf_counter() - started:.2f}s: {result['vectors']} vecteurs, "
+          f"{result['users']} utilisateurs ({result['batches']} lots)")
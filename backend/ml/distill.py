@@ -0,0 +1,224 @@
+"""
+Distillation du modèle de score
+
+La forêt (100 arbres, profondeur 10) est bien plus lourde que nécessaire
+pour 7 features. Ce script entraîne des modèles élèves compacts sur les
+prédictions de la forêt, mesure pour chacun l'écart à la forêt, la latence
+d'une prédiction unitaire et la taille de l'artefact, et enregistre le tout
+dans ml/manifest.json.
+
+Élèves et écarts portent sur les vecteurs effectivement servis : vecteurs
+lissés du feature store, complétés au besoin par des séries synthétiques
+réalistes passées par la même normalisation (backend.ml.train).
+
+En production, ELEVAI_LATENCY_BUDGET_MS sélectionne le modèle le plus fidèle
+dont la latence respecte le budget (voir select_model).
+
+Utilisation : python -m backend.ml.distill
+"""
+
+import hashlib
+import json
+import os
+import sys
+import time
+from typing import Dict, Optional
+
+import joblib
+import numpy as np
+from sklearn.ensemble import GradientBoostingRegressor
+from sklearn.linear_model import Ridge
+from sklearn.metrics import mean_absolute_error, r2_score
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import SplineTransformer
+from sklearn.tree import DecisionTreeRegressor
+
+from backend.database import fan_out
+from backend.feature_store import decode
+from backend.ml.model import FEATURE_VERSION, MODEL_PATH, RAW_COLUMNS, normalize_batch, smooth_batch
+
+MODEL_DIR = os.path.dirname(MODEL_PATH)
+MANIFEST_PATH = os.path.join(MODEL_DIR, "manifest.json")
+STUDENTS_DIR = os.path.join(MODEL_DIR, "students")
+
+TEACHER_NAME = "forest"
+N_FEATURES = 7
+
+
+def build_students() -> Dict:
+    return {
+        # Ensemble boosté peu profond
+        "gbr_shallow": GradientBoostingRegressor(
+            n_estimators=60, max_depth=3, learning_rate=0.15, random_state=42
+        ),
+        # Arbre unique
+        "tree": DecisionTreeRegressor(max_depth=8, min_samples_leaf=5, random_state=42),
+        # Modèle additif linéaire par morceaux (splines de degré 1 + régression ridge)
+        "piecewise_linear": make_pipeline(SplineTransformer(n_knots=6, degree=1), Ridge(alpha=1e-3)),
+    }
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def measure_latency_ms(model, n_calls: int = 200) -> float:
+    """Latence médiane d'une prédiction unitaire"""
+    row = np.full((1, N_FEATURES), 0.5)
+    for _ in range(10):
+        model.predict(row)
+    timings = []
+    for _ in range(n_calls):
+        started = time.perf_counter()
+        model.predict(row)
+        timings.append(time.perf_counter() - started)
+    return float(np.median(timings) * 1000)
+
+
+def stored_features(n: int) -> np.ndarray:
+    """Vecteurs lissés à jour les plus récents du feature store (toutes bases), au plus n"""
+    def query(cursor):
+        cursor.execute(
+            "SELECT smoothed FROM feature_store WHERE version = ? ORDER BY date DESC LIMIT ?",
+            (FEATURE_VERSION, n),
+        )
+        return [decode(row["smoothed"]) for row in cursor.fetchall()]
+
+    vectors = [vector for rows in fan_out(query) for vector in rows][:n]
+    return np.vstack(vectors) if vectors else np.empty((0, N_FEATURES))
+
+
+def synthetic_features(n: int, seed: int, n_days: int = 30) -> np.ndarray:
+    """n vecteurs lissés de séries synthétiques d'utilisateurs (comme à l'ingestion)"""
+    from backend.ml.train import generate_user_series
+
+    n_users = -(-n // n_days)
+    cols = generate_user_series(n_users, n_days, seed=seed)
+    raw = np.column_stack([cols[c] for c in RAW_COLUMNS]).astype(float)
+    features = normalize_batch(raw)
+    smoothed = np.vstack([
+        smooth_batch(raw[i:i + n_days], features[i:i + n_days]) for i in range(0, len(raw), n_days)
+    ])
+    return smoothed[:n]
+
+
+def sample_features(n: int, seed: int):
+    """n vecteurs de production mélangés ; retourne (vecteurs, effectifs par origine)"""
+    stored = stored_features(n)
+    synthetic = synthetic_features(n - len(stored), seed) if len(stored) < n else np.empty((0, N_FEATURES))
+    X = np.random.default_rng(seed).permutation(np.vstack([stored, synthetic]))
+    return X, {"feature_store": len(stored), "synthetic": len(synthetic)}
+
+
+def distill(n_train: int = 20000, n_holdout: int = 5000, seed: int = 42) -> Dict:
+    """Entraîne les élèves, mesure chaque modèle et écrit le manifeste"""
+    teacher = joblib.load(MODEL_PATH)
+    if hasattr(teacher, "n_jobs"):
+        teacher.n_jobs = 1
+
+    X, sources = sample_features(n_train + n_holdout, seed)
+    X_train, X_holdout = X[:n_train], X[n_train:]
+    y_train = teacher.predict(X_train)
+    y_holdout = teacher.predict(X_holdout)
+
+    os.makedirs(STUDENTS_DIR, exist_ok=True)
+    manifest = load_manifest()
+    teacher_sha = file_sha256(MODEL_PATH)
+    models = {
+        TEACHER_NAME: {
+            "path": os.path.relpath(MODEL_PATH, MODEL_DIR),
+            "mae": 0.0,
+            "r2": 1.0,
+            "latency_ms": round(measure_latency_ms(teacher), 4),
+            "size_bytes": os.path.getsize(MODEL_PATH),
+        }
+    }
+
+    for name, student in build_students().items():
+        student.fit(X_train, y_train)
+        predictions = student.predict(X_holdout)
+        path = os.path.join(STUDENTS_DIR, f"{name}.pkl")
+        joblib.dump(student, path)
+        models[name] = {
+            "path": os.path.relpath(path, MODEL_DIR),
+            "mae": round(float(mean_absolute_error(y_holdout, predictions)), 4),
+            "r2": round(float(r2_score(y_holdout, predictions)), 4),
+            "latency_ms": round(measure_latency_ms(student), 4),
+            "size_bytes": os.path.getsize(path),
+            "teacher_sha256": teacher_sha,
+        }
+
+    manifest["models"] = models
+    manifest["distillation"] = {"n_train": len(X_train), "n_holdout": len(X_holdout), "sources": sources}
+    save_manifest(manifest)
+    return models
+
+
+# -------------------
+# MANIFESTE ET SÉLECTION
+# -------------------
+
+def load_manifest() -> Dict:
+    if not os.path.exists(MANIFEST_PATH):
+        return {}
+    with open(MANIFEST_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest: Dict) -> None:
+    tmp_path = MANIFEST_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+
+_teacher_sha_cache = {"mtime": None, "sha": None}
+
+
+def _current_teacher_sha() -> Optional[str]:
+    try:
+        mtime = os.path.getmtime(MODEL_PATH)
+    except OSError:
+        return None
+    if _teacher_sha_cache["mtime"] != mtime:
+        _teacher_sha_cache.update(mtime=mtime, sha=file_sha256(MODEL_PATH))
+    return _teacher_sha_cache["sha"]
+
+
+def select_model(budget_ms: float, manifest: Dict = None) -> Optional[str]:
+    """
+    Chemin du modèle le plus fidèle (MAE la plus faible) dont la latence
+    respecte le budget ; à défaut, le plus rapide. Les élèves distillés
+    d'une ancienne version de la forêt sont ignorés.
+    """
+    manifest = manifest if manifest is not None else load_manifest()
+    teacher_sha = _current_teacher_sha()
+    candidates = [
+        entry for name, entry in manifest.get("models", {}).items()
+        if name == TEACHER_NAME or entry.get("teacher_sha256") == teacher_sha
+    ]
+    if not candidates:
+        return None
+    within_budget = [entry for entry in candidates if entry["latency_ms"] <= budget_ms]
+    if within_budget:
+        chosen = min(within_budget, key=lambda entry: entry["mae"])
+    else:
+        chosen = min(candidates, key=lambda entry: entry["latency_ms"])
+    return os.path.join(MODEL_DIR, chosen["path"])
+
+
+if __name__ == "__main__":
+    if not os.path.exists(MODEL_PATH):
+        print(f"Modèle introuvable ({MODEL_PATH}) : lancez d'abord l'entraînement (python -m backend.ml.train)")
+        sys.exit(1)
+    print("Distillation des modèles élèves...")
+    report = distill()
+    print(f"\n{'modèle':<18}{'MAE':>8}{'R²':>8}{'latence ms':>12}{'taille Ko':>12}")
+    for name, entry in report.items():
+        print(f"{name:<18}{entry['mae']:>8.3f}{entry['r2']:>8.3f}"
+              f"{entry['latency_ms']:>12.3f}{entry['size_bytes'] / 1024:>12.1f}")
+    print(f"\nManifeste écrit dans {MANIFEST_PATH}")
@@ -0,0 +1,221 @@
+"""
+Exécuteur d'inférence multi-processus avec micro-batching
+
+L'évaluation de la forêt est liée au CPU : exécutée dans les threads de
+FastAPI, elle se dispute le GIL avec les requêtes d'E/S. Ici, chaque
+processus du pool charge le modèle une fois, et un thread de regroupement
+fusionne les demandes unitaires concurrentes arrivées dans une courte
+fenêtre en un seul appel à predict.
+
+Un processus qui meurt rend tout le pool inutilisable (BrokenProcessPool) :
+le pool est alors recréé, et les demandes en échec sont évaluées dans le
+thread appelant (backend.ml.model.predict_from_features).
+"""
+
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional
+
+import numpy as np
+
+from backend import config
+
+# Bornes supérieures des classes de l'histogramme des tailles de lot
+BATCH_BUCKETS = (1, 4, 16, 64, 256)
+
+
+def _init_worker():
+    from backend.ml.model import load_model
+    load_model()
+
+
+def _predict_batch(features: np.ndarray) -> np.ndarray:
+    from backend.ml.model import score_features
+    return score_features(features)
+
+
+class InferenceExecutor:
+    def __init__(self, workers: int, window_ms: float, max_batch: int):
+        self.workers = workers
+        self.window_s = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._pool = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.stats = {
+            "requests": 0,
+            "batches": 0,
+            "errors": 0,
+            "fallbacks": 0,
+            "pool_restarts": 0,
+            "max_queue_depth": 0,
+            "batch_sizes": {**{f"<={bound}": 0 for bound in BATCH_BUCKETS}, f">{BATCH_BUCKETS[-1]}": 0},
+        }
+
+    def start(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                return
+            self._pool = self._new_pool()
+            self._thread = threading.Thread(target=self._batch_loop, name="elevai-inference", daemon=True)
+            self._thread.start()
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        # spawn : pas de fork d'un processus qui possède déjà des threads
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+
+    def _restart_pool(self, broken: ProcessPoolExecutor) -> None:
+        """Remplace un pool cassé (processus tué, plantage) ; sans effet après shutdown"""
+        with self._lock:
+            if self._pool is not broken:
+                return
+            self._pool = self._new_pool()
+            self.stats["pool_restarts"] += 1
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            self._queue.put(None)
+            pool.shutdown(wait=True)
+
+    def submit(self, features: np.ndarray) -> Future:
+        """Met en file un vecteur de features (7,) ; le Future donne le score"""
+        self.start()
+        future = Future()
+        self._queue.put((features, future))
+        depth = self._queue.qsize()
+        if depth > self.stats["max_queue_depth"]:
+            self.stats["max_queue_depth"] = depth
+        return future
+
+    def predict(self, features: np.ndarray, timeout: float = 10) -> float:
+        return self.submit(features).result(timeout=timeout)
+
+    def predict_matrix(self, features: np.ndarray, timeout: float = 10) -> np.ndarray:
+        """Évalue une matrice (n, 7) déjà constituée en un seul envoi au pool, sans micro-batching"""
+        self.start()
+        self._record_batch(len(features))
+        pool = self._pool
+        with self._lock:
+            self._in_flight += len(features)
+        try:
+            return pool.submit(_predict_batch, features).result(timeout=timeout)
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                self._restart_pool(pool)
+            self.stats["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= len(features)
+
+    def _batch_loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.window_s
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+            self._dispatch(batch)
+
+    def _dispatch(self, batch) -> None:
+        features = np.vstack([f for f, _ in batch])
+        futures = [future for _, future in batch]
+        self._record_batch(len(batch))
+        pool = self._pool
+        try:
+            pending = pool.submit(_predict_batch, features)
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                self._restart_pool(pool)
+            self._fail(futures, e)
+            return
+        with self._lock:
+            self._in_flight += len(batch)
+
+        def _done(result_future):
+            with self._lock:
+                self._in_flight -= len(batch)
+            try:
+                scores = result_future.result()
+            except Exception as e:
+                if isinstance(e, BrokenProcessPool):
+                    self._restart_pool(pool)
+                self._fail(futures, e)
+                return
+            for future, score in zip(futures, scores):
+                future.set_result(float(score))
+
+        pending.add_done_callback(_done)
+
+    def _fail(self, futures, error) -> None:
+        self.stats["errors"] += 1
+        for future in futures:
+            if not future.done():
+                future.set_exception(error)
+
+    def _record_batch(self, size: int) -> None:
+        self.stats["requests"] += size
+        self.stats["batches"] += 1
+        for bound in BATCH_BUCKETS:
+            if size <= bound:
+                self.stats["batch_sizes"][f"<={bound}"] += 1
+                break
+        else:
+            self.stats["batch_sizes"][f">{BATCH_BUCKETS[-1]}"] += 1
+
+    def snapshot(self) -> Dict:
+        batches = self.stats["batches"]
+        return {
+            "workers": self.workers,
+            "queue_depth": self._queue.qsize(),
+            "in_flight": self._in_flight,
+            "mean_batch_size": round(self.stats["requests"] / batches, 2) if batches else 0,
+            **self.stats,
+        }
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> Optional[InferenceExecutor]:
+    """Exécuteur partagé, ou None si l'inférence se fait dans le thread appelant"""
+    global _executor
+    if config.INFERENCE_WORKERS <= 0:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            _executor = InferenceExecutor(
+                config.INFERENCE_WORKERS, config.INFERENCE_BATCH_WINDOW_MS, config.INFERENCE_MAX_BATCH
+            )
+        return _executor
+
+
+def shutdown_executor() -> None:
+    with _executor_lock:
+        executor = _executor
+    if executor is not None:
+        executor.shutdown()
@@ -6,13 +6,35 @@ Utilise RandomForest pour la régression du score (0-100)
 import numpy as np
 import joblib
 import os
+import sys
+import threading
 from typing import Dict, List, Tuple, Optional
 
 # Chemins
 MODEL_DIR = os.path.dirname(__file__)
-MODEL_PATH = os.path.join(MODEL_DIR, "model.pkl")
+MODEL_PATH = os.environ.get("ELEVAI_MODEL_PATH", os.path.join(MODEL_DIR, "model.pkl"))
 SCALER_PATH = os.path.join(MODEL_DIR, "scaler.pkl")
 
+# Budget de latence (ms) : sert un modèle distillé plus léger si défini (voir ml/distill.py)
+_budget = os.environ.get("ELEVAI_LATENCY_BUDGET_MS")
+LATENCY_BUDGET_MS = float(_budget) if _budget else None
+
+# Modèle chargé une seule fois par processus, rechargé si le fichier change
+_model_cache = {"key": None, "model": None}
+_selection_cache = {"mtime": None, "path": None}
+_model_lock = threading.Lock()
+
+# Version de la normalisation : à incrémenter à chaque changement de normalize_features /
+# build_features pour que le feature store recalcule les vecteurs (backend/feature_store.py)
+FEATURE_VERSION = 1
+
+RAW_COLUMNS = ("sommeil_h", "pas", "sport_min", "calories", "humeur_0_5", "stress_0_5", "fc_repos")
+# Valeurs par défaut (appliquées aussi aux zéros, comme `valeur or défaut`)
+RAW_DEFAULTS = np.array([7.0, 5000, 0, 2000, 3, 3, 70], dtype=float)
+# Domaine de saisie de chaque colonne (bornes de DailyDataCreate)
+RAW_MIN = np.array([0, 0, 0, 0, 0, 0, 30], dtype=float)
+RAW_MAX = np.array([24, np.inf, np.inf, np.inf, 5, 5, 200], dtype=float)
+
 def normalize_features(data_dict: Dict) -> np.ndarray:
     """
     Normalise les features pour le modèle
@@ -55,6 +77,75 @@ def normalize_features(data_dict: Dict) -> np.ndarray:
     
     return np.array(features).reshape(1, -1)
 
+def raw_matrix(rows: List[Dict]) -> np.ndarray:
+    """Colonnes brutes de daily_data -> matrice (n, 7), NaN pour les valeurs manquantes"""
+    return np.array(
+        [[np.nan if row.get(c) is None else row.get(c) for c in RAW_COLUMNS] for row in rows],
+        dtype=float
+    ).reshape(-1, len(RAW_COLUMNS))
+
+def effective_values(raw: np.ndarray) -> np.ndarray:
+    """Valeurs vues par le modèle : défauts à la place des valeurs manquantes ou nulles"""
+    return np.where(np.isnan(raw) | (raw == 0), RAW_DEFAULTS, raw)
+
+def normalize_batch(raw: np.ndarray) -> np.ndarray:
+    """Version vectorisée de normalize_features pour une matrice brute (n, 7)"""
+    return _normalize_values(effective_values(raw))
+
+def _normalize_values(values: np.ndarray) -> np.ndarray:
+    features = np.empty_like(values)
+    features[:, 0] = np.minimum(values[:, 0] / 9.0, 1.0)
+    features[:, 1] = np.minimum(values[:, 1] / 12000.0, 1.0)
+    features[:, 2] = np.minimum(values[:, 2] / 90.0, 1.0)
+    features[:, 3] = np.minimum(values[:, 3] / 3000.0, 1.0)
+    features[:, 4] = values[:, 4] / 5.0
+    features[:, 5] = 1.0 - values[:, 5] / 5.0
+    fc = values[:, 6]
+    features[:, 6] = np.where(fc < 50, 0.5, np.where(fc > 100, 0.3, 1.0 - (fc - 50) / 50.0))
+    return features
+
+def smooth_batch(raw: np.ndarray, features: np.ndarray) -> np.ndarray:
+    """
+    Variante lissée de build_features pour les journées d'un utilisateur triées
+    par date croissante : moyenne sur la journée et les 2 précédentes pour le
+    sommeil, le sport et le stress (à partir de la 3e journée)
+    """
+    smoothed = features.copy()
+    if len(raw) < 3:
+        return smoothed
+    values = effective_values(raw)
+    cumsum = np.vstack([np.zeros((1, values.shape[1])), np.cumsum(values, axis=0)])
+    avg = (cumsum[3:] - cumsum[:-3]) / 3.0
+    smoothed[2:, 0] = np.minimum(avg[:, 0] / 9.0, 1.0)
+    smoothed[2:, 2] = np.minimum(avg[:, 2] / 90.0, 1.0)
+    smoothed[2:, 5] = 1.0 - avg[:, 5] / 5.0
+    return smoothed
+
+def scenario_features(recent_raw: np.ndarray, deltas: np.ndarray, sustained: bool = False) -> np.ndarray:
+    """
+    Vecteurs de features de m scénarios « et si » en un seul tableau (m, 7)
+    recent_raw : journées brutes les plus récentes d'abord (comme build_features)
+    deltas : écarts (m, 7) ajoutés à la dernière journée, ou aux 3 journées
+    de la moyenne mobile si sustained (habitude plutôt qu'une seule journée)
+    Les valeurs modifiées sont bornées à leur domaine de saisie (DailyDataCreate) puis,
+    comme une journée saisie, un zéro vaut valeur manquante (défaut de build_features)
+    """
+    window = effective_values(recent_raw[:3])
+    days = np.repeat(window[None, :, :], len(deltas), axis=0)
+    if sustained:
+        days = days + deltas[:, None, :]
+    else:
+        days[:, 0, :] += deltas
+    days = effective_values(np.clip(days, RAW_MIN, RAW_MAX))
+
+    features = _normalize_values(days[:, 0, :])
+    if len(window) >= 3:
+        avg = days.mean(axis=1)
+        features[:, 0] = np.minimum(avg[:, 0] / 9.0, 1.0)
+        features[:, 2] = np.minimum(avg[:, 2] / 90.0, 1.0)
+        features[:, 5] = 1.0 - avg[:, 5] / 5.0
+    return features
+
 def calculate_score_simple(features: np.ndarray) -> float:
     """
     Calcul simple du score basé sur une formule pondérée
@@ -64,11 +155,53 @@ def calculate_score_simple(features: np.ndarray) -> float:
     score = np.dot(features.flatten(), weights) * 100
     return max(0, min(100, score))
 
-def predict_wellness_score(latest_data: Dict, recent_data: List[Dict]) -> Tuple[float, str]:
+def resolve_model_path() -> str:
+    """Modèle servi : la forêt, ou le modèle distillé choisi pour le budget de latence"""
+    if LATENCY_BUDGET_MS is None:
+        return MODEL_PATH
+    from backend.ml.distill import MANIFEST_PATH, select_model
+
+    try:
+        mtime = (os.path.getmtime(MANIFEST_PATH), os.path.getmtime(MODEL_PATH))
+    except OSError:
+        return MODEL_PATH
+    if _selection_cache["mtime"] != mtime:
+        _selection_cache.update(mtime=mtime, path=select_model(LATENCY_BUDGET_MS) or MODEL_PATH)
+    return _selection_cache["path"]
+
+def model_version() -> str:
     """
-    Prédit le score de bien-être (0-100) et la catégorie
+    Identifiant du modèle servi (fichier et date de modification), "formule" sans modèle
+    Change à chaque promotion (entraînement, rafraîchissement) ou changement de sélection
+    """
+    path = resolve_model_path()
+    try:
+        return f"{os.path.basename(path)}@{os.stat(path).st_mtime_ns}"
+    except OSError:
+        return "formule"
+
+def load_model():
+    """Retourne le modèle à servir (None s'il n'existe pas), mis en cache par processus"""
+    path = resolve_model_path()
+    try:
+        key = (path, os.path.getmtime(path))
+    except OSError:
+        return None
+    if _model_cache["key"] != key:
+        with _model_lock:
+            if _model_cache["key"] != key:
+                model = joblib.load(path)
+                # Prédictions unitaires : le parallélisme interne coûte plus qu'il ne rapporte
+                if hasattr(model, "n_jobs"):
+                    model.n_jobs = 1
+                _model_cache.update(key=key, model=model)
+    return _model_cache["model"]
+
+def build_features(latest_data: Dict, recent_data: List[Dict]) -> np.ndarray:
+    """
+    Features du modèle : dernière journée normalisée, avec moyenne mobile
+    sur 3 jours pour le sommeil, le sport et le stress
     """
-    # Normaliser les features
     features = normalize_features(latest_data)
     
     # Calculer moyenne mobile sur 3 jours pour certaines features
@@ -82,30 +215,74 @@ def predict_wellness_score(latest_data: Dict, recent_data: List[Dict]) -> Tuple[
         features[0][2] = min(avg_sport / 90.0, 1.0)   # sport
         features[0][5] = 1.0 - (avg_stress / 5.0)     # stress (inversé)
     
-    # Essayer de charger le modèle entraîné
+    return features
+
+def score_features(features: np.ndarray) -> np.ndarray:
+    """
+    Score (0-100) d'un lot de vecteurs de features (n, 7)
+    Utilise le modèle entraîné s'il existe, sinon la formule pondérée
+    """
     try:
-        if os.path.exists(MODEL_PATH):
-            model = joblib.load(MODEL_PATH)
-            score = model.predict(features)[0]
-            score = max(0, min(100, score))
-        else:
-            # Utiliser la formule simple
-            score = calculate_score_simple(features)
+        model = load_model()
+        if model is not None:
+            return np.clip(model.predict(features), 0, 100)
     except Exception:
         # Fallback sur la formule simple
-        score = calculate_score_simple(features)
-    
-    # Déterminer la catégorie
+        pass
+    weights = np.array([0.20, 0.15, 0.15, 0.10, 0.20, 0.15, 0.05])
+    return np.clip(features @ weights * 100, 0, 100)
+
+def categorize(score: float) -> str:
     if score >= 80:
-        category = "Excellent équilibre"
+        return "Excellent équilibre"
     elif score >= 65:
-        category = "Bon équilibre"
+        return "Bon équilibre"
     elif score >= 50:
-        category = "Équilibre moyen"
-    else:
-        category = "Équilibre à améliorer"
+        return "Équilibre moyen"
+    return "Équilibre à améliorer"
+
+def predict_from_features(features: np.ndarray) -> Tuple[float, str]:
+    """
+    Score (0-100) et catégorie d'un vecteur de features prêt à l'emploi
+    L'inférence passe par le pool de processus s'il est activé (ELEVAI_INFERENCE_WORKERS) ;
+    en cas d'échec du pool (processus tué, délai dépassé), elle se fait dans le thread appelant
+    """
+    from backend.ml.inference import get_executor
+
+    executor = get_executor()
+    score = None
+    if executor is not None:
+        try:
+            score = executor.predict(features.reshape(-1))
+        except Exception as e:
+            executor.stats["fallbacks"] += 1
+            print(f"Inférence hors pool après échec du pool: {e!r}", file=sys.stderr)
+    if score is None:
+        score = float(score_features(features.reshape(1, -1))[0])
     
-    return round(score, 1), category
+    return round(score, 1), categorize(score)
+
+def predict_matrix(features: np.ndarray) -> np.ndarray:
+    """
+    Scores (0-100) d'une matrice de features (n, 7), en un seul envoi au pool s'il est activé ;
+    même repli que predict_from_features en cas d'échec du pool
+    """
+    from backend.ml.inference import get_executor
+
+    executor = get_executor()
+    if executor is not None:
+        try:
+            return executor.predict_matrix(features)
+        except Exception as e:
+            executor.stats["fallbacks"] += 1
+            print(f"Inférence hors pool après échec du pool: {e!r}", file=sys.stderr)
+    return score_features(features)
+
+def predict_wellness_score(latest_data: Dict, recent_data: List[Dict]) -> Tuple[float, str]:
+    """
+    Prédit le score de bien-être (0-100) et la catégorie
+    """
+    return predict_from_features(build_features(latest_data, recent_data))
 
 def get_explanations(latest_data: Dict, recent_data: List[Dict]) -> Dict[str, str]:
     """
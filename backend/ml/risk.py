@@ -0,0 +1,249 @@
+"""
+Moteur de prédiction de risque basé sur les tendances
+Ajuste pour chaque métrique une moyenne mobile exponentielle (EWMA) et une
+pente des moindres carrés sur des fenêtres de 7, 14 et 30 jours.
+
+Les pentes sont calculées en forme fermée à partir de sommes courantes
+(n, Σx, Σy, Σxy, Σx²) mises à jour en O(1) à chaque nouvelle journée :
+l'analyse n'a donc pas besoin de relire l'historique brut.
+"""
+
+import json
+from collections import deque
+from datetime import date as date_type
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+METRICS = ("stress_0_5", "sommeil_h", "humeur_0_5", "fc_repos")
+WINDOWS = (7, 14, 30)
+
+# Horizon de projection (jours) utilisé pour les messages de risque
+HORIZON_DAYS = 3
+
+# Indices des sommes courantes
+_N, _SX, _SY, _SXY, _SXX = range(5)
+
+
+def _to_ordinal(day) -> int:
+    if isinstance(day, date_type):
+        return day.toordinal()
+    return date_type.fromisoformat(str(day)[:10]).toordinal()
+
+
+class TrendState:
+    """
+    État incrémental des tendances d'un utilisateur
+
+    Pour chaque fenêtre, on conserve les observations encore dans la fenêtre
+    (au plus 30 par fenêtre) afin de pouvoir retirer leur contribution des
+    sommes lorsqu'elles en sortent.
+    """
+
+    def __init__(self, origin: Optional[int] = None):
+        self.origin = origin
+        self.last_x: Optional[int] = None
+        self.ewma = np.full((len(METRICS), len(WINDOWS)), np.nan)
+        self.sums = np.zeros((len(METRICS), len(WINDOWS), 5))
+        self.windows = [deque() for _ in WINDOWS]
+
+    @property
+    def last_day(self) -> Optional[str]:
+        if self.last_x is None:
+            return None
+        return date_type.fromordinal(self.origin + self.last_x).isoformat()
+
+    def push(self, day, row: Dict) -> None:
+        """Ajoute une journée (strictement postérieure à la dernière) en O(1)"""
+        ordinal = _to_ordinal(day)
+        if self.origin is None:
+            self.origin = ordinal
+        x = ordinal - self.origin
+        if self.last_x is not None and x <= self.last_x:
+            raise ValueError("Les journées doivent être ajoutées dans l'ordre chronologique")
+
+        values = [row.get(metric) for metric in METRICS]
+
+        for w_idx, width in enumerate(WINDOWS):
+            window = self.windows[w_idx]
+            # Retirer les observations sorties de la fenêtre
+            while window and window[0][0] <= x - width:
+                old_x, old_values = window.popleft()
+                self._accumulate(w_idx, old_x, old_values, -1.0)
+            window.append((x, values))
+            self._accumulate(w_idx, x, values, 1.0)
+
+            alpha = 2.0 / (width + 1)
+            for m_idx, value in enumerate(values):
+                if value is None:
+                    continue
+                previous = self.ewma[m_idx, w_idx]
+                if np.isnan(previous):
+                    self.ewma[m_idx, w_idx] = value
+                else:
+                    self.ewma[m_idx, w_idx] = alpha * value + (1 - alpha) * previous
+
+        self.last_x = x
+
+    def _accumulate(self, w_idx: int, x: int, values: List, sign: float) -> None:
+        for m_idx, value in enumerate(values):
+            if value is None:
+                continue
+            self.sums[m_idx, w_idx] += sign * np.array([1.0, x, value, x * value, x * x])
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict]) -> "TrendState":
+        """Reconstruit l'état à partir de lignes daily_data (dans n'importe quel ordre)"""
+        state = cls()
+        for row in sorted(rows, key=lambda r: str(r["date"])):
+            state.push(row["date"], row)
+        return state
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "origin": self.origin,
+            "last_x": self.last_x,
+            "ewma": [[None if np.isnan(v) else float(v) for v in line] for line in self.ewma],
+            "sums": self.sums.tolist(),
+            "windows": [list(window) for window in self.windows],
+        })
+
+    @classmethod
+    def from_json(cls, payload: str) -> "TrendState":
+        data = json.loads(payload)
+        state = cls(origin=data["origin"])
+        state.last_x = data["last_x"]
+        state.ewma = np.array(
+            [[np.nan if v is None else v for v in line] for line in data["ewma"]], dtype=float
+        )
+        state.sums = np.array(data["sums"], dtype=float)
+        state.windows = [deque((x, values) for x, values in window) for window in data["windows"]]
+        return state
+
+
+def compute_trends(states: List[TrendState]) -> Dict[str, np.ndarray]:
+    """
+    Calcule moyennes, pentes et EWMA pour plusieurs utilisateurs à la fois
+    Retourne des tableaux de forme (n_utilisateurs, n_métriques, n_fenêtres)
+    """
+    sums = np.stack([state.sums for state in states]) if states else np.zeros((0, len(METRICS), len(WINDOWS), 5))
+    ewma = np.stack([state.ewma for state in states]) if states else np.zeros((0, len(METRICS), len(WINDOWS)))
+
+    n, sx, sy, sxy, sxx = (sums[..., i] for i in (_N, _SX, _SY, _SXY, _SXX))
+    denominator = n * sxx - sx * sx
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = np.where((n >= 2) & (denominator > 1e-9), (n * sxy - sx * sy) / denominator, 0.0)
+        mean = np.where(n > 0, sy / n, np.nan)
+
+    return {"n": n, "mean": mean, "slope": slope, "ewma": ewma}
+
+
+def score_risks(states: List[TrendState]) -> List[Optional[str]]:
+    """Prédit le risque de plusieurs utilisateurs en un seul calcul vectorisé"""
+    trends = compute_trends(states)
+    s, sl = METRICS.index("stress_0_5"), METRICS.index("sommeil_h")
+    h, fc = METRICS.index("humeur_0_5"), METRICS.index("fc_repos")
+    w7, w14, w30 = (WINDOWS.index(w) for w in (7, 14, 30))
+
+    projected = trends["ewma"][:, :, w7] + HORIZON_DAYS * trends["slope"][:, :, w7]
+    enough = trends["n"][:, s, w7] >= 3
+
+    stress_up = enough & (projected[:, s] > 3.5)
+    sleep_debt = enough & (projected[:, sl] < 6) & (trends["slope"][:, sl, w14] < 0)
+    mood_down = enough & (projected[:, h] < 2)
+    fc_up = (
+        enough
+        & (trends["slope"][:, fc, w14] > 0.3)
+        & (trends["mean"][:, fc, w7] > trends["mean"][:, fc, w30] + 3)
+    )
+    positive = enough & (projected[:, s] < 2)
+
+    risks = []
+    for i in range(len(states)):
+        messages = []
+        if stress_up[i]:
+            messages.append("Stress en hausse probable sur 3 jours")
+        if sleep_debt[i]:
+            messages.append("Dette de sommeil en formation")
+        if mood_down[i]:
+            messages.append("Baisse d'humeur probable sur 3 jours")
+        if fc_up[i]:
+            messages.append("Fréquence cardiaque au repos en hausse (fatigue possible)")
+        if not messages and positive[i]:
+            messages.append("Tendance positive maintenue")
+        risks.append("; ".join(messages) if messages else None)
+    return risks
+
+
+def summarize_trends(state: TrendState) -> Dict[str, Dict[str, float]]:
+    """Résumé lisible des tendances d'un utilisateur pour la réponse d'analyse"""
+    trends = compute_trends([state])
+    summary = {}
+    for m_idx, metric in enumerate(METRICS):
+        values = {}
+        for w_idx, width in enumerate(WINDOWS):
+            if trends["n"][0, m_idx, w_idx] == 0:
+                continue
+            values[f"ewma_{width}"] = round(float(trends["ewma"][0, m_idx, w_idx]), 3)
+            values[f"pente_{width}"] = round(float(trends["slope"][0, m_idx, w_idx]), 4)
+        if values:
+            summary[metric] = values
+    return summary
+
+
+# -------------------
+# PERSISTANCE
+# -------------------
+
+def load_state(cursor, user_id: int) -> Optional[TrendState]:
+    cursor.execute("SELECT state FROM risk_state WHERE user_id = ?", (user_id,))
+    row = cursor.fetchone()
+    if not row:
+        return None
+    return TrendState.from_json(row["state"])
+
+
+def last_update(cursor, user_id: int):
+    """updated_at de l'état (dernière ingestion ou reconstruction), None sans état"""
+    cursor.execute("SELECT updated_at FROM risk_state WHERE user_id = ?", (user_id,))
+    row = cursor.fetchone()
+    return row["updated_at"] if row else None
+
+
+def save_state(cursor, user_id: int, state: TrendState) -> None:
+    cursor.execute(
+        cursor.dialect.upsert("risk_state", ["user_id", "state"], keys=["user_id"],
+                              timestamps=["updated_at"]),
+        (user_id, state.to_json()),
+    )
+
+
+def rebuild_state(cursor, user_id: int) -> TrendState:
+    """Reconstruit l'état à partir des 30 derniers jours (rattrapage hors ordre)"""
+    cursor.execute("""
+        SELECT date, sommeil_h, humeur_0_5, stress_0_5, fc_repos
+        FROM daily_data
+        WHERE user_id = ?
+        ORDER BY date DESC
+        LIMIT ?
+    """, (user_id, max(WINDOWS)))
+    state = TrendState.from_rows(dict(row) for row in cursor.fetchall())
+    save_state(cursor, user_id, state)
+    return state
+
+
+def record_observation(cursor, user_id: int, day, row: Dict) -> TrendState:
+    """
+    Met à jour l'état d'un utilisateur après l'ingestion d'une journée
+    O(1) si la journée est la plus récente, reconstruction sinon
+    (journée remplacée ou ajoutée dans le passé)
+    """
+    state = load_state(cursor, user_id)
+    if state is not None:
+        try:
+            state.push(day, row)
+        except ValueError:
+            return rebuild_state(cursor, user_id)
+        save_state(cursor, user_id, state)
+        return state
+    return rebuild_state(cursor, user_id)
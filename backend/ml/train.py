@@ -11,98 +11,228 @@ from sklearn.metrics import mean_squared_error, r2_score
 import joblib
 import os
 import sys
-sys.path.append(os.path.dirname(os.path.dirname(__file__)))
-from database import get_db
+import time
+from datetime import datetime
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from backend.database import SHARDS, fan_out, get_read_connection
+from backend import feature_store
+from backend.feature_store import decode
+from backend.ml.distill import load_manifest, save_manifest
+from backend.ml.model import FEATURE_VERSION, RAW_COLUMNS, calculate_score_simple, normalize_batch
 
 MODEL_DIR = os.path.dirname(__file__)
 MODEL_PATH = os.path.join(MODEL_DIR, "model.pkl")
 
-def generate_synthetic_data(n_samples=200):
- 
-    np.random.seed(76)
-    
-    data = []
-    for _ in range(n_samples):
-        sommeil = np.random.normal(7.5, 1.5)
-        pas = np.random.normal(8000, 3000)
-        sport = np.random.exponential(30)
-        calories = np.random.normal(2200, 400)
-        humeur = np.random.randint(2, 6)
-        stress = np.random.randint(1, 5)
-        fc = np.random.normal(65, 10)
-        
-        # Calcul du score cible (formule simplifiée)
-        score = (
-            20 * min(sommeil / 9.0, 1.0) +
-            15 * min(pas / 12000.0, 1.0) +
-            15 * min(sport / 90.0, 1.0) +
-            10 * min(calories / 3000.0, 1.0) +
-            20 * (humeur / 5.0) +
-            15 * (1.0 - stress / 5.0) +
-            5 * max(0, 1.0 - abs(fc - 60) / 30.0)
-        ) * 100
-        
-        score = max(0, min(100, score))
-        
-        data.append({
-            "sommeil_h": max(4, min(12, sommeil)),
-            "pas": max(0, int(pas)),
-            "sport_min": max(0, int(sport)),
-            "calories": max(1000, int(calories)),
-            "humeur_0_5": humeur,
-            "stress_0_5": stress,
-            "fc_repos": max(40, min(120, int(fc))),
-            "score": score
-        })
-    
-    return pd.DataFrame(data)
+# -------------------
+# DONNÉES SYNTHÉTIQUES
+# -------------------
+
+SYNTHETIC_SEED = 76
+SYNTHETIC_START = np.datetime64("2024-01-01")
+
+# Moyennes propres à chaque utilisateur : loi normale (moyenne, écart-type) dans l'ordre
+# de RAW_COLUMNS, sauf le sport (loi exponentielle de moyenne BASELINE_MEAN[2])
+BASELINE_MEAN = np.array([7.5, 8000, 30, 2200, 3.5, 2.5, 65])
+BASELINE_SD = np.array([0.8, 2000, 0, 300, 0.6, 0.7, 7])
+
+# Variation quotidienne autour de la moyenne de l'utilisateur (écart-type stationnaire)
+# et effet du week-end, dans l'ordre de RAW_COLUMNS (le sport suit une loi exponentielle)
+DAILY_SD = np.array([1.0, 2500, 0, 300, 0.8, 0.8, 4.0])
+WEEKEND_EFFECT = np.array([0.7, -1500, 10, 150, 0.3, -0.5, -1.0])
+AUTOCORRELATION = 0.7
+
+def synthetic_score(cols):
+    """Score cible (formule simplifiée) à partir des colonnes brutes ; les poids somment à 100"""
+    score = (
+        20 * np.minimum(cols["sommeil_h"] / 9.0, 1.0) +
+        15 * np.minimum(cols["pas"] / 12000.0, 1.0) +
+        15 * np.minimum(cols["sport_min"] / 90.0, 1.0) +
+        10 * np.minimum(cols["calories"] / 3000.0, 1.0) +
+        20 * (cols["humeur_0_5"] / 5.0) +
+        15 * (1.0 - cols["stress_0_5"] / 5.0) +
+        5 * np.maximum(0, 1.0 - np.abs(cols["fc_repos"] - 60) / 30.0)
+    )
+    return np.clip(score, 0, 100)
+
+def _finalize(cols):
+    """Score cible puis bornage des colonnes aux plages réalistes"""
+    cols["score"] = synthetic_score(cols)
+    cols["sommeil_h"] = np.clip(cols["sommeil_h"], 4, 12)
+    cols["pas"] = np.maximum(0, cols["pas"]).astype(np.int64)
+    cols["sport_min"] = np.maximum(0, cols["sport_min"]).astype(np.int64)
+    cols["calories"] = np.maximum(1000, cols["calories"]).astype(np.int64)
+    cols["fc_repos"] = np.clip(cols["fc_repos"], 40, 120).astype(np.int64)
+    return cols
+
+def generate_synthetic_data(n_samples=200, seed=SYNTHETIC_SEED):
+    """Journées indépendantes, tirées colonne par colonne"""
+    rng = np.random.default_rng(seed)
+    cols = {
+        "sommeil_h": rng.normal(7.5, 1.5, n_samples),
+        "pas": rng.normal(8000, 3000, n_samples),
+        "sport_min": rng.exponential(30, n_samples),
+        "calories": rng.normal(2200, 400, n_samples),
+        "humeur_0_5": rng.integers(2, 6, n_samples),
+        "stress_0_5": rng.integers(1, 5, n_samples),
+        "fc_repos": rng.normal(65, 10, n_samples),
+    }
+    return pd.DataFrame(_finalize(cols))
+
+def user_rng(seed, user, *stream):
+    """
+    Générateur propre à l'utilisateur `user` (enfant de SeedSequence(seed) de clé user) :
+    ses tirages ne dépendent ni du découpage en blocs ni de la répartition entre bases
+    """
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(int(user), *stream)))
+
+def generate_user_series(n_users, n_days, seed=SYNTHETIC_SEED, start=SYNTHETIC_START, first_user=0):
+    """
+    Séries temporelles de n_users utilisateurs sur n_days jours consécutifs
+    - moyennes propres à chaque utilisateur
+    - écarts quotidiens autocorrélés (AR(1)) : une mauvaise nuit en suit souvent une autre
+    - effet du week-end (plus de sommeil, moins de pas, moins de stress)
+    Retourne des colonnes à plat (n_users * n_days), utilisateur par utilisateur.
+    Les tirages de l'utilisateur first_user + i ne dépendent que de (seed, first_user + i)
+    """
+    n_metrics = len(RAW_COLUMNS)
+    baseline = np.empty((n_users, n_metrics))
+    innovations = np.empty((n_days, n_users, n_metrics))
+    sport = np.empty((n_days, n_users))
+    for i in range(n_users):
+        rng = user_rng(seed, first_user + i)
+        baseline[i] = rng.normal(BASELINE_MEAN, BASELINE_SD)
+        baseline[i, 2] = rng.exponential(BASELINE_MEAN[2])
+        innovations[:, i] = rng.standard_normal((n_days, n_metrics))
+        sport[:, i] = rng.standard_exponential(n_days)
+
+    # AR(1) vectorisé sur les utilisateurs et les métriques, variance stationnaire unitaire
+    deviation = np.empty_like(innovations)
+    deviation[0] = innovations[0]
+    scale = np.sqrt(1 - AUTOCORRELATION ** 2)
+    for day in range(1, n_days):
+        deviation[day] = AUTOCORRELATION * deviation[day - 1] + scale * innovations[day]
+
+    dates = start + np.arange(n_days)
+    # 1970-01-01 était un jeudi : samedi = 2, dimanche = 3
+    weekend = np.isin((dates - np.datetime64("1970-01-01")).astype(np.int64) % 7, (2, 3))
+    values = baseline[None] + deviation * DAILY_SD + weekend[:, None, None] * WEEKEND_EFFECT
+    values[..., 2] = np.maximum(values[..., 2], 1.0) * sport
+    values = values.transpose(1, 0, 2).reshape(-1, n_metrics)
+
+    cols = {"user": np.repeat(np.arange(first_user, first_user + n_users), n_days),
+            "date": np.tile(dates, n_users)}
+    cols.update((name, values[:, i]) for i, name in enumerate(RAW_COLUMNS))
+    cols["humeur_0_5"] = np.clip(np.rint(cols["humeur_0_5"]), 0, 5)
+    cols["stress_0_5"] = np.clip(np.rint(cols["stress_0_5"]), 0, 5)
+    return _finalize(cols)
+
+def iter_user_series(n_users, n_days, seed=SYNTHETIC_SEED, chunk_users=1000):
+    """
+    Génère les séries par blocs d'utilisateurs (mémoire bornée)
+    Chaque utilisateur a son propre flux aléatoire (user_rng) : la taille des blocs ne change pas les séries
+    """
+    for first in range(0, n_users, chunk_users):
+        count = min(chunk_users, n_users - first)
+        yield generate_user_series(count, n_days, seed=seed, first_user=first)
+
+def write_synthetic_arrays(path, n_users, n_days, seed=SYNTHETIC_SEED, chunk_users=1000):
+    """Écrit un fichier .npz prêt pour l'entraînement (X normalisé, y, user, date)"""
+    parts = {"X": [], "y": [], "user": [], "date": []}
+    for cols in iter_user_series(n_users, n_days, seed, chunk_users):
+        raw = np.column_stack([cols[c] for c in RAW_COLUMNS]).astype(float)
+        parts["X"].append(normalize_batch(raw))
+        parts["y"].append(cols["score"])
+        parts["user"].append(cols["user"])
+        parts["date"].append(cols["date"])
+    arrays = {key: np.concatenate(value) for key, value in parts.items()}
+    np.savez(path, **arrays)
+    return len(arrays["y"])
+
+def insert_synthetic_users(cursor, cols, shard=0, seed=SYNTHETIC_SEED):
+    """Opération d'écriture : crée un bloc d'utilisateurs synthétiques de la base `shard` et leurs journées"""
+    from backend.database import next_user_id
+
+    users = np.unique(cols["user"])
+    user_ids = []
+    for user in users:
+        # Flux distinct de celui des séries du même utilisateur
+        rng = user_rng(seed, user, 1)
+        age, genre = rng.integers(18, 70), rng.choice(["M", "F"])
+        user_id = next_user_id(cursor, shard)
+        if user_id is None:
+            cursor.execute("""
+                INSERT INTO users (age, genre, taille_cm, poids_kg, objectif)
+                VALUES (?, ?, ?, ?, ?)
+            """, (int(age), str(genre), 170.0, 70.0, "synthetique"))
+            user_id = cursor.lastrowid
+        else:
+            cursor.execute("""
+                INSERT INTO users (id, age, genre, taille_cm, poids_kg, objectif)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (user_id, int(age), str(genre), 170.0, 70.0, "synthetique"))
+        user_ids.append(user_id)
+
+    ids = np.asarray(user_ids)[np.searchsorted(users, cols["user"])]
+    dates = np.datetime_as_string(cols["date"], unit="D")
+    columns = ("user_id", "date") + RAW_COLUMNS
+    values = [ids.tolist(), dates.tolist()] + [cols[c].tolist() for c in RAW_COLUMNS]
+    cursor.executemany(
+        f"INSERT INTO daily_data ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+        list(zip(*values))
+    )
+    feature_store.recompute_users(cursor, user_ids)
+    return len(dates)
+
+def write_synthetic_db(n_users, n_days, seed=SYNTHETIC_SEED, chunk_users=1000):
+    """
+    Insère les séries dans la base, un bloc d'utilisateurs par transaction
+    Avec plusieurs bases, les utilisateurs d'un bloc sont répartis et écrits en parallèle
+    """
+    from backend.database import SHARDS, init_db
+    from backend.writer import get_writer, stop_writers
+
+    init_db()
+    total = 0
+    for cols in iter_user_series(n_users, n_days, seed, chunk_users):
+        shard_of_row = cols["user"] % len(SHARDS)
+        futures = []
+        for shard in SHARDS:
+            mask = shard_of_row == shard
+            if mask.any():
+                part = {key: value[mask] for key, value in cols.items()}
+                futures.append(get_writer(shard=shard).submit(insert_synthetic_users, part, shard, seed))
+        total += sum(future.result(timeout=600) for future in futures)
+    stop_writers()
+    return total
+
+# Journées avec leur score calculé et leur vecteur du feature store
+TRAINING_QUERY = """
+    SELECT d.id, d.date, d.updated_at, sommeil_h, pas, sport_min, calories, humeur_0_5, stress_0_5,
+           fc_repos, score, f.version AS feature_version, f.features
+    FROM daily_data d
+    LEFT JOIN analysis_results a ON d.user_id = a.user_id AND d.date = DATE(a.created_at)
+    LEFT JOIN feature_store f ON f.user_id = d.user_id AND f.date = d.date
+"""
 
 def load_training_data():
     """
     Charge les données d'entraînement depuis la base de données
     Combine avec des données synthétiques si nécessaire
     """
-    with get_db() as conn:
-        cursor = conn.cursor()
-        
-        # Récupérer toutes les données avec leurs scores calculés
-        cursor.execute("""
-            SELECT date, sommeil_h, pas, sport_min, calories, humeur_0_5, stress_0_5, fc_repos, score
-            FROM daily_data d
-            LEFT JOIN analysis_results a ON d.user_id = a.user_id AND d.date = DATE(a.created_at)
-            ORDER BY d.date DESC
-            LIMIT 1000
-        """)
-        rows = cursor.fetchall()
+    # Sur chaque base puis fusionnées (les 1000 journées les plus récentes)
+    def query(cursor):
+        cursor.execute(TRAINING_QUERY + " ORDER BY d.date DESC LIMIT 1000")
+        return [dict(row) for row in cursor.fetchall()]
+    
+    rows = sorted((row for rows in fan_out(query) for row in rows),
+                  key=lambda row: str(row["date"]), reverse=True)[:1000]
     
     if len(rows) < 50:
         # Pas assez de données réelles, utiliser des données synthétiques
         print("Pas assez de données réelles, génération de données synthétiques...")
         df = generate_synthetic_data(200)
     else:
-        # Convertir en DataFrame
-        data = []
-        for row in rows:
-            if row["score"] is None:
-                # Calculer le score si absent
-                from model import calculate_score_simple, normalize_features
-                features = normalize_features(dict(row))
-                score = calculate_score_simple(features)
-            else:
-                score = row["score"]
-            
-            data.append({
-                "sommeil_h": row["sommeil_h"] or 7.0,
-                "pas": row["pas"] or 5000,
-                "sport_min": row["sport_min"] or 0,
-                "calories": row["calories"] or 2000,
-                "humeur_0_5": row["humeur_0_5"] or 3,
-                "stress_0_5": row["stress_0_5"] or 3,
-                "fc_repos": row["fc_repos"] or 70,
-                "score": score
-            })
-        
-        df = pd.DataFrame(data)
+        df = rows_to_frame(rows)
         
         # Compléter avec des données synthétiques si nécessaire
         if len(df) < 100:
@@ -111,30 +241,75 @@ def load_training_data():
     
     return df
 
+def rows_to_frame(rows):
+    """Lignes de TRAINING_QUERY -> DataFrame ; les vecteurs à jour du feature store sont réutilisés tels quels"""
+    data = []
+    for row in rows:
+        features = None
+        if row["features"] is not None and row["feature_version"] == FEATURE_VERSION:
+            features = decode(row["features"])
+        
+        if row["score"] is None:
+            # Calculer le score si absent
+            if features is None:
+                features = normalize_batch(np.array([[
+                    np.nan if row[c] is None else row[c] for c in RAW_COLUMNS
+                ]], dtype=float))
+            score = calculate_score_simple(features)
+        else:
+            score = row["score"]
+        
+        data.append({
+            "sommeil_h": row["sommeil_h"] or 7.0,
+            "pas": row["pas"] or 5000,
+            "sport_min": row["sport_min"] or 0,
+            "calories": row["calories"] or 2000,
+            "humeur_0_5": row["humeur_0_5"] or 3,
+            "stress_0_5": row["stress_0_5"] or 3,
+            "fc_repos": row["fc_repos"] or 70,
+            "features": features,
+            "score": score
+        })
+    
+    return pd.DataFrame(data)
+
 def prepare_features(df):
     """
     Prépare les features pour l'entraînement
+    Normalisation vectorisée, sauf pour les lignes dont le vecteur vient du feature store
     """
-    from model import normalize_features
+    X = normalize_batch(df[list(RAW_COLUMNS)].to_numpy(dtype=float))
     
-    X = []
-    for _, row in df.iterrows():
-        features = normalize_features(row.to_dict())
-        X.append(features.flatten())
+    if "features" in df:
+        stored = df["features"].map(lambda v: isinstance(v, np.ndarray))
+        if stored.any():
+            X[stored.to_numpy()] = np.vstack(df.loc[stored, "features"].to_list())
     
-    return np.array(X), df["score"].values
+    return X, df["score"].values
 
-def train_model():
+def train_model(arrays_path=None):
     """
     Entraîne le modèle RandomForest
+    arrays_path : fichier .npz (X, y) produit par write_synthetic_arrays, à la place de la base
     """
-    print("Chargement des données d'entraînement...")
-    df = load_training_data()
-    
-    print(f"Nombre d'échantillons: {len(df)}")
-    
-    print("Préparation des features...")
-    X, y = prepare_features(df)
+    started = time.perf_counter()
+    if arrays_path:
+        print(f"Chargement des tableaux d'entraînement {arrays_path}...")
+        with np.load(arrays_path) as arrays:
+            X, y = arrays["X"], arrays["y"]
+        print(f"Nombre d'échantillons: {len(y)}")
+        # Données hors base : un rafraîchissement ultérieur repartira de toutes les journées
+        watermark = None
+    else:
+        # Relevé avant le chargement : une journée insérée entre-temps sera revue au rafraîchissement
+        watermark = current_watermark()
+        print("Chargement des données d'entraînement...")
+        df = load_training_data()
+        
+        print(f"Nombre d'échantillons: {len(df)}")
+        
+        print("Préparation des features...")
+        X, y = prepare_features(df)
     
     print("Division train/test...")
     X_train, X_test, y_train, y_test = train_test_split(
@@ -142,13 +317,7 @@ def train_model():
     )
     
     print("Entraînement du modèle RandomForest...")
-    model = RandomForestRegressor(
-        n_estimators=100,
-        max_depth=10,
-        min_samples_split=5,
-        random_state=42,
-        n_jobs=-1
-    )
+    model = build_forest()
     
     model.fit(X_train, y_train)
     
@@ -168,11 +337,215 @@ def train_model():
     print(f"  R² Test: {test_r2:.3f}")
     
     print(f"\nSauvegarde du modèle dans {MODEL_PATH}...")
-    joblib.dump(model, MODEL_PATH)
+    promote(model, {
+        "mode": "full",
+        "watermark": watermark,
+        "n_samples": int(len(y)),
+        "test_mse": round(float(test_mse), 4),
+        "seconds": round(time.perf_counter() - started, 2),
+    })
     print("Modèle sauvegardé avec succès!")
     
     return model, test_r2
 
+def build_forest():
+    return RandomForestRegressor(
+        n_estimators=100,
+        max_depth=10,
+        min_samples_split=5,
+        random_state=42,
+        n_jobs=-1
+    )
+
+def promote(model, training):
+    """Remplace le modèle servi (écriture atomique) et enregistre sa version dans le manifeste"""
+    tmp_path = MODEL_PATH + ".tmp"
+    joblib.dump(model, tmp_path)
+    os.replace(tmp_path, MODEL_PATH)
+    
+    manifest = load_manifest()
+    previous = manifest.get("training", {})
+    manifest["training"] = {
+        "version": previous.get("version", 0) + 1,
+        "trained_at": datetime.now().isoformat(timespec="seconds"),
+        "n_estimators": len(model.estimators_),
+        **training,
+    }
+    save_manifest(manifest)
+    return manifest["training"]
+
+# -------------------
+# RAFRAÎCHISSEMENT INCRÉMENTAL
+# -------------------
+
+# Arbres ajoutés (et plus anciens arbres retirés) par rafraîchissement
+REFRESH_TREES = 20
+# Journées nouvelles minimales pour rafraîchir, part réservée à la validation
+REFRESH_MIN_ROWS = 200
+REFRESH_HOLDOUT = 0.2
+# Dégradation relative de la MSE tolérée sur la validation avant de refuser la promotion
+REFRESH_TOLERANCE = 0.05
+
+def current_watermark():
+    """
+    Filigrane des données, par base : dernier id de daily_data (journées ajoutées)
+    et dernier updated_at (journées corrigées par l'upsert d'ingestion)
+    """
+    ids, stamps = [], []
+    for shard in SHARDS:
+        conn = get_read_connection(shard=shard)
+        row = conn.execute(
+            "SELECT COALESCE(MAX(id), 0) AS last_id, MAX(updated_at) AS last_update FROM daily_data"
+        ).fetchone()
+        conn.close()
+        ids.append(row["last_id"])
+        stamps.append(_stamp(row["last_update"]))
+    return {"shards": len(SHARDS), "daily_data_id": ids, "updated_at": stamps}
+
+def _stamp(value):
+    return None if value is None else str(value)
+
+def load_rows_since(watermark):
+    """
+    Journées ajoutées ou corrigées après le filigrane, et filigrane couvrant ces journées
+    updated_at est à la seconde : les journées écrites dans la seconde du filigrane sont
+    relues au rafraîchissement suivant plutôt que risquer d'en manquer une
+    """
+    if watermark is None:
+        after, since = [0] * len(SHARDS), [None] * len(SHARDS)
+    elif watermark.get("shards") != len(SHARDS):
+        raise ValueError(
+            f"Filigrane relevé sur {watermark.get('shards')} base(s), {len(SHARDS)} actives : "
+            "relancer un entraînement complet"
+        )
+    else:
+        after = watermark["daily_data_id"]
+        # Filigrane antérieur à updated_at : seules les journées ajoutées sont suivies
+        since = watermark.get("updated_at") or [None] * len(SHARDS)
+    
+    rows, ids, stamps = [], [], []
+    for shard in SHARDS:
+        conn = get_read_connection(shard=shard)
+        cursor = conn.cursor()
+        if since[shard] is None:
+            cursor.execute(TRAINING_QUERY + " WHERE d.id > ? ORDER BY d.id", (after[shard],))
+        else:
+            cursor.execute(TRAINING_QUERY + " WHERE d.id > ? OR d.updated_at >= ? ORDER BY d.id",
+                           (after[shard], since[shard]))
+        shard_rows = [dict(row) for row in cursor.fetchall()]
+        conn.close()
+        rows.extend(shard_rows)
+        ids.append(max((row["id"] for row in shard_rows), default=after[shard]))
+        updates = [_stamp(row["updated_at"]) for row in shard_rows if row["updated_at"] is not None]
+        stamps.append(max(updates + ([since[shard]] if since[shard] is not None else []), default=None))
+    return rows, {"shards": len(SHARDS), "daily_data_id": ids, "updated_at": stamps}
+
+def refresh_forest(model, X, y, n_trees=REFRESH_TREES, random_state=None):
+    """
+    Ajoute n_trees arbres ajustés sur (X, y) seulement (warm start), puis retire
+    les n_trees plus anciens : la forêt garde sa taille et couvre une fenêtre
+    glissante des données. Modifie et retourne `model`.
+    random_state : graine des nouveaux arbres. La forêt dérive leurs graines de sa
+    taille, constante ici : sans nouvelle graine, chaque rafraîchissement tirerait
+    les mêmes.
+    """
+    total = len(model.estimators_)
+    if not 0 < n_trees < total:
+        raise ValueError(f"n_trees doit être entre 1 et {total - 1}")
+    if random_state is not None:
+        model.set_params(random_state=random_state)
+    model.set_params(warm_start=True, n_estimators=total + n_trees)
+    model.fit(X, y)
+    # Les arbres sont ajoutés en fin de liste : les plus anciens sont en tête
+    model.estimators_ = model.estimators_[n_trees:]
+    model.set_params(warm_start=False, n_estimators=total)
+    return model
+
+def refresh_model(n_trees=REFRESH_TREES, min_rows=REFRESH_MIN_ROWS, tolerance=REFRESH_TOLERANCE):
+    """
+    Rafraîchit le modèle servi avec les journées ajoutées depuis sa version
+    (filigrane du manifeste), et ne le promeut que s'il fait au moins aussi
+    bien que le modèle actuel sur une part réservée de ces journées.
+    Retourne un rapport (promu ou non, MSE avant/après, durée).
+    """
+    started = time.perf_counter()
+    if not os.path.exists(MODEL_PATH):
+        raise FileNotFoundError(f"Modèle introuvable ({MODEL_PATH}) : lancer d'abord l'entraînement complet")
+    model = joblib.load(MODEL_PATH)
+    if not isinstance(model, RandomForestRegressor):
+        raise ValueError("Le rafraîchissement incrémental ne s'applique qu'à la forêt")
+    
+    training = load_manifest().get("training", {})
+    rows, new_watermark = load_rows_since(training.get("watermark"))
+    report = {"new_rows": len(rows), "promoted": False}
+    if len(rows) < min_rows:
+        report["reason"] = f"moins de {min_rows} journées nouvelles"
+        return report
+    
+    X, y = prepare_features(rows_to_frame(rows))
+    X_fit, X_holdout, y_fit, y_holdout = train_test_split(
+        X, y, test_size=REFRESH_HOLDOUT, random_state=42
+    )
+    current_mse = mean_squared_error(y_holdout, model.predict(X_holdout))
+    # Graine propre à chaque version : reproductible, différente d'un rafraîchissement à l'autre
+    refresh_forest(model, X_fit, y_fit, n_trees, random_state=42 + training.get("version", 0))
+    refreshed_mse = mean_squared_error(y_holdout, model.predict(X_holdout))
+    report.update(current_mse=round(float(current_mse), 4), refreshed_mse=round(float(refreshed_mse), 4))
+    
+    if refreshed_mse > current_mse * (1 + tolerance):
+        # Filigrane inchangé : ces journées seront reprises au prochain rafraîchissement
+        report["reason"] = "MSE de validation dégradée"
+    else:
+        report["promoted"] = True
+        report["version"] = promote(model, {
+            "mode": "incremental",
+            "watermark": new_watermark,
+            "n_samples": len(y_fit),
+            "test_mse": report["refreshed_mse"],
+            "seconds": round(time.perf_counter() - started, 2),
+        })["version"]
+    report["seconds"] = round(time.perf_counter() - started, 2)
+    return report
+
 if __name__ == "__main__":
-    train_model()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Entraînement du modèle et génération de données synthétiques")
+    parser.add_argument("--synthetic-users", type=int, default=0,
+                        help="générer les séries de N utilisateurs au lieu d'entraîner")
+    parser.add_argument("--days", type=int, default=90, help="jours par utilisateur")
+    parser.add_argument("--seed", type=int, default=SYNTHETIC_SEED)
+    parser.add_argument("--chunk-users", type=int, default=1000)
+    parser.add_argument("--to-db", action="store_true", help="écrire les séries dans la base")
+    parser.add_argument("--to-arrays", metavar="FICHIER.npz", help="écrire les séries dans un fichier d'entraînement")
+    parser.add_argument("--from-arrays", metavar="FICHIER.npz", help="entraîner sur un fichier d'entraînement")
+    parser.add_argument("--refresh", action="store_true",
+                        help="rafraîchir le modèle avec les journées ajoutées depuis sa version")
+    parser.add_argument("--trees", type=int, default=REFRESH_TREES, help="arbres remplacés par rafraîchissement")
+    args = parser.parse_args()
+
+    if args.synthetic_users:
+        if not (args.to_db or args.to_arrays):
+            parser.error("--synthetic-users requiert --to-db ou --to-arrays")
+        started = time.perf_counter()
+        if args.to_arrays:
+            n_rows = write_synthetic_arrays(args.to_arrays, args.synthetic_users, args.days,
+                                            args.seed, args.chunk_users)
+            print(f"{n_rows} journées écrites dans {args.to_arrays}")
+        if args.to_db:
+            n_rows = write_synthetic_db(args.synthetic_users, args.days, args.seed, args.chunk_users)
+            print(f"{n_rows} journées insérées dans la base")
+        elapsed = time.perf_counter() - started
+        print(f"Terminé en {elapsed:.2f}s ({n_rows / max(elapsed, 1e-9):.0f} journées/s)")
+    elif args.refresh:
+        report = refresh_model(args.trees)
+        print(f"{report['new_rows']} journées nouvelles")
+        if "current_mse" in report:
+            print(f"MSE de validation : {report['current_mse']:.2f} (actuel) -> {report['refreshed_mse']:.2f}")
+        if report["promoted"]:
+            print(f"Modèle rafraîchi promu (version {report['version']}) en {report['seconds']:.2f}s")
+        else:
+            print(f"Modèle inchangé : {report['reason']}")
+    else:
+        train_model(args.from_arrays)
 
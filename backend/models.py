@@ -3,9 +3,10 @@ Modèles Pydantic pour la validation des données
 """
 
 
-from pydantic import BaseModel, Field
-from typing import Optional, List, Dict
+from pydantic import BaseModel, Field, FiniteFloat
+from typing import Annotated, Optional, List, Dict
 from datetime import date as date_type
+from backend import config
 
 class UserCreate(BaseModel):
     age: int = Field(..., ge=1, le=120, description="Âge de l'utilisateur")
@@ -65,9 +66,43 @@ class AnalysisResponse(BaseModel):
     score: float = Field(..., ge=0, le=100, description="Score de bien-être (0-100)")
     category: str = Field(..., description="Catégorie de bien-être")
     risk_prediction: Optional[str] = Field(None, description="Prédiction de risque")
+    trends: Optional[Dict[str, Dict[str, float]]] = Field(None, description="EWMA et pentes par métrique (7/14/30 jours)")
     explanations: Dict[str, str] = Field(..., description="Explications par dimension")
     recommendations: List[str] = Field(..., description="Recommandations personnalisées")
 
+class AnalysisHistoryEntry(BaseModel):
+    day: str
+    score_avg: float
+    score_min: Optional[float]
+    score_max: Optional[float]
+    n_results: int
+    category: Optional[str]
+    risk_prediction: Optional[str]
+
+class AnalysisHistoryPage(BaseModel):
+    items: List[AnalysisHistoryEntry]
+    next_before: Optional[str] = Field(None, description="Curseur de la page suivante (paramètre before)")
+
+class SimulationRequest(BaseModel):
+    # Une liste ne peut à elle seule dépasser le plafond de la grille
+    deltas: Dict[str, Annotated[List[FiniteFloat], Field(max_length=config.SIMULATION_MAX_SCENARIOS)]] = Field(
+        ..., description="Écarts (finis) à tester par métrique, ex. {\"sommeil_h\": [0, 0.5, 1], \"pas\": [0, 3000]} (grille complète)"
+    )
+    sustained: bool = Field(False, description="Appliquer les écarts aux 3 derniers jours (habitude) plutôt qu'à la dernière journée")
+    top: int = Field(10, ge=1, le=500, description="Nombre de scénarios retournés")
+
+class SimulationScenario(BaseModel):
+    deltas: Dict[str, float]
+    score: float
+    category: str
+    improvement: float = Field(..., description="Écart de score par rapport à la situation actuelle")
+
+class SimulationResponse(BaseModel):
+    baseline_score: float
+    baseline_category: str
+    n_scenarios: int
+    scenarios: List[SimulationScenario] = Field(..., description="Scénarios classés par amélioration décroissante")
+
 class User(BaseModel):
     id: int
     age: int
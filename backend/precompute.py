@@ -0,0 +1,344 @@
+"""
+Précalcul planifié des analyses
+
+L'analyse est calculée au premier chargement du dashboard, si bien que le pic
+du matin sollicite le modèle et la base en même temps. Ce job calcule à
+l'avance l'analyse des utilisateurs ayant de nouvelles données depuis leur
+dernier résultat (risk_state.updated_at, mis à jour à chaque ingestion, au
+moins égal au dernier analysis_results.created_at : les horodatages sont à
+la seconde, une ingestion de la même seconde que le résultat est recalculée).
+analyze_user sert ensuite ces résultats tant qu'aucune journée n'est ingérée
+et que le modèle servi reste le même (model_version) ; après un changement de
+modèle, tous les utilisateurs redeviennent candidats.
+
+Les utilisateurs sont traités par blocs, répartis sur un pool de processus :
+chaque processus lit son bloc sur une connexion en lecture seule, score tous
+les vecteurs du bloc en un seul predict et calcule les risques en un seul
+calcul vectorisé. Les résultats d'un bloc sont écrits en une opération de
+l'écrivain de sa base, avec le curseur de reprise de cette base (dernier
+utilisateur traité) : un job interrompu reprend après le dernier bloc écrit.
+
+Utilisation : python -m backend.precompute [--workers 4] [--chunk 500]
+En tâche de fond : ELEVAI_PRECOMPUTE_AT="05:30" (heure locale, chaque jour)
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from backend import config
+from backend.database import SHARDS, get_read_connection
+from backend.writer import get_writer, stop_writers
+
+CURSOR_KEY = "precompute_last_user_id"
+
+# Dernière exécution (ou exécution en cours), exposée par GET /admin/precompute
+progress = {"running": False}
+
+
+# -------------------
+# SÉLECTION
+# -------------------
+
+_CANDIDATES = """
+    FROM users u
+    LEFT JOIN risk_state s ON s.user_id = u.id
+    WHERE u.id > ?
+      AND EXISTS (SELECT 1 FROM daily_data d WHERE d.user_id = u.id)
+      AND NOT EXISTS (SELECT 1 FROM analysis_results r
+                      WHERE r.user_id = u.id AND r.created_at > s.updated_at AND r.model_version = ?)
+"""
+
+
+def count_candidates(cursor, after_id: int, version: str) -> int:
+    cursor.execute(f"SELECT COUNT(*) AS n {_CANDIDATES}", (after_id, version))
+    return cursor.fetchone()["n"]
+
+
+def next_candidates(cursor, after_id: int, limit: int, version: str) -> List[int]:
+    """Prochain bloc d'utilisateurs sans résultat à jour pour le modèle `version` (pagination par id)"""
+    cursor.execute(f"SELECT u.id AS user_id {_CANDIDATES} ORDER BY u.id LIMIT ?", (after_id, version, limit))
+    return [row["user_id"] for row in cursor.fetchall()]
+
+
+def get_cursor(cursor) -> int:
+    cursor.execute("SELECT value FROM maintenance_state WHERE name = ?", (CURSOR_KEY,))
+    row = cursor.fetchone()
+    return int(row["value"]) if row else 0
+
+
+def set_cursor(cursor, value: int) -> None:
+    cursor.execute(
+        cursor.dialect.upsert("maintenance_state", ["name", "value"], keys=["name"]),
+        (CURSOR_KEY, str(value)),
+    )
+
+
+# -------------------
+# CALCUL D'UN BLOC (processus du pool)
+# -------------------
+
+def _init_worker():
+    from backend.ml.model import load_model
+    load_model()
+
+
+def compute_chunk(shard: int, user_ids: List[int]) -> Dict:
+    """
+    Analyses d'un bloc d'utilisateurs de la base `shard` : un predict pour tout le bloc
+    Retourne les lignes à insérer et les états de tendance reconstruits
+    """
+    from backend import feature_store
+    from backend.ml import risk
+    from backend.ml.model import (
+        build_features, categorize, get_explanations, get_recommendations, model_version, score_features
+    )
+
+    placeholders = ", ".join("?" for _ in user_ids)
+    conn = get_read_connection(shard=shard)
+    try:
+        cursor = conn.cursor()
+        # 30 dernières journées par utilisateur, comme analyze_user
+        cursor.execute(f"""
+            SELECT user_id, date, sommeil_h, pas, sport_min, calories, humeur_0_5, stress_0_5, fc_repos
+            FROM (
+                SELECT d.*, ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY date DESC) AS rank_desc
+                FROM daily_data d WHERE user_id IN ({placeholders})
+            ) AS recent
+            WHERE rank_desc <= 30
+            ORDER BY user_id, date DESC
+        """, user_ids)
+        rows_by_user = {}
+        for row in cursor.fetchall():
+            rows_by_user.setdefault(row["user_id"], []).append(dict(row))
+
+        cursor.execute(f"SELECT user_id, state, updated_at FROM risk_state WHERE user_id IN ({placeholders})",
+                       user_ids)
+        states, stamps = {}, {}
+        for row in cursor.fetchall():
+            states[row["user_id"]] = risk.TrendState.from_json(row["state"])
+            stamps[row["user_id"]] = row["updated_at"]
+
+        cursor.execute(f"""
+            SELECT f.user_id, f.version, f.smoothed
+            FROM feature_store f
+            JOIN (SELECT user_id, MAX(date) AS date FROM daily_data
+                  WHERE user_id IN ({placeholders}) GROUP BY user_id) AS latest
+              ON latest.user_id = f.user_id AND latest.date = f.date
+        """, user_ids)
+        vectors = {row["user_id"]: feature_store.decode(row["smoothed"]) for row in cursor.fetchall()
+                   if row["version"] == feature_store.FEATURE_VERSION}
+    finally:
+        conn.close()
+
+    users = [user_id for user_id in user_ids if user_id in rows_by_user]
+    if not users:
+        return {"results": [], "states": [], "stamps": {}, "version": None}
+
+    features = np.vstack([
+        vectors[user_id] if user_id in vectors
+        else build_features(rows_by_user[user_id][0], rows_by_user[user_id][:7])
+        for user_id in users
+    ])
+    version = model_version()
+    scores = score_features(features)
+
+    rebuilt = []
+    trend_states = []
+    for user_id in users:
+        rows = rows_by_user[user_id]
+        state = states.get(user_id)
+        if state is None or state.last_day != str(rows[0]["date"])[:10]:
+            state = risk.TrendState.from_rows(reversed(rows))
+            rebuilt.append((user_id, state.to_json()))
+        trend_states.append(state)
+    risk_predictions = risk.score_risks(trend_states)
+
+    results = []
+    for user_id, score, risk_prediction in zip(users, scores, risk_predictions):
+        rows = rows_by_user[user_id]
+        latest_data, recent_data = rows[0], rows[:7]
+        category = categorize(float(score))
+        score = round(float(score), 1)
+        explanations = get_explanations(latest_data, recent_data)
+        recommendations = get_recommendations(score, latest_data, recent_data, explanations)
+        results.append((user_id, score, category, risk_prediction,
+                        json.dumps(explanations), json.dumps(recommendations), version))
+    return {"results": results, "states": rebuilt, "stamps": {user_id: stamps.get(user_id) for user_id in users},
+            "version": version}
+
+
+# -------------------
+# ÉCRITURE GROUPÉE
+# -------------------
+
+def save_chunk(cursor, results: List[tuple], states: List[tuple], last_user_id: int,
+               stamps: Dict[int, object] = None) -> int:
+    """
+    Opération d'écriture : résultats d'un bloc, états reconstruits et curseur de reprise
+    Les utilisateurs dont l'état a changé depuis la lecture (`stamps` : updated_at lu) sont
+    écartés : une journée ingérée entre-temps rendrait leur résultat périmé
+    """
+    from backend.ml import risk
+
+    if stamps is not None:
+        stale = {user_id for user_id, stamp in stamps.items() if risk.last_update(cursor, user_id) != stamp}
+        results = [result for result in results if result[0] not in stale]
+        states = [state for state in states if state[0] not in stale]
+    # États d'abord : leur updated_at ne doit pas dépasser le created_at des résultats
+    for user_id, payload in states:
+        # Ne pas écraser un état plus récent écrit entre-temps par une ingestion
+        state = risk.TrendState.from_json(payload)
+        stored = risk.load_state(cursor, user_id)
+        if stored is None or stored.last_day < state.last_day:
+            risk.save_state(cursor, user_id, state)
+    if results:
+        cursor.executemany("""
+            INSERT INTO analysis_results
+            (user_id, score, category, risk_prediction, explanations, recommendations, model_version)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, results)
+    set_cursor(cursor, last_user_id)
+    return len(results)
+
+
+def _finish(cursor) -> None:
+    set_cursor(cursor, 0)
+
+
+# -------------------
+# EXÉCUTION
+# -------------------
+
+def _chunks(cursors: List[int], chunk_size: int, version: str):
+    """Blocs (base, utilisateurs) à recalculer, base par base à partir des curseurs de reprise"""
+    for shard in SHARDS:
+        after_id = cursors[shard]
+        while True:
+            conn = get_read_connection(shard=shard)
+            try:
+                user_ids = next_candidates(conn.cursor(), after_id, chunk_size, version)
+            finally:
+                conn.close()
+            if not user_ids:
+                break
+            after_id = user_ids[-1]
+            yield shard, user_ids
+
+
+def run(workers: int = None, chunk_size: int = None, report=None) -> Dict:
+    """
+    Précalcule les analyses de tous les utilisateurs ayant de nouvelles données
+    Reprend après le dernier bloc écrit si une exécution précédente a été interrompue
+    """
+    workers = config.PRECOMPUTE_WORKERS if workers is None else workers
+    chunk_size = chunk_size or config.PRECOMPUTE_CHUNK
+
+    from backend.ml.model import model_version
+
+    version = model_version()
+    cursors, total = [], 0
+    for shard in SHARDS:
+        conn = get_read_connection(shard=shard)
+        try:
+            cursor = conn.cursor()
+            cursors.append(get_cursor(cursor))
+            total += count_candidates(cursor, cursors[-1], version)
+        finally:
+            conn.close()
+
+    started = time.perf_counter()
+    progress.clear()
+    progress.update(running=True, started_at=datetime.now().isoformat(timespec="seconds"),
+                    resumed_after=cursors, candidates=total, users=0, chunks=0, users_per_s=0.0)
+
+    pool = None
+    if workers > 0:
+        # spawn : pas de fork d'un processus qui possède déjà des threads
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=_init_worker)
+    try:
+        chunks = _chunks(cursors, chunk_size, version)
+        pending = deque()
+        while True:
+            # Au plus 2 blocs en cours par processus ; les blocs sont écrits dans l'ordre
+            for shard, user_ids in chunks:
+                task = pool.submit(compute_chunk, shard, user_ids) if pool else compute_chunk(shard, user_ids)
+                pending.append((shard, user_ids[-1], task))
+                if len(pending) >= max(workers, 1) * 2:
+                    break
+            if not pending:
+                break
+
+            shard, last_user_id, task = pending.popleft()
+            chunk = task.result() if pool else task
+            written = get_writer(shard=shard).execute(
+                save_chunk, chunk["results"], chunk["states"], last_user_id, chunk["stamps"], timeout=300
+            )
+
+            elapsed = time.perf_counter() - started
+            progress["users"] += written
+            progress["chunks"] += 1
+            progress["users_per_s"] = round(progress["users"] / max(elapsed, 1e-9), 1)
+            if report:
+                report(progress)
+
+        for shard in SHARDS:
+            get_writer(shard=shard).execute(_finish)
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+        progress["running"] = False
+        progress["elapsed_s"] = round(time.perf_counter() - started, 2)
+    return dict(progress)
+
+
+def seconds_until(at: str, now: Optional[datetime] = None) -> float:
+    """Délai jusqu'à la prochaine occurrence de l'heure locale "HH:MM" """
+    now = now or datetime.now()
+    hour, minute = (int(part) for part in at.split(":"))
+    target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if target <= now:
+        target += timedelta(days=1)
+    return (target - now).total_seconds()
+
+
+async def run_scheduled(at: str = None) -> None:
+    """Tâche de fond : précalcul quotidien à l'heure ELEVAI_PRECOMPUTE_AT"""
+    at = at or config.PRECOMPUTE_AT
+    while True:
+        await asyncio.sleep(seconds_until(at))
+        try:
+            stats = await asyncio.to_thread(run)
+            print(f"Précalcul: {stats['users']} analyses en {stats['elapsed_s']}s")
+        except Exception as e:
+            progress["running"] = False
+            print(f"Erreur du précalcul des analyses: {e}", file=sys.stderr)
+
+
+def _print_progress(state: Dict) -> None:
+    print(f"  {state['users']}/{state['candidates']} utilisateurs, {state['chunks']} blocs "
+          f"({state['users_per_s']:.0f} utilisateurs/s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Précalcul des analyses des utilisateurs ayant de nouvelles données")
+    parser.add_argument("--workers", type=int, default=config.PRECOMPUTE_WORKERS,
+                        help="processus de calcul (0 = dans ce processus)")
+    parser.add_argument("--chunk", type=int, default=config.PRECOMPUTE_CHUNK, help="utilisateurs par bloc")
+    args = parser.parse_args()
+
+    result = run(args.workers, args.chunk, report=_print_progress)
+    stop_writers()
+    resumed = f" (reprise, curseurs {result['resumed_after']})" if any(result["resumed_after"]) else ""
+    print(f"Précalcul terminé en {result['elapsed_s']}s{resumed}: {result['users']} analyses, "
+          f"{result['chunks']} blocs, {result['users_per_s']:.0f} utilisateurs/s")
@@ -0,0 +1,167 @@
+"""
+Repartitionnement des bases SQLite (DB_SHARDS)
+
+Redistribue les données de N bases vers M bases selon la règle de
+backend.database (l'utilisateur `id` vit dans la base (id - 1) % M) :
+1. les nouvelles bases sont écrites dans des fichiers temporaires ;
+2. les effectifs de chaque table sont comparés à ceux des sources ;
+3. les anciens fichiers sont renommés en sauvegarde (.pre-reshard-<date>) et
+   les nouveaux prennent leur place.
+
+Les identifiants des utilisateurs sont conservés ; ceux de daily_data et
+analysis_results sont réattribués par la base cible. Le curseur de
+compaction est recalculé pour chaque base cible.
+
+L'API doit être arrêtée pendant l'opération, puis redémarrée avec DB_SHARDS=M.
+Utilisation : python -m backend.reshard --to 4 [--from 1]
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+from backend.database import DB_BACKEND, DB_PATH, DB_SHARDS, SQLiteStorage, init_db, shard_path
+from backend.retention import WATERMARK_KEY
+
+# Tables par utilisateur et colonne portant l'identifiant de l'utilisateur
+USER_TABLES = {
+    "users": "id",
+    "daily_data": "user_id",
+    "risk_state": "user_id",
+    "analysis_history": "user_id",
+    "feature_store": "user_id",
+}
+FETCH_SIZE = 5000
+
+
+def _watermark(conn) -> int:
+    row = conn.execute("SELECT value FROM maintenance_state WHERE name = ?", (WATERMARK_KEY,)).fetchone()
+    return int(row["value"]) if row else 0
+
+
+def copy_rows(sources: List, targets: List, table: str, key: str, drop=(), where: str = "",
+              params: Dict = None) -> int:
+    """Copie une table des bases sources vers les bases cibles, routée par utilisateur"""
+    copied = 0
+    for index, source in enumerate(sources):
+        cursor = source.cursor()
+        cursor.execute(f"SELECT * FROM {table} {where} ORDER BY rowid",
+                       params[index] if params else ())
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                break
+            columns = [c for c in rows[0].keys() if c not in drop]
+            insert = (f"INSERT INTO {table} ({', '.join(columns)}) "
+                      f"VALUES ({', '.join('?' for _ in columns)})")
+            by_target = {}
+            for row in rows:
+                by_target.setdefault((row[key] - 1) % len(targets), []).append([row[c] for c in columns])
+            for target, values in by_target.items():
+                targets[target].cursor().executemany(insert, values)
+            copied += len(rows)
+    return copied
+
+
+def count_rows(connections: List, table: str) -> int:
+    return sum(conn.execute(f"SELECT COUNT(*) AS n FROM {table}").fetchone()["n"] for conn in connections)
+
+
+def reshard(from_count: int, to_count: int, base_path: Path = DB_PATH) -> Dict[str, int]:
+    """Redistribue les données ; retourne le nombre de lignes copiées par table"""
+    source_paths = [shard_path(base_path, shard, from_count) for shard in range(from_count)]
+    missing = [str(path) for path in source_paths if not path.exists()]
+    if missing:
+        raise FileNotFoundError(f"Bases sources introuvables: {', '.join(missing)}")
+
+    final_paths = [shard_path(base_path, shard, to_count) for shard in range(to_count)]
+    temp_paths = [path.with_name(path.name + ".resharding") for path in final_paths]
+    for path in temp_paths:
+        for suffix in ("", "-wal", "-shm"):
+            Path(str(path) + suffix).unlink(missing_ok=True)
+
+    target_storages = [SQLiteStorage(path) for path in temp_paths]
+    for target in target_storages:
+        init_db(target)
+
+    sources = [SQLiteStorage(path).connect() for path in source_paths]
+    targets = [target.connect() for target in target_storages]
+    copied = {}
+    try:
+        for table, key in USER_TABLES.items():
+            # Identifiants réattribués par la base cible
+            drop = ("id",) if table == "daily_data" else ()
+            copied[table] = copy_rows(sources, targets, table, key, drop=drop)
+
+        # Historique : last_result_id désigne un résultat de l'ancienne base ; 0 = plus ancien que tout
+        # nouveau résultat, qui l'emporte donc à la fusion (retention._merge)
+        for target in targets:
+            target.execute("UPDATE analysis_history SET last_result_id = 0")
+
+        # Résultats déjà agrégés d'abord, pour que le curseur de compaction les couvre exactement
+        watermarks = [_watermark(source) for source in sources]
+        rolled = copy_rows(sources, targets, "analysis_results", "user_id", drop=("id",),
+                           where="WHERE id <= ?", params=[(w,) for w in watermarks])
+        for target in targets:
+            last_id = target.execute("SELECT COALESCE(MAX(id), 0) AS n FROM analysis_results").fetchone()["n"]
+            target.execute("INSERT INTO maintenance_state (name, value) VALUES (?, ?)",
+                           (WATERMARK_KEY, str(last_id)))
+        pending = copy_rows(sources, targets, "analysis_results", "user_id", drop=("id",),
+                            where="WHERE id > ?", params=[(w,) for w in watermarks])
+        copied["analysis_results"] = rolled + pending
+
+        for target in targets:
+            target.commit()
+        for table, n in copied.items():
+            expected = count_rows(sources, table)
+            if count_rows(targets, table) != expected or n != expected:
+                raise RuntimeError(f"Effectifs différents pour {table}: {expected} attendus")
+    finally:
+        for conn in sources + targets:
+            conn.close()
+
+    # Remise des journaux WAL dans les fichiers avant de les renommer
+    for path in source_paths + temp_paths:
+        conn = SQLiteStorage(path).connect()
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.close()
+
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    # Sauvegarde des sources, et d'un éventuel ancien fichier portant le nom d'une cible
+    replaced = source_paths + [path for path in final_paths if path.exists() and path not in source_paths]
+    for path in replaced:
+        for suffix in ("", "-wal", "-shm"):
+            old = Path(str(path) + suffix)
+            if old.exists():
+                os.replace(old, old.with_name(f"{path.name}.pre-reshard-{stamp}{suffix}"))
+    for temp, final in zip(temp_paths, final_paths):
+        for suffix in ("-wal", "-shm"):
+            Path(str(temp) + suffix).unlink(missing_ok=True)
+        os.replace(temp, final)
+    return copied
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Redistribue les bases SQLite entre un nouveau nombre de fichiers")
+    parser.add_argument("--to", type=int, required=True, help="nouveau nombre de bases")
+    parser.add_argument("--from", dest="from_count", type=int, default=DB_SHARDS,
+                        help="nombre de bases actuel (défaut: DB_SHARDS)")
+    args = parser.parse_args()
+
+    if DB_BACKEND != "sqlite":
+        print("Le repartitionnement ne concerne que DB_BACKEND=sqlite")
+        sys.exit(1)
+    if args.to < 1 or args.to == args.from_count:
+        print(f"Rien à faire ({args.from_count} -> {args.to})")
+        sys.exit(1)
+
+    print(f"Repartitionnement {args.from_count} -> {args.to} bases (API arrêtée)...")
+    started = time.perf_counter()
+    report = reshard(args.from_count, args.to)
+    for table, n in report.items():
+        print(f"  {table:<18}{n:>10} lignes")
+    print(f"Terminé en {time.perf_counter() - started:.2f}s. Redémarrer l'API avec DB_SHARDS={args.to}")
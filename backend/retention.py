@@ -0,0 +1,239 @@
+"""
+Rétention et compaction de la table analysis_results
+
+analyze_user insère un résultat à chaque chargement du dashboard. La compaction :
+1. agrège les nouveaux résultats (id > curseur) dans analysis_history, un
+   enregistrement par utilisateur et par jour. Le curseur s'arrête au premier
+   résultat de moins de COMPACTION_LAG_S secondes : avec MySQL, un id plus
+   petit peut encore être dans une transaction ouverte, il passerait sous le
+   curseur sans jamais être agrégé ;
+2. supprime les résultats bruts non retenus par la politique
+   ("daily" : le dernier par jour, "last_n" : les N derniers par utilisateur).
+
+Chaque lot est une opération courte de l'écrivain unique (backend.writer),
+pour ne jamais bloquer longtemps les autres écritures. Utilisation en ligne de commande : python -m backend.retention
+"""
+
+import asyncio
+import itertools
+import sys
+import time
+from typing import Dict, List, Optional
+
+from backend import config
+from backend.database import SHARDS
+from backend.writer import get_writer, stop_writers
+
+WATERMARK_KEY = "analysis_rollup_last_id"
+
+
+def get_watermark(cursor) -> int:
+    cursor.execute("SELECT value FROM maintenance_state WHERE name = ?", (WATERMARK_KEY,))
+    row = cursor.fetchone()
+    return int(row["value"]) if row else 0
+
+
+def set_watermark(cursor, value: int) -> None:
+    cursor.execute(
+        cursor.dialect.upsert("maintenance_state", ["name", "value"], keys=["name"]),
+        (WATERMARK_KEY, str(value)),
+    )
+
+
+def _aggregate(rows) -> Dict:
+    """Agrège des résultats bruts par (user_id, jour)"""
+    groups = {}
+    for row in rows:
+        key = (row["user_id"], str(row["day"])[:10])
+        score = row["score"] or 0.0
+        group = groups.get(key)
+        if group is None:
+            groups[key] = {
+                "score_sum": score, "score_min": score, "score_max": score, "n_results": 1,
+                "category": row["category"], "risk_prediction": row["risk_prediction"],
+                "last_result_id": row["id"],
+            }
+            continue
+        group["score_sum"] += score
+        group["score_min"] = min(group["score_min"], score)
+        group["score_max"] = max(group["score_max"], score)
+        group["n_results"] += 1
+        if row["id"] > group["last_result_id"]:
+            group["category"] = row["category"]
+            group["risk_prediction"] = row["risk_prediction"]
+            group["last_result_id"] = row["id"]
+    return groups
+
+
+def _merge(existing: Optional[Dict], new: Dict) -> Dict:
+    if existing is None:
+        return new
+    merged = {
+        "score_sum": existing["score_sum"] + new["score_sum"],
+        "score_min": min(existing["score_min"], new["score_min"]),
+        "score_max": max(existing["score_max"], new["score_max"]),
+        "n_results": existing["n_results"] + new["n_results"],
+    }
+    latest = new if new["last_result_id"] > (existing["last_result_id"] or 0) else existing
+    merged.update(
+        category=latest["category"],
+        risk_prediction=latest["risk_prediction"],
+        last_result_id=latest["last_result_id"],
+    )
+    return merged
+
+
+HISTORY_COLUMNS = ["user_id", "day", "score_sum", "score_min", "score_max", "n_results",
+                   "category", "risk_prediction", "last_result_id"]
+
+
+def rollup_batch(cursor, batch_size: int, lag_s: int = None) -> int:
+    """Agrège le prochain lot de résultats dans analysis_history ; retourne le nombre traité"""
+    lag_s = config.COMPACTION_LAG_S if lag_s is None else lag_s
+    watermark = get_watermark(cursor)
+    cutoff = cursor.dialect.seconds_ago.format(int(lag_s))
+    cursor.execute(f"""
+        SELECT id, user_id, DATE(created_at) AS day, score, category, risk_prediction,
+               created_at > {cutoff} AS recent
+        FROM analysis_results
+        WHERE id > ?
+        ORDER BY id
+        LIMIT ?
+    """, (watermark, batch_size))
+    # Arrêt au premier résultat récent : le curseur ne dépasse jamais une transaction en cours
+    rows = list(itertools.takewhile(lambda row: not row["recent"], cursor.fetchall()))
+    if not rows:
+        return 0
+
+    upsert = cursor.dialect.upsert("analysis_history", HISTORY_COLUMNS, keys=["user_id", "day"])
+    for (user_id, day), group in _aggregate(rows).items():
+        cursor.execute(
+            "SELECT * FROM analysis_history WHERE user_id = ? AND day = ?", (user_id, day)
+        )
+        existing = cursor.fetchone()
+        merged = _merge(dict(existing) if existing else None, group)
+        cursor.execute(upsert, [user_id, day] + [merged[c] for c in HISTORY_COLUMNS[2:]])
+
+    set_watermark(cursor, rows[-1]["id"])
+    return len(rows)
+
+
+def _prunable_ids(cursor, watermark: int, batch_size: int) -> List[int]:
+    """Résultats déjà agrégés que la politique de rétention ne conserve pas"""
+    if config.ANALYSIS_RETENTION == "last_n":
+        # Rang de chaque résultat parmi ceux de son utilisateur, en un seul parcours
+        cursor.execute("""
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY id DESC) AS newer
+                FROM analysis_results
+            ) AS ranked
+            WHERE newer > ? AND id <= ?
+            LIMIT ?
+        """, (config.ANALYSIS_KEEP_LAST, watermark, batch_size))
+    else:
+        # La borne basse sur created_at rend la sous-requête sargable pour l'index (user_id, created_at)
+        cursor.execute("""
+            SELECT r.id FROM analysis_results r
+            WHERE r.id <= ?
+              AND EXISTS (SELECT 1 FROM analysis_results r2
+                          WHERE r2.user_id = r.user_id
+                            AND r2.created_at >= DATE(r.created_at)
+                            AND DATE(r2.created_at) = DATE(r.created_at)
+                            AND r2.id > r.id)
+            LIMIT ?
+        """, (watermark, batch_size))
+    return [row["id"] for row in cursor.fetchall()]
+
+
+def prune_batch(cursor, batch_size: int) -> int:
+    """Supprime un lot de résultats non retenus ; retourne le nombre supprimé"""
+    ids = _prunable_ids(cursor, get_watermark(cursor), batch_size)
+    if not ids:
+        return 0
+    placeholders = ", ".join("?" for _ in ids)
+    cursor.execute(f"DELETE FROM analysis_results WHERE id IN ({placeholders})", ids)
+    return len(ids)
+
+
+def compact(batch_size: int = None, pause_s: float = 0.01) -> Dict[str, int]:
+    """Exécute la compaction complète par lots, base par base ; retourne les compteurs"""
+    batch_size = batch_size or config.COMPACTION_BATCH
+    stats = {"rolled_up": 0, "deleted": 0, "batches": 0}
+    for shard in SHARDS:
+        writer = get_writer(shard=shard)
+        for step, key in ((rollup_batch, "rolled_up"), (prune_batch, "deleted")):
+            while True:
+                done = writer.execute(step, batch_size)
+                if not done:
+                    break
+                stats[key] += done
+                stats["batches"] += 1
+                # Laisser passer les écritures concurrentes entre deux lots
+                time.sleep(pause_s)
+    return stats
+
+
+async def run_periodic_compaction(interval_s: float = None) -> None:
+    """Tâche de fond : compaction périodique hors de la boucle d'événements"""
+    interval_s = interval_s or config.COMPACTION_INTERVAL_S
+    while True:
+        try:
+            await asyncio.to_thread(compact)
+        except Exception as e:
+            print(f"Erreur de compaction: {e}", file=sys.stderr)
+        await asyncio.sleep(interval_s)
+
+
+# -------------------
+# HISTORIQUE
+# -------------------
+
+def get_history(cursor, user_id: int, limit: int, before: Optional[str] = None) -> List[Dict]:
+    """
+    Historique journalier servi depuis analysis_history
+    Les résultats pas encore compactés (id > curseur) sont agrégés à la volée
+    """
+    watermark = get_watermark(cursor)
+
+    query = "SELECT * FROM analysis_history WHERE user_id = ?"
+    params = [user_id]
+    if before:
+        query += " AND day < ?"
+        params.append(before)
+    query += " ORDER BY day DESC LIMIT ?"
+    params.append(limit + 1)
+    cursor.execute(query, params)
+    days = {str(row["day"])[:10]: dict(row) for row in cursor.fetchall()}
+
+    cursor.execute("""
+        SELECT id, user_id, DATE(created_at) AS day, score, category, risk_prediction
+        FROM analysis_results
+        WHERE user_id = ? AND id > ?
+    """, (user_id, watermark))
+    for (_, day), group in _aggregate(cursor.fetchall()).items():
+        if before and day >= before:
+            continue
+        days[day] = _merge(days.get(day), group)
+
+    entries = []
+    for day in sorted(days, reverse=True)[:limit + 1]:
+        group = days[day]
+        entries.append({
+            "day": day,
+            "score_avg": round(group["score_sum"] / group["n_results"], 1),
+            "score_min": group["score_min"],
+            "score_max": group["score_max"],
+            "n_results": group["n_results"],
+            "category": group["category"],
+            "risk_prediction": group["risk_prediction"],
+        })
+    return entries
+
+
+if __name__ == "__main__":
+    started = time.perf_counter()
+    result = compact()
+    stop_writers()
+    elapsed = time.perf_counter() - started
+    print(f"Compaction terminée en {elapsed:.2f}s: {result['rolled_up']} résultats agrégés, "
+          f"{result['deleted']} supprimés ({result['batches']} lots)")
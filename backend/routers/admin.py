@@ -0,0 +1,54 @@
+"""
+Routes d'administration (métriques internes)
+"""
+
+from fastapi import APIRouter, Query
+from backend import precompute, slow_queries
+from backend.admission import controller
+from backend.events import hub
+from backend.user_cache import users as user_cache
+from backend.writer import get_writers
+from backend.ml.inference import get_executor
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+@router.get("/admission")
+def admission_metrics():
+    """Compteurs d'admission, de rejets et de limitation de débit par route"""
+    return controller.stats()
+
+@router.get("/writer")
+def writer_metrics():
+    """Files d'écriture : opérations en attente, commits groupés, échecs (une par base)"""
+    writers = get_writers()
+    if len(writers) == 1:
+        return writers[0].snapshot()
+    return {"shards": [writer.snapshot() for writer in writers]}
+
+@router.get("/inference")
+def inference_metrics():
+    """Exécuteur d'inférence : profondeur de file, lots en cours, tailles de lot"""
+    executor = get_executor()
+    if executor is None:
+        return {"workers": 0, "mode": "in-process"}
+    return executor.snapshot()
+
+@router.get("/precompute")
+def precompute_progress():
+    """Précalcul des analyses : exécution en cours ou dernière exécution (progression, débit)"""
+    return precompute.progress
+
+@router.get("/events")
+def event_metrics():
+    """Hub SSE : utilisateurs et connexions abonnés, messages publiés, remis, abandonnés"""
+    return hub.snapshot()
+
+@router.get("/user-cache")
+def user_cache_metrics():
+    """Cache d'existence des utilisateurs : ids connus, absences mémorisées, requêtes évitées"""
+    return user_cache.snapshot()
+
+@router.get("/slow-queries")
+def slow_query_log(limit: int = Query(50, ge=1, le=500)):
+    """Requêtes au-dessus du seuil : empreintes par temps cumulé, plans et parcours complets"""
+    return slow_queries.snapshot(limit)
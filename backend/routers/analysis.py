@@ -2,25 +2,40 @@
 Routes pour l'analyse et les recommandations
 """
 
-from fastapi import APIRouter, HTTPException
-from backend.models import AnalysisResponse
-from backend.database import get_connection
-from backend.ml.model import predict_wellness_score, get_recommendations, get_explanations
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+from backend.models import AnalysisResponse, AnalysisHistoryPage, SimulationRequest, SimulationResponse
+from backend import config, retention, feature_store
+from backend.database import get_read_connection
+from backend.user_cache import users as user_cache
+from backend.writer import get_writer
+from backend.ml.model import (
+    RAW_COLUMNS, build_features, categorize, get_explanations, get_recommendations,
+    model_version, predict_from_features, predict_matrix, raw_matrix, scenario_features
+)
+from backend.ml import risk
 import json
+import math
+import numpy as np
 
 router = APIRouter(prefix="/analyze", tags=["analysis"])
 
 @router.get("/{user_id}", response_model=AnalysisResponse)
 def analyze_user(user_id: int):
     """Calculer le score global et l'analyse courante"""
-    conn = get_connection()
+    # Vérifier que l'utilisateur existe (cache en mémoire)
+    if not user_cache.exists(user_id):
+        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+
+    conn = get_read_connection(user_id)
     cursor = conn.cursor()
-    
-    # Vérifier que l'utilisateur existe
-    cursor.execute("SELECT id FROM users WHERE id = ?", (user_id,))
-    if not cursor.fetchone():
+
+    # Analyse déjà calculée (précalcul, chargement précédent) par ce modèle, sans ingestion depuis
+    version = model_version()
+    current, ingested_at = load_current_analysis(cursor, user_id, version)
+    if current is not None:
         conn.close()
-        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+        return current
     
     # Récupérer les 30 derniers jours de données
     cursor.execute("""
@@ -40,52 +55,197 @@ def analyze_user(user_id: int):
     latest_data = dict(rows[0])
     recent_data = [dict(row) for row in rows[:7]]  # 7 derniers jours
     
-    # Calculer le score avec le modèle ML
-    score, category = predict_wellness_score(latest_data, recent_data)
+    # Calculer le score avec le modèle ML (vecteur du feature store s'il est à jour)
+    features = feature_store.load_vector(cursor, user_id, latest_data["date"])
+    if features is None:
+        features = build_features(latest_data, recent_data)
+    score, category = predict_from_features(features)
     
     # Générer les explications
     explanations = get_explanations(latest_data, recent_data)
     
-    # Prédiction de risque simple
-    risk_prediction = predict_risk(recent_data)
+    # Prédiction de risque à partir des tendances incrémentales
+    trend_state, trend_rebuilt = load_trend_state(cursor, user_id, rows)
+    conn.close()
+    risk_prediction = risk.score_risks([trend_state])[0]
     
     # Recommandations
     recommendations = get_recommendations(score, latest_data, recent_data, explanations)
     
-    # Sauvegarder dans analysis_results
+    # Sauvegarder dans analysis_results via l'écrivain unique, sans attendre le commit
+    get_writer(user_id).submit(
+        save_analysis, user_id, score, category, risk_prediction, explanations, recommendations,
+        trend_state if trend_rebuilt else None, ingested_at, version
+    )
+    
+    return AnalysisResponse(
+        score=score,
+        category=category,
+        risk_prediction=risk_prediction,
+        trends=risk.summarize_trends(trend_state),
+        explanations=explanations,
+        recommendations=recommendations
+    )
+
+@router.get("/{user_id}/history", response_model=AnalysisHistoryPage)
+def get_analysis_history(
+    user_id: int,
+    limit: int = Query(30, ge=1, le=365, description="Nombre de jours par page"),
+    before: Optional[str] = Query(None, description="Jours strictement antérieurs à cette date (YYYY-MM-DD)")
+):
+    """Historique journalier des analyses, paginé du plus récent au plus ancien"""
+    if not user_cache.exists(user_id):
+        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+
+    conn = get_read_connection(user_id)
+    cursor = conn.cursor()
+    entries = retention.get_history(cursor, user_id, limit, before)
+    conn.close()
+
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    return AnalysisHistoryPage(
+        items=entries,
+        next_before=entries[-1]["day"] if has_more else None
+    )
+
+@router.post("/{user_id}/simulate", response_model=SimulationResponse)
+def simulate_scenarios(user_id: int, request: SimulationRequest):
+    """
+    Scores « et si » pour une grille d'écarts sur les métriques
+    Tous les scénarios (et la situation actuelle) sont évalués en une seule prédiction,
+    dans le pool d'inférence s'il est activé
+    """
+    unknown = sorted(set(request.deltas) - set(RAW_COLUMNS))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Métriques inconnues: {', '.join(unknown)}")
+    metrics = [c for c in RAW_COLUMNS if c in request.deltas]
+    if not metrics or any(not request.deltas[m] for m in metrics):
+        raise HTTPException(status_code=400, detail="Chaque métrique doit avoir au moins un écart")
+    # Produit en entiers Python : np.prod (int64) déborde sur de grandes grilles
+    n_scenarios = math.prod(len(request.deltas[m]) for m in metrics)
+    if n_scenarios > config.SIMULATION_MAX_SCENARIOS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Trop de scénarios ({n_scenarios}, maximum {config.SIMULATION_MAX_SCENARIOS})"
+        )
+
+    if not user_cache.exists(user_id):
+        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+
+    conn = get_read_connection(user_id)
+    cursor = conn.cursor()
+
+    # Dernière journée et fenêtre de la moyenne mobile sur 3 jours
+    cursor.execute("""
+        SELECT date, sommeil_h, pas, sport_min, calories, humeur_0_5, stress_0_5, fc_repos
+        FROM daily_data
+        WHERE user_id = ?
+        ORDER BY date DESC
+        LIMIT 3
+    """, (user_id,))
+    rows = cursor.fetchall()
+    conn.close()
+
+    if not rows:
+        raise HTTPException(status_code=404, detail="Aucune donnée trouvée pour cet utilisateur")
+
+    # Grille complète des écarts ; la ligne 0 (écarts nuls) est la situation actuelle
+    grid = np.meshgrid(*[np.array(request.deltas[m], dtype=float) for m in metrics], indexing="ij")
+    values = np.stack([axis.ravel() for axis in grid], axis=1)
+    deltas = np.zeros((n_scenarios + 1, len(RAW_COLUMNS)))
+    deltas[1:, [RAW_COLUMNS.index(m) for m in metrics]] = values
+
+    features = scenario_features(raw_matrix([dict(row) for row in rows]), deltas, request.sustained)
+    scores = np.round(predict_matrix(features), 1)
+    baseline = scores[0]
+    improvements = scores[1:] - baseline
+    ranked = np.argsort(-improvements, kind="stable")[:request.top]
+
+    return SimulationResponse(
+        baseline_score=baseline,
+        baseline_category=categorize(baseline),
+        n_scenarios=n_scenarios,
+        scenarios=[
+            {
+                "deltas": dict(zip(metrics, values[i].tolist())),
+                "score": scores[i + 1],
+                "category": categorize(scores[i + 1]),
+                "improvement": round(float(improvements[i]), 1),
+            }
+            for i in ranked
+        ]
+    )
+
+def save_analysis(cursor, user_id, score, category, risk_prediction, explanations,
+                  recommendations, trend_state=None, ingested_at=None, version=None):
+    """
+    Opération d'écriture : persiste un résultat d'analyse (et l'état des tendances reconstruit)
+    Ignorée si une journée a été ingérée depuis la lecture (état mis à jour après `ingested_at`) :
+    le résultat, déjà périmé, serait sinon servi comme analyse courante
+    """
+    if risk.last_update(cursor, user_id) != ingested_at:
+        return None
+    if trend_state is not None:
+        # Ne pas écraser un état plus récent écrit entre-temps par une ingestion
+        stored = risk.load_state(cursor, user_id)
+        if stored is None or stored.last_day < trend_state.last_day:
+            risk.save_state(cursor, user_id, trend_state)
     cursor.execute("""
         INSERT INTO analysis_results 
-        (user_id, score, category, risk_prediction, explanations, recommendations)
-        VALUES (?, ?, ?, ?, ?, ?)
+        (user_id, score, category, risk_prediction, explanations, recommendations, model_version)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
     """, (
         user_id,
         score,
         category,
         risk_prediction,
         json.dumps(explanations),
-        json.dumps(recommendations)
+        json.dumps(recommendations),
+        version
     ))
-    conn.commit()
-    conn.close()
-    
+    return cursor.lastrowid
+
+def load_current_analysis(cursor, user_id, version):
+    """
+    Dernier résultat enregistré s'il est postérieur à la dernière ingestion (risk_state.updated_at)
+    et produit par le modèle servi (`version`, voir model_version) : un entraînement, un
+    rafraîchissement ou un changement de modèle distillé invalide les résultats précédents.
+    Retourne (analyse ou None s'il faut recalculer, updated_at de l'état ou None sans état).
+    Les horodatages sont à la seconde : un résultat de la même seconde qu'une ingestion est recalculé
+    """
+    cursor.execute("""
+        SELECT s.updated_at AS ingested_at, s.state,
+               r.created_at > s.updated_at AND r.model_version = ? AS is_current,
+               r.score, r.category, r.risk_prediction, r.explanations, r.recommendations
+        FROM risk_state s
+        LEFT JOIN analysis_results r ON r.user_id = s.user_id
+        WHERE s.user_id = ?
+        ORDER BY r.created_at DESC, r.id DESC
+        LIMIT 1
+    """, (version, user_id))
+    row = cursor.fetchone()
+    if row is None:
+        return None, None
+    if not row["is_current"]:
+        return None, row["ingested_at"]
     return AnalysisResponse(
-        score=score,
-        category=category,
-        risk_prediction=risk_prediction,
-        explanations=explanations,
-        recommendations=recommendations
-    )
+        score=row["score"],
+        category=row["category"],
+        risk_prediction=row["risk_prediction"],
+        trends=risk.summarize_trends(risk.TrendState.from_json(row["state"])),
+        explanations=json.loads(row["explanations"]),
+        recommendations=json.loads(row["recommendations"])
+    ), row["ingested_at"]
 
-def predict_risk(recent_data):
-    """Prédiction simple du risque basée sur les tendances"""
-    if len(recent_data) < 3:
-        return None
-    
-    stress_values = [row.get("stress_0_5") for row in recent_data[:3] if row.get("stress_0_5") is not None]
-    if stress_values:
-        avg_stress = sum(stress_values) / len(stress_values)
-        if avg_stress > 3.5:
-            return "Stress en hausse probable sur 3 jours"
-        elif avg_stress < 2:
-            return "Tendance positive maintenue"
-    return None
\ No newline at end of file
+def load_trend_state(cursor, user_id, rows):
+    """
+    Charge l'état des tendances maintenu à l'ingestion
+    Reconstruit à partir des lignes déjà lues s'il est absent ou en retard
+    Retourne (état, reconstruit) : un état reconstruit doit être sauvegardé
+    """
+    state = risk.load_state(cursor, user_id)
+    latest_date = str(rows[0]["date"])[:10]
+    if state is None or state.last_day != latest_date:
+        return risk.TrendState.from_rows(dict(row) for row in rows), True
+    return state, False
@@ -2,69 +2,88 @@
 Routes pour la gestion des données quotidiennes
 """
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Query
 from typing import List, Optional
 from datetime import date
 from backend.models import DailyDataCreate, DailyDataResponse
-from backend.database import get_connection
+from backend.database import get_read_connection
+from backend.writer import get_writer
+from backend.ml import risk
+from backend import feature_store
+from backend.events import hub
+from backend.user_cache import users as user_cache
 
 router = APIRouter(prefix="/data", tags=["data"])
 
+def insert_daily_data(cursor, data: DailyDataCreate):
+    """Opération d'écriture : upsert de la journée, des tendances et des vecteurs de features"""
+    # Upsert portable : remplace l'entrée si la date existe déjà (updated_at marque la correction)
+    columns = ["user_id", "date", "sommeil_h", "pas", "sport_min", "calories",
+               "humeur_0_5", "stress_0_5", "fc_repos"]
+    cursor.execute(cursor.dialect.upsert("daily_data", columns, keys=["user_id", "date"],
+                                         timestamps=["updated_at"]), (
+        data.user_id, data.date.isoformat(), data.sommeil_h, data.pas, data.sport_min,
+        data.calories, data.humeur_0_5, data.stress_0_5, data.fc_repos
+    ))
+
+    # Mise à jour incrémentale des tendances dans la même transaction
+    risk.record_observation(cursor, data.user_id, data.date, data.dict())
+    feature_store.record_day(cursor, data.user_id, data.date.isoformat())
+
+    cursor.execute("""
+        SELECT id, user_id, date, sommeil_h, pas, sport_min, calories, 
+               humeur_0_5, stress_0_5, fc_repos, created_at
+        FROM daily_data WHERE user_id = ? AND date = ?
+    """, (data.user_id, data.date.isoformat()))
+    return dict(cursor.fetchone())
+
+
+def to_response(row) -> DailyDataResponse:
+    return DailyDataResponse(
+        id=row["id"],
+        user_id=row["user_id"],
+        date=str(row["date"]) if row["date"] else None,
+        sommeil_h=float(row["sommeil_h"]) if row["sommeil_h"] is not None else None,
+        pas=row["pas"],
+        sport_min=row["sport_min"],
+        calories=row["calories"],
+        humeur_0_5=row["humeur_0_5"],
+        stress_0_5=row["stress_0_5"],
+        fc_repos=row["fc_repos"],
+        created_at=str(row["created_at"]) if row["created_at"] else None
+    )
+
+
+def publish_ingest(user_id: int, response: DailyDataResponse):
+    """Tâche de fond : pousse la journée insérée puis l'analyse recalculée aux flux SSE"""
+    from backend.routers.analysis import analyze_user
+
+    hub.publish(user_id, "data", response.dict())
+    try:
+        analysis = analyze_user(user_id)
+    except HTTPException:
+        return
+    hub.publish(user_id, "analysis", analysis.dict())
+
+
 @router.post("", response_model=DailyDataResponse, status_code=201)
-def create_daily_data(data: DailyDataCreate):
+def create_daily_data(data: DailyDataCreate, background_tasks: BackgroundTasks):
     """Ajouter un enregistrement quotidien"""
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    # Vérifier que l'utilisateur existe
-    cursor.execute("SELECT id FROM users WHERE id = ?", (data.user_id,))
-    if not cursor.fetchone():
-        conn.close()
+    # Vérifier que l'utilisateur existe (cache en mémoire)
+    if not user_cache.exists(data.user_id):
         raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
 
     try:
-        # SQLite : INSERT OR REPLACE pour remplacer si la date existe déjà
-        cursor.execute("""
-            INSERT OR REPLACE INTO daily_data 
-            (id, user_id, date, sommeil_h, pas, sport_min, calories, humeur_0_5, stress_0_5, fc_repos)
-            VALUES (
-                (SELECT id FROM daily_data WHERE user_id = ? AND date = ?),
-                ?, ?, ?, ?, ?, ?, ?, ?, ?
-            )
-        """, (
-            data.user_id, data.date.isoformat(),
-            data.user_id, data.date.isoformat(), data.sommeil_h, data.pas, data.sport_min, 
-            data.calories, data.humeur_0_5, data.stress_0_5, data.fc_repos
-        ))
-        conn.commit()
-        data_id = cursor.lastrowid
-
-        cursor.execute("""
-            SELECT id, user_id, date, sommeil_h, pas, sport_min, calories, 
-                   humeur_0_5, stress_0_5, fc_repos, created_at
-            FROM daily_data WHERE id = ?
-        """, (data_id,))
-        row = cursor.fetchone()
-        conn.close()
-
-        return DailyDataResponse(
-            id=row["id"],
-            user_id=row["user_id"],
-            date=str(row["date"]) if row["date"] else None,
-            sommeil_h=float(row["sommeil_h"]) if row["sommeil_h"] is not None else None,
-            pas=row["pas"],
-            sport_min=row["sport_min"],
-            calories=row["calories"],
-            humeur_0_5=row["humeur_0_5"],
-            stress_0_5=row["stress_0_5"],
-            fc_repos=row["fc_repos"],
-            created_at=str(row["created_at"]) if row["created_at"] else None
-        )
+        row = get_writer(data.user_id).execute(insert_daily_data, data)
     except Exception as e:
-        conn.rollback()
-        conn.close()
         raise HTTPException(status_code=400, detail=f"Erreur lors de l'ajout: {str(e)}")
 
+    response = to_response(row)
+    # Analyse recalculée après la réponse, seulement si un flux SSE est ouvert pour l'utilisateur
+    if hub.has_subscribers(data.user_id):
+        background_tasks.add_task(publish_ingest, data.user_id, response)
+    return response
+
 
 @router.get("/{user_id}", response_model=List[DailyDataResponse])
 def get_user_data(
@@ -73,14 +92,11 @@ def get_user_data(
     to_date: Optional[str] = Query(None, alias="to", description="Date de fin (YYYY-MM-DD)")
 ):
     """Récupérer l'historique complet d'un utilisateur avec filtres optionnels"""
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("SELECT id FROM users WHERE id = ?", (user_id,))
-    if not cursor.fetchone():
-        conn.close()
+    if not user_cache.exists(user_id):
         raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
 
+    conn = get_read_connection(user_id)
+    cursor = conn.cursor()
     query = """
         SELECT id, user_id, date, sommeil_h, pas, sport_min, calories, 
                humeur_0_5, stress_0_5, fc_repos, created_at
@@ -102,19 +118,4 @@ def get_user_data(
     rows = cursor.fetchall()
     conn.close()
 
-    return [
-        DailyDataResponse(
-            id=row["id"],
-            user_id=row["user_id"],
-            date=str(row["date"]) if row["date"] else None,
-            sommeil_h=float(row["sommeil_h"]) if row["sommeil_h"] is not None else None,
-            pas=row["pas"],
-            sport_min=row["sport_min"],
-            calories=row["calories"],
-            humeur_0_5=row["humeur_0_5"],
-            stress_0_5=row["stress_0_5"],
-            fc_repos=row["fc_repos"],
-            created_at=str(row["created_at"]) if row["created_at"] else None
-        )
-        for row in rows
-    ]
+    return [to_response(row) for row in rows]
@@ -0,0 +1,43 @@
+"""
+Flux d'événements serveur (SSE) : analyses recalculées après ingestion
+"""
+
+import asyncio
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from backend import config
+from backend.events import hub
+from backend.user_cache import users as user_cache
+
+router = APIRouter(prefix="/events", tags=["events"])
+
+@router.get("/{user_id}")
+async def user_events(user_id: int, request: Request):
+    """
+    Flux SSE d'un utilisateur : événements "data" (journée enregistrée) et
+    "analysis" (analyse recalculée) après chaque POST /data
+    """
+    if not user_cache.exists(user_id):
+        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+
+    async def stream():
+        queue = hub.subscribe(user_id)
+        try:
+            # Délai de reconnexion automatique du navigateur (ms)
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=config.EVENTS_KEEPALIVE_S)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    # Commentaire de maintien (proxies, détection des clients partis)
+                    message = ": keepalive\n\n"
+                yield message
+        finally:
+            hub.unsubscribe(user_id, queue)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
@@ -5,7 +5,9 @@ Routes pour les recommandations personnalisées
 from fastapi import APIRouter, HTTPException
 from typing import List
 from backend.database import get_db
-from backend.ml.model import get_recommendations, get_explanations
+from backend import feature_store
+from backend.user_cache import users as user_cache
+from backend.ml.model import build_features, predict_from_features, get_recommendations, get_explanations
 import json
 
 router = APIRouter(prefix="/recommend", tags=["recommendations"])
@@ -13,19 +15,18 @@ router = APIRouter(prefix="/recommend", tags=["recommendations"])
 @router.get("/{user_id}")
 def get_user_recommendations(user_id: int):
     """Obtenir les recommandations personnalisées pour un utilisateur"""
-    with get_db() as conn:
+    # Vérifier que l'utilisateur existe (cache en mémoire)
+    if not user_cache.exists(user_id):
+        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+
+    with get_db(readonly=True, user_id=user_id) as conn:
         cursor = conn.cursor()
         
-        # Vérifier que l'utilisateur existe
-        cursor.execute("SELECT id FROM users WHERE id = %s", (user_id,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
-        
         # Récupérer les dernières données
         cursor.execute("""
             SELECT date, sommeil_h, pas, sport_min, calories, humeur_0_5, stress_0_5, fc_repos
             FROM daily_data 
-            WHERE user_id = %s 
+            WHERE user_id = ? 
             ORDER BY date DESC 
             LIMIT 7
         """, (user_id,))
@@ -34,12 +35,14 @@ def get_user_recommendations(user_id: int):
         if not rows:
             raise HTTPException(status_code=404, detail="Aucune donnée trouvée pour cet utilisateur")
         
-        latest_data = rows[0]
-        recent_data = rows
+        recent_data = [dict(row) for row in rows]
+        latest_data = recent_data[0]
         
-        # Calculer le score approximatif
-        from backend.ml.model import predict_wellness_score
-        score, _ = predict_wellness_score(latest_data, recent_data)
+        # Calculer le score approximatif (vecteur du feature store s'il est à jour)
+        features = feature_store.load_vector(cursor, user_id, latest_data["date"])
+        if features is None:
+            features = build_features(latest_data, recent_data)
+        score, _ = predict_from_features(features)
         
         # Générer les explications
         explanations = get_explanations(latest_data, recent_data)
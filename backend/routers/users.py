@@ -1,7 +1,12 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Query
+from pydantic import BaseModel, Field
 from typing import List, Optional
-from backend.database import get_connection
+import heapq
+import itertools
+from backend import config
+from backend.database import fan_out, new_user_shard, next_user_id
+from backend.user_cache import users as user_cache
+from backend.writer import get_writer
 
 router = APIRouter(
     prefix="/users",
@@ -18,27 +23,65 @@ class UserCreate(BaseModel):
 class User(UserCreate):
     id: int
 
-@router.get("", response_model=List[User])
-def get_users():
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users")
-    rows = cursor.fetchall()
-    users = [User(id=row["id"], age=row["age"], genre=row["genre"],
-                  taille_cm=row["taille_cm"], poids_kg=row["poids_kg"],
-                  objectif=row["objectif"]) for row in rows]
-    conn.close()
-    return users
+class UserPage(BaseModel):
+    items: List[User]
+    next_before: Optional[int] = Field(None, description="Curseur de la page suivante (paramètre before)")
+
+@router.get("", response_model=UserPage)
+def get_users(
+    limit: int = Query(config.USERS_PAGE_SIZE, ge=1, le=config.USERS_PAGE_MAX, description="Utilisateurs par page"),
+    before: Optional[int] = Query(None, description="Utilisateurs d'id strictement inférieur (curseur)"),
+    objectif: Optional[str] = Query(None, description="Objectif exact"),
+    age_min: Optional[int] = Query(None, ge=1, le=120),
+    age_max: Optional[int] = Query(None, ge=1, le=120)
+):
+    """Utilisateurs du plus récent au plus ancien, paginés par id, avec filtres optionnels"""
+    query = "SELECT id, age, genre, taille_cm, poids_kg, objectif FROM users WHERE 1 = 1"
+    params = []
+    if before is not None:
+        query += " AND id < ?"
+        params.append(before)
+    if objectif is not None:
+        query += " AND objectif = ?"
+        params.append(objectif)
+    if age_min is not None:
+        query += " AND age >= ?"
+        params.append(age_min)
+    if age_max is not None:
+        query += " AND age <= ?"
+        params.append(age_max)
+    query += " ORDER BY id DESC LIMIT ?"
+    params.append(limit + 1)
+
+    # Même page demandée à chaque base, fusion par id décroissant
+    def fetch(cursor):
+        cursor.execute(query, params)
+        return [dict(row) for row in cursor.fetchall()]
+
+    rows = heapq.merge(*fan_out(fetch), key=lambda row: row["id"], reverse=True)
+    rows = list(itertools.islice(rows, limit + 1))
+    has_more = len(rows) > limit
+    items = [User(**row) for row in rows[:limit]]
+    return UserPage(items=items, next_before=items[-1].id if has_more else None)
+
+def insert_user(cursor, user: UserCreate, shard: int = 0):
+    """Opération d'écriture : crée l'utilisateur dans la base `shard` et retourne son id"""
+    user_id = next_user_id(cursor, shard)
+    if user_id is None:
+        cursor.execute("""
+            INSERT INTO users (age, genre, taille_cm, poids_kg, objectif)
+            VALUES (?, ?, ?, ?, ?)
+        """, (user.age, user.genre, user.taille_cm, user.poids_kg, user.objectif))
+        return cursor.lastrowid
+    cursor.execute("""
+        INSERT INTO users (id, age, genre, taille_cm, poids_kg, objectif)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (user_id, user.age, user.genre, user.taille_cm, user.poids_kg, user.objectif))
+    return user_id
 
 @router.post("", response_model=User)
 def create_user(user: UserCreate):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO users (age, genre, taille_cm, poids_kg, objectif)
-        VALUES (?, ?, ?, ?, ?)
-    """, (user.age, user.genre, user.taille_cm, user.poids_kg, user.objectif))
-    conn.commit()
-    user_id = cursor.lastrowid
-    conn.close()
+    shard = new_user_shard()
+    user_id = get_writer(shard=shard).execute(insert_user, user, shard)
+    user_cache.add(user_id)
     return User(id=user_id, **user.dict())
@@ -0,0 +1,154 @@
+"""
+Journal des requêtes lentes
+
+Le curseur de backend.database chronomètre chaque requête, lecture des lignes
+comprise ; seules celles qui dépassent ELEVAI_SLOW_QUERY_MS sont transmises à record(). En dessous du
+seuil, le coût se limite à deux lectures d'horloge et une comparaison.
+
+Pour une requête lente, on enregistre :
+- son empreinte (requête normalisée : littéraux et listes IN remplacés par ?) ;
+- la forme des paramètres (nombre et types, jamais les valeurs) ;
+- le plan d'exécution (EXPLAIN QUERY PLAN / EXPLAIN) et les tables parcourues
+  intégralement.
+
+Les entrées sont écrites en JSON, une par ligne, dans un journal rotatif et
+conservées en mémoire pour GET /admin/slow-queries.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from typing import Dict, List, Sequence
+
+from backend import config
+
+# Seuil en secondes (infini si le journal est désactivé)
+threshold_s = config.SLOW_QUERY_MS / 1000 if config.SLOW_QUERY_MS > 0 else float("inf")
+
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\(\s*(?:\?|%s)(?:\s*,\s*(?:\?|%s))+\s*\)")
+_SPACE_RE = re.compile(r"\s+")
+
+_lock = threading.Lock()
+_recent = deque(maxlen=config.SLOW_QUERY_RECENT)
+_by_fingerprint: Dict[str, Dict] = {}
+_fingerprints: Dict[str, tuple] = {}
+_logger = None
+
+
+def normalize(query: str) -> str:
+    """Forme canonique d'une requête : espaces réduits, littéraux et listes IN remplacés"""
+    query = _STRING_RE.sub("?", query)
+    query = _NUMBER_RE.sub("?", query)
+    query = _SPACE_RE.sub(" ", query).strip()
+    return _IN_LIST_RE.sub("(?+)", query)
+
+
+def fingerprint(query: str) -> tuple:
+    """(empreinte, requête normalisée), mises en cache par texte de requête"""
+    cached = _fingerprints.get(query)
+    if cached is None:
+        normalized = normalize(query)
+        cached = (hashlib.sha1(normalized.encode()).hexdigest()[:12], normalized)
+        if len(_fingerprints) < 4096:
+            _fingerprints[query] = cached
+    return cached
+
+
+def params_shape(params: Sequence, many: int = None) -> Dict:
+    shape = {"count": len(params), "types": [type(p).__name__ for p in params]}
+    if many is not None:
+        shape["rows"] = many
+    return shape
+
+
+def explain(cursor, sql: str, params: Sequence) -> List[str]:
+    """Plan d'exécution de la requête, sur la même connexion que le curseur"""
+    if not sql.lstrip().upper().startswith(EXPLAINABLE):
+        return []
+    raw = cursor.raw.connection.cursor()
+    try:
+        raw.execute(cursor.dialect.explain + sql, tuple(params))
+        return cursor.dialect.plan_details([dict(row) for row in raw.fetchall()])
+    except Exception as e:
+        return [f"EXPLAIN impossible: {e}"]
+    finally:
+        raw.close()
+
+
+def _get_logger():
+    global _logger
+    if _logger is None:
+        os.makedirs(os.path.dirname(os.path.abspath(config.SLOW_QUERY_LOG)), exist_ok=True)
+        logger = logging.getLogger("elevai.slow_queries")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        handler = RotatingFileHandler(config.SLOW_QUERY_LOG, maxBytes=config.SLOW_QUERY_LOG_MAX_BYTES,
+                                      backupCount=config.SLOW_QUERY_LOG_BACKUPS, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        _logger = logger
+    return _logger
+
+
+def record(cursor, sql: str, params: Sequence, elapsed_s: float, many: int = None) -> None:
+    """Enregistre une requête au-dessus du seuil (appelé par backend.database.Cursor)"""
+    try:
+        key, normalized = fingerprint(sql)
+        plan = explain(cursor, sql, params)
+        full_scans = cursor.dialect.full_scans(plan)
+        elapsed_ms = round(elapsed_s * 1000, 3)
+        entry = {
+            "at": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            "fingerprint": key,
+            "query": normalized,
+            "elapsed_ms": elapsed_ms,
+            "params": params_shape(params, many),
+            "plan": plan,
+            "full_scans": full_scans,
+        }
+        with _lock:
+            _recent.append(entry)
+            stats = _by_fingerprint.get(key)
+            if stats is None:
+                stats = _by_fingerprint[key] = {
+                    "fingerprint": key, "query": normalized, "count": 0,
+                    "total_ms": 0.0, "max_ms": 0.0, "full_scans": [],
+                }
+            stats["count"] += 1
+            stats["total_ms"] = round(stats["total_ms"] + elapsed_ms, 3)
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+            stats["full_scans"] = sorted(set(stats["full_scans"]) | set(full_scans))
+        _get_logger().info(json.dumps(entry, ensure_ascii=False))
+    except Exception as e:
+        # Le journal ne doit jamais faire échouer la requête instrumentée
+        print(f"Erreur du journal des requêtes lentes: {e}", file=sys.stderr)
+
+
+def snapshot(limit: int = 50) -> Dict:
+    """Empreintes triées par temps cumulé, et dernières requêtes lentes"""
+    with _lock:
+        by_fingerprint = sorted(_by_fingerprint.values(), key=lambda s: s["total_ms"], reverse=True)
+        recent = list(_recent)[-limit:][::-1]
+        return {
+            "threshold_ms": config.SLOW_QUERY_MS,
+            "log_path": config.SLOW_QUERY_LOG,
+            "fingerprints": [dict(s) for s in by_fingerprint[:limit]],
+            "recent": recent,
+        }
+
+
+def reset() -> None:
+    with _lock:
+        _recent.clear()
+        _by_fingerprint.clear()
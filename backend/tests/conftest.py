@@ -0,0 +1,17 @@
+"""
+Configuration commune des tests unitaires du backend
+
+Les modules du backend lisent leur configuration à l'import : la base et les
+journaux pointent vers un répertoire temporaire avant tout import, pour
+qu'aucun test ne touche backend/elevai.db ni backend/logs.
+"""
+
+import os
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="elevai_tests_")
+os.environ.setdefault("DB_BACKEND", "sqlite")
+os.environ["DB_PATH"] = os.path.join(_tmp, "elevai.db")
+os.environ["DB_SHARDS"] = "1"
+os.environ["ELEVAI_SLOW_QUERY_LOG"] = os.path.join(_tmp, "slow_queries.log")
+os.environ["ELEVAI_CAPTURE_LOG"] = ""
@@ -0,0 +1,173 @@
+"""
+Limitation par utilisateur : id lu dans le chemin ou dans le corps de POST /data,
+nombre de seaux borné ; concurrence par route : rejet 503 si la file est pleine ou
+l'attente trop longue, créneau rendu quand une attente est annulée
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from backend.admission import AdmissionController, AdmissionMiddleware, RouteGate, UserRateLimiter
+
+
+def _controller(burst: int = 2) -> AdmissionController:
+    return AdmissionController({}, queue_timeout=1, rate_per_min=1, burst=burst)
+
+
+async def _echo_app(scope, receive, send):
+    """Application minimale : renvoie le corps reçu"""
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": body})
+
+
+def _call(middleware, method: str, path: str, chunks=()):
+    messages = [{"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1}
+                for i, chunk in enumerate(chunks)] or [{"type": "http.request", "body": b""}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": method, "path": path, "headers": []}
+    asyncio.run(middleware(scope, receive, send))
+    return sent[0]["status"], b"".join(m.get("body", b"") for m in sent[1:])
+
+
+def test_post_data_is_limited_by_body_user_id():
+    middleware = AdmissionMiddleware(_echo_app, _controller(burst=2))
+    payload = json.dumps({"user_id": 7, "date": "2025-01-01"}).encode()
+    # Corps découpé en plusieurs messages : rejoué intact à l'application
+    chunks = (payload[:10], payload[10:])
+
+    assert _call(middleware, "POST", "/data", chunks) == (200, payload)
+    assert _call(middleware, "POST", "/data", chunks) == (200, payload)
+    status, _ = _call(middleware, "POST", "/data", chunks)
+    assert status == 429
+    # Même seau que les routes avec l'id dans le chemin
+    assert _call(middleware, "GET", "/analyze/7")[0] == 429
+    # Autre utilisateur non affecté
+    other = json.dumps({"user_id": 8}).encode()
+    assert _call(middleware, "POST", "/data", (other,)) == (200, other)
+
+
+def test_unparsable_body_is_passed_through():
+    middleware = AdmissionMiddleware(_echo_app, _controller(burst=1))
+    for _ in range(3):
+        assert _call(middleware, "POST", "/data", (b"{not json",)) == (200, b"{not json")
+
+
+def test_bucket_map_is_bounded_lru():
+    limiter = UserRateLimiter(rate_per_min=1, burst=1, max_tracked=3)
+    for user_id in (1, 2, 3):
+        assert limiter.check(user_id) is None
+    # 1 est limité, et redevient le plus récent
+    assert limiter.check(1) is not None
+    limiter.check(4)
+
+    assert len(limiter.buckets) == 3
+    assert 2 not in limiter.buckets
+    assert limiter.check(1) is not None
+
+
+def _gated(concurrency: int, queue_size: int, queue_timeout: float):
+    """Middleware limitant /analyze, autour d'une application qui attend qu'on la libère"""
+    controller = AdmissionController({"/analyze": (concurrency, queue_size)}, queue_timeout=queue_timeout,
+                                     rate_per_min=0, burst=1)
+    started, finish = asyncio.Event(), asyncio.Event()
+
+    async def slow_app(scope, receive, send):
+        started.set()
+        await finish.wait()
+        await _echo_app(scope, receive, send)
+
+    return AdmissionMiddleware(slow_app, controller), controller.gates[0], started, finish
+
+
+async def _request(middleware, path: str = "/analyze/1"):
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    await middleware({"type": "http", "method": "GET", "path": path, "headers": []}, receive, send)
+    return sent[0]["status"], dict(sent[0]["headers"])
+
+
+def test_full_queue_is_rejected_with_503():
+    async def scenario():
+        middleware, gate, started, finish = _gated(concurrency=1, queue_size=1, queue_timeout=5)
+        running = asyncio.create_task(_request(middleware))
+        await started.wait()
+        queued = asyncio.create_task(_request(middleware))
+        await asyncio.sleep(0)
+        rejected = await _request(middleware)
+        finish.set()
+        return rejected, await running, await queued, gate.snapshot()
+
+    (status, headers), first, second, stats = asyncio.run(scenario())
+    assert status == 503
+    assert headers[b"retry-after"] == b"5"
+    assert first[0] == second[0] == 200
+    assert stats["rejected_queue_full"] == 1
+    assert stats["admitted"] == 2
+    assert stats["active"] == 0 and stats["waiting"] == 0
+
+
+def test_queue_timeout_is_rejected_with_503():
+    async def scenario():
+        middleware, gate, started, finish = _gated(concurrency=1, queue_size=4, queue_timeout=0.05)
+        running = asyncio.create_task(_request(middleware))
+        await started.wait()
+        timed_out = await _request(middleware)
+        finish.set()
+        return timed_out, await running, gate.snapshot()
+
+    (status, _), first, stats = asyncio.run(scenario())
+    assert status == 503
+    assert first[0] == 200
+    assert stats["rejected_timeout"] == 1
+    assert stats["active"] == 0 and stats["waiting"] == 0
+
+
+def test_cancelled_waiter_gives_back_its_slot():
+    async def scenario():
+        gate = RouteGate("/analyze", concurrency=1, queue_size=4)
+        assert await gate.acquire(5)
+        # Attente annulée avant l'obtention d'un créneau : retirée de la file
+        waiting = asyncio.create_task(gate.acquire(5))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert gate.snapshot()["waiting"] == 0
+
+        # Créneau transmis puis attente annulée avant la reprise de la tâche
+        granted = asyncio.create_task(gate.acquire(5))
+        await asyncio.sleep(0)
+        gate.release()
+        granted.cancel()
+        try:
+            admitted = await granted
+        except asyncio.CancelledError:
+            admitted = False
+        if admitted:
+            gate.release()
+        return gate.snapshot()
+
+    stats = asyncio.run(scenario())
+    assert stats["active"] == 0
+    assert stats["waiting"] == 0
@@ -0,0 +1,143 @@
+"""
+Analyse courante : servie depuis analysis_results tant qu'aucune journée n'est
+ingérée et que le modèle servi n'a pas changé, recalculée sinon ; un résultat
+devenu périmé avant son écriture est écarté
+"""
+
+from datetime import date, timedelta
+
+import pytest
+
+from backend import precompute
+from backend.database import get_read_connection, init_db
+from backend.ml import model
+from backend.models import DailyDataCreate
+from backend.routers import analysis
+from backend.routers.analysis import analyze_user, save_analysis
+from backend.routers.data import insert_daily_data
+from backend.user_cache import users as user_cache
+from backend.writer import get_writer
+
+init_db()
+
+
+def _create_user() -> int:
+    def op(cursor):
+        cursor.execute("INSERT INTO users (age, genre, taille_cm, poids_kg) VALUES (30, 'F', 165, 60)")
+        return cursor.lastrowid
+
+    user_id = get_writer().execute(op)
+    user_cache.add(user_id)
+    return user_id
+
+
+def _ingest(user_id: int, day: date, sommeil_h: float = 7.5):
+    entry = DailyDataCreate(user_id=user_id, date=day, sommeil_h=sommeil_h, pas=8000, sport_min=30,
+                            calories=2200, humeur_0_5=4, stress_0_5=2, fc_repos=60)
+    get_writer(user_id).execute(insert_daily_data, entry)
+
+
+def _run(op, *args):
+    return get_writer().execute(op, *args)
+
+
+def _age_state(user_id: int, seconds: int = 10):
+    """Fait comme si la dernière ingestion datait de `seconds` secondes"""
+    _run(lambda cursor: cursor.execute(
+        "UPDATE risk_state SET updated_at = datetime('now', ?) WHERE user_id = ?", (f"-{seconds} seconds", user_id)
+    ))
+
+
+def _results(user_id: int) -> int:
+    conn = get_read_connection(user_id)
+    try:
+        return conn.execute("SELECT COUNT(*) AS n FROM analysis_results WHERE user_id = ?",
+                            (user_id,)).fetchone()["n"]
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def user_id():
+    user_id = _create_user()
+    start = date(2025, 6, 1)
+    for i in range(5):
+        _ingest(user_id, start + timedelta(days=i))
+    _age_state(user_id)
+    return user_id
+
+
+def test_current_analysis_is_served_without_recomputing(user_id):
+    first = analyze_user(user_id)
+    _run(lambda cursor: None)
+    assert _results(user_id) == 1
+
+    again = analyze_user(user_id)
+    _run(lambda cursor: None)
+    assert again == first
+    assert _results(user_id) == 1
+
+
+def test_ingestion_invalidates_current_analysis(user_id):
+    analyze_user(user_id)
+    _run(lambda cursor: None)
+
+    _ingest(user_id, date(2025, 6, 10), sommeil_h=4.0)
+    recomputed = analyze_user(user_id)
+    _run(lambda cursor: None)
+    assert _results(user_id) == 2
+    assert recomputed.explanations["sommeil_h"] == "-"
+
+
+def test_model_change_invalidates_current_analysis(user_id, monkeypatch):
+    analyze_user(user_id)
+    _run(lambda cursor: None)
+    version = model.model_version()
+    conn = get_read_connection(user_id)
+    try:
+        assert user_id not in precompute.next_candidates(conn.cursor(), user_id - 1, 10, version)
+        # Promotion d'un nouveau modèle (entraînement, rafraîchissement, autre élève) : à recalculer
+        assert user_id in precompute.next_candidates(conn.cursor(), user_id - 1, 10, "nouveau.pkl@1")
+    finally:
+        conn.close()
+
+    monkeypatch.setattr(analysis, "model_version", lambda: "nouveau.pkl@1")
+    analyze_user(user_id)
+    _run(lambda cursor: None)
+    assert _results(user_id) == 2
+    analyze_user(user_id)
+    _run(lambda cursor: None)
+    assert _results(user_id) == 2
+
+
+def test_result_computed_before_an_ingestion_is_not_saved(user_id):
+    conn = get_read_connection(user_id)
+    try:
+        ingested_at = conn.execute("SELECT updated_at FROM risk_state WHERE user_id = ?",
+                                   (user_id,)).fetchone()["updated_at"]
+    finally:
+        conn.close()
+    # Journée ingérée entre la lecture et l'écriture du résultat
+    _ingest(user_id, date(2025, 6, 10))
+
+    assert _run(save_analysis, user_id, 70.0, "Bon équilibre", None, {}, [], None, ingested_at) is None
+    assert _results(user_id) == 0
+    assert _run(save_analysis, user_id, 70.0, "Bon équilibre", None, {}, [], None, None) is None
+
+
+def test_precompute_selects_ingestion_in_same_second(user_id):
+    analyze_user(user_id)
+    _run(lambda cursor: None)
+    # Ingestion de la même seconde que le dernier résultat : à recalculer
+    _run(lambda cursor: cursor.execute(
+        "UPDATE risk_state SET updated_at = (SELECT MAX(created_at) FROM analysis_results WHERE user_id = ?) "
+        "WHERE user_id = ?", (user_id, user_id)
+    ))
+    conn = get_read_connection(user_id)
+    try:
+        assert user_id in precompute.next_candidates(conn.cursor(), user_id - 1, 10, model.model_version())
+    finally:
+        conn.close()
+    assert analyze_user(user_id) is not None
+    _run(lambda cursor: None)
+    assert _results(user_id) == 2
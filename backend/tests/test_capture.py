@@ -0,0 +1,50 @@
+"""
+Capture du trafic : route enregistrée sous forme de gabarit, y compris pour les
+requêtes rejetées par l'admission avant le routage
+"""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend import capture
+from backend.admission import AdmissionController, AdmissionMiddleware
+
+
+@pytest.fixture
+def captured(monkeypatch):
+    entries = []
+    monkeypatch.setattr(capture, "record", entries.append)
+    return entries
+
+
+def _client() -> TestClient:
+    app = FastAPI()
+
+    @app.get("/analyze/{user_id}")
+    def analyze(user_id: int):
+        return {"user_id": user_id}
+
+    # Un seul jeton par utilisateur : la deuxième requête est rejetée en 429
+    controller = AdmissionController({}, queue_timeout=1, rate_per_min=1, burst=1)
+    return TestClient(capture.CaptureMiddleware(AdmissionMiddleware(app, controller),
+                                                sample=1.0, max_body=1024, exclude=()))
+
+
+def test_rejected_request_route_hides_user_id(captured):
+    client = _client()
+    assert client.get("/analyze/12").status_code == 200
+    assert client.get("/analyze/12").status_code == 429
+    assert client.get("/analyze/12/history").status_code == 429
+
+    assert [(entry["p"], entry["r"], entry["s"]) for entry in captured] == [
+        ("/analyze/12", "/analyze/{user_id}", 200),
+        ("/analyze/12", "/analyze/{user_id}", 429),
+        ("/analyze/12/history", "/analyze/{user_id}/history", 429),
+    ]
+
+
+def test_route_template_keeps_other_paths():
+    assert capture.route_template("/data/7") == "/data/{user_id}"
+    assert capture.route_template("/users") == "/users"
+    assert capture.route_template("/admin/slow-queries") == "/admin/slow-queries"
@@ -0,0 +1,81 @@
+"""
+Dialectes SQLite / MySQL : traduction des requêtes et constructions non portables
+Les requêtes SQLite générées sont exécutées sur une base temporaire ; celles de
+MySQL sont comparées au texte attendu (pas de serveur nécessaire)
+"""
+
+import pytest
+
+from backend.database import Dialect, MySQLDialect, SQLiteStorage, init_db
+
+sqlite = Dialect()
+mysql = MySQLDialect()
+
+
+def test_sqlite_keeps_queries_unchanged():
+    query = "SELECT * FROM users WHERE id = ? AND objectif LIKE '%?%'"
+    assert sqlite.sql(query) == query
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("SELECT * FROM users WHERE id = ?", "SELECT * FROM users WHERE id = %s"),
+    ("INSERT INTO t (a, b) VALUES (?, ?)", "INSERT INTO t (a, b) VALUES (%s, %s)"),
+    # "?" et "%" dans les chaînes littérales : pas de placeholder, "%" doublé pour PyMySQL
+    ("SELECT '?' AS q, \"a?b\" AS r FROM t WHERE x = ?", "SELECT '?' AS q, \"a?b\" AS r FROM t WHERE x = %s"),
+    ("SELECT * FROM t WHERE name LIKE 'a%' AND id = ?", "SELECT * FROM t WHERE name LIKE 'a%%' AND id = %s"),
+    ("SELECT id % 2 FROM t", "SELECT id %% 2 FROM t"),
+    ("SELECT 'it''s ?' FROM t WHERE id = ?", "SELECT 'it''s ?' FROM t WHERE id = %s"),
+])
+def test_mysql_placeholder_translation(query, expected):
+    assert mysql.sql(query) == expected
+
+
+def test_upsert_sql():
+    columns = ["user_id", "date", "score"]
+    assert sqlite.upsert("t", columns, keys=["user_id", "date"]) == (
+        "INSERT INTO t (user_id, date, score) VALUES (?, ?, ?) "
+        "ON CONFLICT(user_id, date) DO UPDATE SET score = excluded.score"
+    )
+    assert mysql.upsert("t", columns, keys=["user_id", "date"]) == (
+        "INSERT INTO t (user_id, date, score) VALUES (?, ?, ?) "
+        "ON DUPLICATE KEY UPDATE score = VALUES(score)"
+    )
+
+
+def test_upsert_timestamps_and_no_update():
+    assert sqlite.upsert("risk_state", ["user_id", "state"], keys=["user_id"], timestamps=["updated_at"]) == (
+        "INSERT INTO risk_state (user_id, state, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP) "
+        "ON CONFLICT(user_id) DO UPDATE SET state = excluded.state, updated_at = CURRENT_TIMESTAMP"
+    )
+    assert mysql.upsert("risk_state", ["user_id", "state"], keys=["user_id"], timestamps=["updated_at"]) == (
+        "INSERT INTO risk_state (user_id, state, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP) "
+        "ON DUPLICATE KEY UPDATE state = VALUES(state), updated_at = CURRENT_TIMESTAMP"
+    )
+    assert sqlite.upsert("t", ["a", "b"], keys=["a"], update=[]).endswith("ON CONFLICT(a) DO NOTHING")
+    assert mysql.upsert("t", ["a", "b"], keys=["a"], update=[]).endswith("ON DUPLICATE KEY UPDATE a = a")
+
+
+def test_schema_constructs():
+    assert sqlite.autoincrement_pk == "INTEGER PRIMARY KEY AUTOINCREMENT"
+    assert mysql.autoincrement_pk == "INTEGER PRIMARY KEY AUTO_INCREMENT"
+    assert sqlite.text_index.format("objectif") == "objectif"
+    assert mysql.text_index.format("objectif") == "objectif(191)"
+    assert mysql.key_text == "VARCHAR(32)"
+
+
+def test_sqlite_upsert_executes(tmp_path):
+    storage = SQLiteStorage(tmp_path / "dialect.db")
+    init_db(storage)
+    conn = storage.connect()
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO users (age, genre, taille_cm, poids_kg) VALUES (?, ?, ?, ?)", (30, "F", 165, 60))
+    user_id = cursor.lastrowid
+    query = sqlite.upsert("daily_data", ["user_id", "date", "sommeil_h"], keys=["user_id", "date"])
+    cursor.execute(query, (user_id, "2025-01-01", 6.0))
+    cursor.execute(query, (user_id, "2025-01-01", 8.0))
+    cursor.execute("SELECT COUNT(*) AS n, MAX(sommeil_h) AS h FROM daily_data")
+    row = cursor.fetchone()
+    has_index = storage.index_exists(cursor, "users", "idx_users_objectif")
+    conn.close()
+    assert (row["n"], row["h"]) == (1, 8.0)
+    assert has_index
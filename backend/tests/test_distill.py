@@ -0,0 +1,99 @@
+"""
+Distillation : sélection du modèle selon le budget de latence, manifeste et vecteurs d'entraînement
+"""
+
+import json
+import os
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+from backend import database
+from backend.database import SQLiteStorage, init_db
+from backend.ml import distill
+from backend.ml.model import FEATURE_VERSION
+from backend.feature_store import encode
+
+
+@pytest.fixture
+def model_dir(tmp_path, monkeypatch):
+    """Forêt enseignante et manifeste dans un répertoire temporaire"""
+    monkeypatch.setattr(distill, "MODEL_PATH", str(tmp_path / "model.pkl"))
+    monkeypatch.setattr(distill, "MODEL_DIR", str(tmp_path))
+    monkeypatch.setattr(distill, "MANIFEST_PATH", str(tmp_path / "manifest.json"))
+    monkeypatch.setattr(distill, "STUDENTS_DIR", str(tmp_path / "students"))
+    distill._teacher_sha_cache.update(mtime=None, sha=None)
+    X = np.random.default_rng(0).random((200, 7))
+    forest = RandomForestRegressor(n_estimators=5, max_depth=4, random_state=42).fit(X, X @ np.arange(1, 8) * 3)
+    joblib.dump(forest, distill.MODEL_PATH)
+    yield tmp_path
+    distill._teacher_sha_cache.update(mtime=None, sha=None)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """Base vide à la place de celle des tests, pour maîtriser le feature store"""
+    storage = SQLiteStorage(tmp_path / "store.db")
+    init_db(storage)
+    monkeypatch.setattr(database, "storages", [storage])
+    return storage
+
+
+def _manifest(teacher_sha):
+    return {"models": {
+        "forest": {"path": "model.pkl", "mae": 0.0, "latency_ms": 5.0},
+        "gbr_shallow": {"path": "students/gbr.pkl", "mae": 0.4, "latency_ms": 0.8, "teacher_sha256": teacher_sha},
+        "tree": {"path": "students/tree.pkl", "mae": 1.2, "latency_ms": 0.1, "teacher_sha256": teacher_sha},
+        "stale": {"path": "students/stale.pkl", "mae": 0.1, "latency_ms": 0.05, "teacher_sha256": "ancienne"},
+    }}
+
+
+@pytest.mark.parametrize("budget_ms, expected", [
+    (10.0, "model.pkl"),          # la forêt tient dans le budget : la plus fidèle
+    (1.0, "students/gbr.pkl"),    # le plus fidèle des élèves sous le budget
+    (0.2, "students/tree.pkl"),
+    (0.01, "students/tree.pkl"),  # aucun sous le budget : le plus rapide (hors élève périmé)
+])
+def test_select_model(model_dir, budget_ms, expected):
+    manifest = _manifest(distill.file_sha256(distill.MODEL_PATH))
+    assert distill.select_model(budget_ms, manifest) == os.path.join(str(model_dir), expected)
+
+
+def test_select_model_ignores_students_of_another_forest(model_dir):
+    manifest = _manifest("ancienne")
+    assert distill.select_model(1.0, manifest) == os.path.join(str(model_dir), "model.pkl")
+    assert distill.select_model(1.0, {}) is None
+
+
+def test_distill_writes_manifest_on_stored_vectors(model_dir, store):
+    conn = store.connect()
+    vectors = np.random.default_rng(1).random((40, 7))
+    conn.cursor().executemany(
+        "INSERT INTO feature_store (user_id, date, version, features, smoothed) VALUES (?, ?, ?, ?, ?)",
+        [(1, f"2024-{1 + i // 28:02d}-{1 + i % 28:02d}", FEATURE_VERSION, encode(v), encode(v))
+         for i, v in enumerate(vectors)],
+    )
+    conn.commit()
+    conn.close()
+
+    X, sources = distill.sample_features(60, seed=3)
+    assert sources == {"feature_store": 40, "synthetic": 20}
+    stored = {tuple(v) for v in vectors}
+    assert sum(tuple(row) in stored for row in X) == 40
+    assert ((X >= 0) & (X <= 1)).all()
+
+    models = distill.distill(n_train=300, n_holdout=100, seed=3)
+
+    manifest = json.loads((model_dir / "manifest.json").read_text())
+    assert manifest["models"] == models
+    assert manifest["distillation"] == {
+        "n_train": 300, "n_holdout": 100, "sources": {"feature_store": 40, "synthetic": 360},
+    }
+    teacher_sha = distill.file_sha256(distill.MODEL_PATH)
+    for name in distill.build_students():
+        assert models[name]["teacher_sha256"] == teacher_sha
+        assert (model_dir / models[name]["path"]).exists()
+    # Le manifeste écrit est celui que lit la sélection
+    assert distill.select_model(1e9) == os.path.join(str(model_dir), "model.pkl")
@@ -0,0 +1,74 @@
+"""
+Hub SSE : abonnement, publication depuis un autre thread, désabonnement et file pleine
+"""
+
+import asyncio
+import json
+import threading
+
+from backend.events import EventHub, format_event
+
+
+def _message(text: str):
+    event, data = text.strip().split("\n")
+    return event.removeprefix("event: "), json.loads(data.removeprefix("data: "))
+
+
+def test_format_event():
+    assert format_event("analysis", {"score": 72.5, "category": "Équilibre"}) == \
+        'event: analysis\ndata: {"score": 72.5, "category": "Équilibre"}\n\n'
+
+
+def test_publish_reaches_subscribers_of_the_user_only():
+    hub = EventHub(queue_size=4)
+
+    async def scenario():
+        first, second, other = hub.subscribe(1), hub.subscribe(1), hub.subscribe(2)
+        # Publication depuis un thread (route synchrone, tâche de fond)
+        counts = []
+        thread = threading.Thread(target=lambda: counts.append(hub.publish(1, "data", {"date": "2025-01-01"})))
+        thread.start()
+        thread.join()
+        received = [await asyncio.wait_for(queue.get(), 1) for queue in (first, second)]
+        return counts, received, other.empty()
+
+    counts, received, other_empty = asyncio.run(scenario())
+    assert counts == [2]
+    assert [_message(text) for text in received] == [("data", {"date": "2025-01-01"})] * 2
+    assert other_empty
+    assert hub.stats == {"published": 1, "delivered": 2, "dropped": 0}
+
+
+def test_unsubscribe_forgets_user_after_last_connection():
+    hub = EventHub(queue_size=4)
+    # Rien à publier avant le premier abonnement
+    assert hub.publish(1, "data", {}) == 0
+
+    async def scenario():
+        first, second = hub.subscribe(1), hub.subscribe(1)
+        assert hub.snapshot()["connections"] == 2
+        hub.unsubscribe(1, first)
+        assert hub.has_subscribers(1)
+        hub.unsubscribe(1, second)
+        # Désabonnement répété (déconnexion après erreur) sans effet
+        hub.unsubscribe(1, second)
+
+    asyncio.run(scenario())
+    assert not hub.has_subscribers(1)
+    assert hub.publish(1, "data", {}) == 0
+    assert hub.snapshot() == {"users": 0, "connections": 0, "published": 0, "delivered": 0, "dropped": 0}
+
+
+def test_full_queue_drops_oldest_messages():
+    hub = EventHub(queue_size=2)
+
+    async def scenario():
+        queue = hub.subscribe(1)
+        for i in range(5):
+            hub.publish(1, "data", {"i": i})
+        # Remise dans la boucle d'événements : laisser passer les rappels
+        await asyncio.sleep(0)
+        return [_message(queue.get_nowait())[1]["i"] for _ in range(queue.qsize())]
+
+    assert asyncio.run(scenario()) == [3, 4]
+    assert hub.stats == {"published": 5, "delivered": 5, "dropped": 3}
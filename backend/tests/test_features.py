@@ -0,0 +1,90 @@
+"""
+Normalisation vectorisée : normalize_batch / smooth_batch doivent reproduire
+exactement build_features, dont le feature store stocke le résultat
+"""
+
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from backend import feature_store
+from backend.database import SQLiteStorage, init_db
+from backend.ml.model import RAW_COLUMNS, build_features, normalize_batch, normalize_features, raw_matrix, smooth_batch
+
+
+def _rows(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    rows = []
+    start = date(2025, 3, 1)
+    for i in range(n):
+        row = {
+            "date": (start + timedelta(days=i)).isoformat(),
+            "sommeil_h": float(rng.uniform(3, 11)), "pas": int(rng.integers(0, 20000)),
+            "sport_min": float(rng.uniform(0, 150)), "calories": int(rng.integers(1200, 4000)),
+            "humeur_0_5": float(rng.integers(0, 6)), "stress_0_5": float(rng.integers(0, 6)),
+            "fc_repos": int(rng.integers(40, 120)),
+        }
+        # Valeurs manquantes et zéros : remplacées par les défauts dans les deux versions
+        for column in RAW_COLUMNS:
+            draw = rng.random()
+            if draw < 0.1:
+                row[column] = None
+            elif draw < 0.15:
+                row[column] = 0
+        rows.append(row)
+    return rows
+
+
+def test_normalize_batch_matches_normalize_features():
+    rows = _rows(300)
+    expected = np.vstack([normalize_features(row) for row in rows])
+    np.testing.assert_allclose(normalize_batch(raw_matrix(rows)), expected, rtol=0, atol=1e-12)
+
+
+def test_smooth_batch_matches_build_features():
+    rows = _rows(200, seed=1)
+    raw = raw_matrix(rows)
+    smoothed = smooth_batch(raw, normalize_batch(raw))
+    for i, row in enumerate(rows):
+        # build_features reçoit les journées les plus récentes d'abord
+        recent = rows[max(0, i - 2):i + 1][::-1]
+        np.testing.assert_allclose(smoothed[i], build_features(row, recent)[0], rtol=0, atol=1e-12)
+
+
+@pytest.mark.parametrize("n", [0, 1, 2, 3])
+def test_short_histories(n):
+    rows = _rows(n, seed=2)
+    raw = raw_matrix(rows)
+    features = normalize_batch(raw)
+    assert features.shape == (n, len(RAW_COLUMNS))
+    np.testing.assert_array_equal(smooth_batch(raw, features)[:2], features[:2])
+
+
+def test_record_day_stores_build_features_vectors(tmp_path):
+    storage = SQLiteStorage(tmp_path / "features.db")
+    init_db(storage)
+    conn = storage.connect()
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO users (age, genre, taille_cm, poids_kg) VALUES (30, 'F', 165, 60)")
+    user_id = cursor.lastrowid
+    rows = _rows(8, seed=3)
+    columns = ", ".join(("user_id", "date") + RAW_COLUMNS)
+    # Journées ingérées dans le désordre : record_day recalcule aussi les 2 journées suivantes
+    for index in (0, 1, 5, 2, 3, 7, 4, 6):
+        row = rows[index]
+        cursor.execute(f"INSERT INTO daily_data ({columns}) VALUES ({', '.join('?' * (len(RAW_COLUMNS) + 2))})",
+                       [user_id, row["date"]] + [row[c] for c in RAW_COLUMNS])
+        feature_store.record_day(cursor, user_id, row["date"])
+
+    cursor.execute("SELECT date, features, smoothed FROM feature_store WHERE user_id = ? ORDER BY date",
+                   (user_id,))
+    stored = cursor.fetchall()
+    conn.close()
+
+    assert [row["date"] for row in stored] == [row["date"] for row in rows]
+    for i, row in enumerate(stored):
+        recent = rows[max(0, i - 2):i + 1][::-1]
+        np.testing.assert_allclose(feature_store.decode(row["features"]), normalize_features(rows[i]), atol=1e-12)
+        np.testing.assert_allclose(feature_store.decode(row["smoothed"]), build_features(rows[i], recent),
+                                   atol=1e-12)
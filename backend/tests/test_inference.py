@@ -0,0 +1,91 @@
+"""
+Exécuteur d'inférence : un processus tué ne fait pas échouer la prédiction
+(repli dans le thread appelant) et le pool est recréé ; grilles de simulation
+"""
+
+import json
+import os
+import signal
+import time
+
+import numpy as np
+import pytest
+
+from backend import config
+from backend.ml import inference
+from backend.ml.model import predict_from_features, predict_matrix, score_features
+from backend.models import SimulationRequest
+from pydantic import ValidationError
+
+FEATURES = np.array([[0.8, 0.6, 0.4, 0.5, 0.7, 0.6, 0.3]])
+
+
+@pytest.fixture
+def executor(monkeypatch):
+    executor = inference.InferenceExecutor(workers=1, window_ms=1, max_batch=8)
+    monkeypatch.setattr(config, "INFERENCE_WORKERS", 1)
+    monkeypatch.setattr(inference, "_executor", executor)
+    yield executor
+    executor.shutdown()
+
+
+def _kill_workers(executor):
+    pids = list(executor._pool._processes)
+    for pid in pids:
+        os.kill(pid, signal.SIGKILL)
+    return pids
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGKILL"), reason="SIGKILL indisponible")
+def test_killed_worker_falls_back_and_pool_is_rebuilt(executor):
+    expected = round(float(score_features(FEATURES)[0]), 1)
+    assert predict_from_features(FEATURES)[0] == expected
+    broken_pool = executor._pool
+
+    assert _kill_workers(executor)
+    # Laisser le pool constater la mort du processus
+    time.sleep(0.5)
+
+    assert predict_from_features(FEATURES)[0] == expected
+    assert executor.stats["fallbacks"] == 1
+
+    deadline = time.monotonic() + 5
+    while executor._pool is broken_pool and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert executor.stats["pool_restarts"] == 1
+    # Le nouveau pool sert les demandes suivantes
+    assert executor.predict(FEATURES.reshape(-1)) == pytest.approx(expected, abs=0.05)
+    assert executor.stats["fallbacks"] == 1
+
+
+def test_timeout_falls_back_to_calling_thread(executor, monkeypatch):
+    monkeypatch.setattr(executor, "predict", lambda features: (_ for _ in ()).throw(TimeoutError()))
+    score, category = predict_from_features(FEATURES)
+    assert score == round(float(score_features(FEATURES)[0]), 1)
+    assert category
+    assert executor.stats["fallbacks"] == 1
+
+
+def test_matrix_is_scored_in_one_pool_batch(executor):
+    matrix = np.vstack([FEATURES * scale for scale in np.linspace(0.5, 1.0, 40)])
+    assert predict_matrix(matrix) == pytest.approx(score_features(matrix))
+    assert executor.stats["batches"] == 1
+    assert executor.stats["requests"] == 40
+    assert executor.stats["fallbacks"] == 0
+
+
+def test_matrix_falls_back_when_pool_fails(executor, monkeypatch):
+    monkeypatch.setattr(executor, "predict_matrix", lambda features: (_ for _ in ()).throw(TimeoutError()))
+    assert predict_matrix(FEATURES) == pytest.approx(score_features(FEATURES))
+    assert executor.stats["fallbacks"] == 1
+
+
+@pytest.mark.parametrize("value, literal", [
+    (float("nan"), "NaN"), (float("inf"), "Infinity"), (float("-inf"), "-Infinity")
+])
+def test_simulation_rejects_non_finite_deltas(value, literal):
+    with pytest.raises(ValidationError, match="finite"):
+        SimulationRequest(deltas={"sommeil_h": [0, value]})
+    # Corps JSON : NaN et Infinity sont acceptés par le décodeur, puis rejetés par le modèle
+    with pytest.raises(ValidationError, match="finite"):
+        SimulationRequest.model_validate(json.loads('{"deltas": {"pas": [0, %s]}}' % literal))
@@ -0,0 +1,97 @@
+"""
+Rejeu du trafic : une requête n'est réémise que si elle n'est pas partie
+"""
+
+import http.client
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from backend.benchmarks.replay import Replayer, summarize
+
+POST = {"m": "POST", "p": "/data", "b": '{"user_id": 1}'}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self._respond()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.posts += 1
+        if self.server.mode == "drop":
+            # Requête reçue (et traitée) mais connexion coupée avant la réponse
+            self.close_connection = True
+            return
+        self._respond()
+
+    def _respond(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+        # Fin du keep-alive côté serveur, sans en prévenir le client
+        self.close_connection = self.server.mode == "close"
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.posts, httpd.mode = 0, "keep-alive"
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _replayer(server):
+    return Replayer(f"http://127.0.0.1:{server.server_address[1]}", timeout=5)
+
+
+def test_closed_idle_connection_is_replaced_before_sending(server):
+    server.mode = "close"
+    replayer = _replayer(server)
+    for _ in range(3):
+        assert replayer.send(POST) == 200
+        assert replayer.last_retries == 0
+        # Connexion inactive : la fermeture par le serveur arrive avant la requête suivante
+        time.sleep(0.1)
+    assert server.posts == 3
+
+
+def test_failure_after_sending_is_not_retried(server):
+    server.mode = "drop"
+    replayer = _replayer(server)
+    with pytest.raises((http.client.HTTPException, ConnectionError)):
+        replayer.send(POST)
+    assert replayer.last_retries == 0
+    assert server.posts == 1
+
+
+def test_send_failure_on_reused_connection_is_retried_once(server, monkeypatch):
+    replayer = _replayer(server)
+    assert replayer.send({"m": "GET", "p": "/health"}) == 200
+    stale = replayer._local.conn
+
+    def broken_pipe(*args, **kwargs):
+        raise BrokenPipeError()
+
+    monkeypatch.setattr(stale, "request", broken_pipe)
+    assert replayer.send(POST) == 200
+    assert replayer.last_retries == 1
+    assert replayer._local.conn is not stale
+    assert server.posts == 1
+
+
+def test_summary_counts_retries():
+    results = [{"route": "POST /data", "status": 200, "ms": 1.0, "captured_ms": None, "retries": r}
+               for r in (0, 1, 1)]
+    assert summarize(results)["POST /data"]["retries"] == 2
@@ -0,0 +1,93 @@
+"""
+Compaction : curseur d'agrégation retardé et politiques de rétention
+"""
+
+import pytest
+
+from backend import config, retention
+from backend.database import SQLiteStorage, init_db
+
+
+@pytest.fixture
+def cursor(tmp_path):
+    storage = SQLiteStorage(tmp_path / "retention.db")
+    init_db(storage)
+    conn = storage.connect()
+    cur = conn.cursor()
+    for _ in range(3):
+        cur.execute("INSERT INTO users (age, genre, taille_cm, poids_kg) VALUES (30, 'F', 165, 60)")
+    yield cur
+    conn.close()
+
+
+def _add_result(cursor, user_id: int, score: float, age: str = "-1 day"):
+    cursor.execute(
+        "INSERT INTO analysis_results (user_id, score, category, created_at) "
+        "VALUES (?, ?, 'Bon', datetime('now', ?))",
+        (user_id, score, age),
+    )
+    return cursor.lastrowid
+
+
+def _ids(cursor, user_id: int):
+    cursor.execute("SELECT id FROM analysis_results WHERE user_id = ? ORDER BY id", (user_id,))
+    return [row["id"] for row in cursor.fetchall()]
+
+
+def test_rollup_stops_before_recent_results(cursor):
+    settled = [_add_result(cursor, 1, 50 + i) for i in range(3)]
+    recent = _add_result(cursor, 1, 90, age="-1 second")
+    # Plus ancien mais d'id plus grand : ne doit pas être agrégé avant le récent
+    _add_result(cursor, 1, 60)
+
+    assert retention.rollup_batch(cursor, 100, lag_s=60) == 3
+    assert retention.get_watermark(cursor) == settled[-1]
+    assert retention.rollup_batch(cursor, 100, lag_s=60) == 0
+
+    assert retention.rollup_batch(cursor, 100, lag_s=0) == 2
+    assert retention.get_watermark(cursor) > recent
+    cursor.execute("SELECT SUM(n_results) AS n FROM analysis_history")
+    assert cursor.fetchone()["n"] == 5
+
+
+def test_last_n_keeps_newest_per_user(cursor, monkeypatch):
+    monkeypatch.setattr(config, "ANALYSIS_RETENTION", "last_n")
+    monkeypatch.setattr(config, "ANALYSIS_KEEP_LAST", 3)
+    for i in range(8):
+        _add_result(cursor, 1, i)
+        if i % 2:
+            _add_result(cursor, 2, i)
+    _add_result(cursor, 3, 1)
+    expected = {user_id: _ids(cursor, user_id)[-3:] for user_id in (1, 2, 3)}
+
+    while retention.rollup_batch(cursor, 4, lag_s=0):
+        pass
+    deleted = 0
+    while True:
+        done = retention.prune_batch(cursor, 2)
+        if not done:
+            break
+        deleted += done
+
+    assert deleted == 5 + 1
+    assert {user_id: _ids(cursor, user_id) for user_id in (1, 2, 3)} == expected
+
+
+def test_last_n_only_prunes_below_watermark(cursor, monkeypatch):
+    monkeypatch.setattr(config, "ANALYSIS_RETENTION", "last_n")
+    monkeypatch.setattr(config, "ANALYSIS_KEEP_LAST", 1)
+    ids = [_add_result(cursor, 1, i) for i in range(4)]
+
+    retention.rollup_batch(cursor, 2, lag_s=0)
+    assert retention.prune_batch(cursor, 100) == 2
+    assert _ids(cursor, 1) == ids[2:]
+
+
+def test_daily_keeps_last_result_per_day(cursor):
+    for age in ("-3 days", "-3 days", "-2 days", "-2 days", "-2 days"):
+        _add_result(cursor, 1, 70, age=age)
+    ids = _ids(cursor, 1)
+
+    retention.rollup_batch(cursor, 100, lag_s=0)
+    assert retention.prune_batch(cursor, 100) == 3
+    assert _ids(cursor, 1) == [ids[1], ids[4]]
@@ -0,0 +1,103 @@
+"""
+TrendState : les sommes courantes mises à jour journée par journée doivent
+rester égales à celles recalculées sur les seules observations de chaque fenêtre
+"""
+
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from backend.ml.risk import METRICS, WINDOWS, TrendState, compute_trends
+
+
+def _rows(n_days: int, seed: int = 0, gaps: bool = True, missing: bool = True):
+    rng = np.random.default_rng(seed)
+    day = date(2025, 1, 1)
+    rows = []
+    for _ in range(n_days):
+        # Jours sautés : les fenêtres sont en jours calendaires, pas en nombre de lignes
+        day += timedelta(days=int(rng.integers(1, 4)) if gaps else 1)
+        row = {"date": day.isoformat(),
+               "stress_0_5": float(rng.uniform(0, 5)), "sommeil_h": float(rng.uniform(4, 9)),
+               "humeur_0_5": float(rng.uniform(0, 5)), "fc_repos": float(rng.integers(50, 80))}
+        if missing and rng.random() < 0.2:
+            row[METRICS[int(rng.integers(len(METRICS)))]] = None
+        rows.append(row)
+    return rows
+
+
+def _window_sums(rows, last_x: int, origin: int):
+    """Sommes (n, Σx, Σy, Σxy, Σx²) recalculées directement, par métrique et fenêtre"""
+    expected = np.zeros((len(METRICS), len(WINDOWS), 5))
+    for row in rows:
+        x = date.fromisoformat(row["date"]).toordinal() - origin
+        for w_idx, width in enumerate(WINDOWS):
+            if x <= last_x - width:
+                continue
+            for m_idx, metric in enumerate(METRICS):
+                value = row[metric]
+                if value is not None:
+                    expected[m_idx, w_idx] += [1.0, x, value, x * value, x * x]
+    return expected
+
+
+def test_running_sums_match_window_recomputation():
+    rows = _rows(120)
+    state = TrendState()
+    for i, row in enumerate(rows):
+        state.push(row["date"], row)
+        np.testing.assert_allclose(
+            state.sums, _window_sums(rows[:i + 1], state.last_x, state.origin), rtol=1e-9, atol=1e-6
+        )
+
+
+def test_from_rows_matches_incremental_pushes():
+    rows = _rows(60, seed=1)
+    incremental = TrendState()
+    for row in rows:
+        incremental.push(row["date"], row)
+
+    rebuilt = TrendState.from_rows(reversed(rows))
+
+    assert rebuilt.last_day == incremental.last_day == rows[-1]["date"]
+    np.testing.assert_allclose(rebuilt.sums, incremental.sums)
+    np.testing.assert_allclose(rebuilt.ewma, incremental.ewma, equal_nan=True)
+
+
+def test_json_roundtrip_keeps_updating_identically():
+    rows = _rows(50, seed=2)
+    direct = TrendState.from_rows(rows[:40])
+    restored = TrendState.from_json(direct.to_json())
+    for row in rows[40:]:
+        direct.push(row["date"], row)
+        restored = TrendState.from_json(restored.to_json())
+        restored.push(row["date"], row)
+
+    np.testing.assert_allclose(restored.sums, direct.sums)
+    np.testing.assert_allclose(restored.ewma, direct.ewma, equal_nan=True)
+
+
+def test_slopes_match_least_squares():
+    rows = _rows(40, seed=3, missing=False)
+    state = TrendState.from_rows(rows)
+    slopes = compute_trends([state])["slope"][0]
+
+    xs = np.array([date.fromisoformat(row["date"]).toordinal() - state.origin for row in rows])
+    for w_idx, width in enumerate(WINDOWS):
+        inside = xs > state.last_x - width
+        if inside.sum() < 2:
+            continue
+        for m_idx, metric in enumerate(METRICS):
+            ys = np.array([row[metric] for row in rows])[inside]
+            expected = np.polyfit(xs[inside], ys, 1)[0]
+            assert slopes[m_idx, w_idx] == pytest.approx(expected, rel=1e-6, abs=1e-9)
+
+
+def test_push_rejects_past_or_repeated_days():
+    rows = _rows(5, seed=4, gaps=False)
+    state = TrendState.from_rows(rows)
+    with pytest.raises(ValueError):
+        state.push(rows[-1]["date"], rows[-1])
+    with pytest.raises(ValueError):
+        state.push(rows[0]["date"], rows[0])
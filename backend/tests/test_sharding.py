@@ -0,0 +1,105 @@
+"""
+Partitionnement : classes de résidus des identifiants et repartitionnement
+"""
+
+import pytest
+
+from backend import database, reshard
+from backend.database import SQLiteStorage, init_db, shard_path
+
+
+def _add_user(cursor, user_id=None):
+    if user_id is None:
+        cursor.execute("INSERT INTO users (age, genre, taille_cm, poids_kg) VALUES (30, 'F', 165, 60)")
+        return cursor.lastrowid
+    cursor.execute(
+        "INSERT INTO users (id, age, genre, taille_cm, poids_kg) VALUES (?, 30, 'F', 165, 60)", (user_id,)
+    )
+    return user_id
+
+
+@pytest.fixture
+def shards(tmp_path, monkeypatch):
+    """Trois bases SQLite à la place de la base unique des tests"""
+    storages = [SQLiteStorage(shard_path(tmp_path / "elevai.db", shard, 3)) for shard in range(3)]
+    for shard_storage in storages:
+        init_db(shard_storage)
+    monkeypatch.setattr(database, "storages", storages)
+    return storages
+
+
+def test_next_user_id_stays_in_shard_residue_class(shards):
+    for shard, shard_storage in enumerate(shards):
+        conn = shard_storage.connect()
+        cursor = conn.cursor()
+        ids = []
+        for _ in range(4):
+            ids.append(_add_user(cursor, database.next_user_id(cursor, shard)))
+        conn.commit()
+        conn.close()
+
+        assert ids == [shard + 1 + 3 * i for i in range(4)]
+        assert {database.shard_of(user_id) for user_id in ids} == {shard}
+
+
+def test_next_user_id_without_sharding_uses_autoincrement(tmp_path, monkeypatch):
+    storage = SQLiteStorage(tmp_path / "single.db")
+    init_db(storage)
+    monkeypatch.setattr(database, "storages", [storage])
+    conn = storage.connect()
+    assert database.next_user_id(conn.cursor(), 0) is None
+    assert [database.shard_of(user_id) for user_id in (1, 2, 7)] == [0, 0, 0]
+    conn.close()
+
+
+def _populate(path, user_ids, watermark):
+    storage = SQLiteStorage(path)
+    init_db(storage)
+    conn = storage.connect()
+    cursor = conn.cursor()
+    for user_id in user_ids:
+        _add_user(cursor, user_id)
+        for day in range(1, 4):
+            cursor.execute("INSERT INTO daily_data (user_id, date, sommeil_h) VALUES (?, ?, 7)",
+                           (user_id, f"2024-01-0{day}"))
+        for score in (40, 60):
+            cursor.execute("INSERT INTO analysis_results (user_id, score, category) VALUES (?, ?, 'Bon')",
+                           (user_id, score))
+    cursor.execute("INSERT INTO maintenance_state (name, value) VALUES (?, ?)",
+                   (reshard.WATERMARK_KEY, str(watermark)))
+    conn.commit()
+    conn.close()
+
+
+def _user_ids(path):
+    conn = SQLiteStorage(path).connect()
+    ids = {table: sorted(row["user_id"] for row in conn.execute(f"SELECT {key} AS user_id FROM {table}").fetchall())
+           for table, key in (("users", "id"), ("daily_data", "user_id"), ("analysis_results", "user_id"))}
+    watermark = reshard._watermark(conn)
+    conn.close()
+    return ids, watermark
+
+
+def test_reshard_routes_rows_and_preserves_counts(tmp_path):
+    base = tmp_path / "elevai.db"
+    # Deux bases : utilisateurs impairs dans la première, pairs dans la seconde
+    _populate(shard_path(base, 0, 2), [1, 3, 5], watermark=4)
+    _populate(shard_path(base, 1, 2), [2, 4, 6], watermark=0)
+
+    copied = reshard.reshard(2, 3, base_path=base)
+
+    assert copied["users"] == 6
+    assert copied["daily_data"] == 18
+    assert copied["analysis_results"] == 12
+    watermarks = []
+    for shard in range(3):
+        ids, watermark = _user_ids(shard_path(base, shard, 3))
+        expected = [u for u in range(1, 7) if (u - 1) % 3 == shard]
+        assert ids["users"] == expected
+        assert ids["daily_data"] == sorted(expected * 3)
+        assert ids["analysis_results"] == sorted(expected * 2)
+        watermarks.append(watermark)
+    # Résultats déjà agrégés (base 0, ids <= 4 : utilisateurs 1 et 3) et eux seuls sous les curseurs
+    assert watermarks == [2, 0, 2]
+    backups = {p.name.split(".pre-reshard-")[0] for p in tmp_path.glob("*.pre-reshard-*")}
+    assert {"elevai.shard0.db", "elevai.shard1.db"} <= backups
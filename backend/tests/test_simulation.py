@@ -0,0 +1,70 @@
+"""
+Simulation « et si » : plafonds de la grille et features des scénarios
+"""
+
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend import config
+from backend.ml.model import RAW_COLUMNS, RAW_MAX, RAW_MIN, build_features, raw_matrix, scenario_features
+from backend.routers import analysis
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(analysis.router)
+    return TestClient(app)
+
+
+def test_huge_grid_is_rejected_without_overflow(client):
+    # 1024 ** 7 = 2 ** 70 : vaut 0 en int64, et passait le plafond
+    deltas = {metric: [float(i) for i in range(1024)] for metric in RAW_COLUMNS}
+    response = client.post("/analyze/1/simulate", json={"deltas": deltas})
+    assert response.status_code == 400
+    assert "Trop de scénarios" in response.json()["detail"]
+
+
+def test_overlong_delta_list_is_rejected(client):
+    deltas = {"pas": [0.0] * (config.SIMULATION_MAX_SCENARIOS + 1)}
+    response = client.post("/analyze/1/simulate", json={"deltas": deltas})
+    assert response.status_code == 422
+
+
+DAYS = [
+    {"sommeil_h": 6.5, "pas": 7000, "sport_min": 20, "calories": 2100, "humeur_0_5": 3, "stress_0_5": 2, "fc_repos": 64},
+    {"sommeil_h": 7.5, "pas": 9000, "sport_min": 0, "calories": 2300, "humeur_0_5": 4, "stress_0_5": 1, "fc_repos": 60},
+    {"sommeil_h": 8.0, "pas": 4000, "sport_min": 45, "calories": 1900, "humeur_0_5": 2, "stress_0_5": 3, "fc_repos": 70},
+]
+
+
+def _shifted(days, delta, n_days):
+    """Journées saisies équivalentes à un scénario : écarts bornés au domaine de saisie"""
+    shifted = [dict(day) for day in days]
+    for day in shifted[:n_days]:
+        for metric, value in delta.items():
+            index = RAW_COLUMNS.index(metric)
+            day[metric] = float(np.clip(day[metric] + value, RAW_MIN[index], RAW_MAX[index]))
+    return shifted
+
+
+@pytest.mark.parametrize("sustained", [False, True])
+def test_scenarios_match_build_features(sustained):
+    scenarios = [
+        {},
+        # Stress et sommeil bornés à 0 : valeur manquante pour build_features (3 et 7)
+        {"stress_0_5": -5, "sommeil_h": -10},
+        {"pas": 2000, "humeur_0_5": 4},
+    ]
+    deltas = np.zeros((len(scenarios), len(RAW_COLUMNS)))
+    for i, delta in enumerate(scenarios):
+        for metric, value in delta.items():
+            deltas[i, RAW_COLUMNS.index(metric)] = value
+
+    features = scenario_features(raw_matrix(DAYS), deltas, sustained)
+
+    for i, delta in enumerate(scenarios):
+        days = _shifted(DAYS, delta, 3 if sustained else 1)
+        np.testing.assert_allclose(features[i], build_features(days[0], days)[0])
@@ -0,0 +1,94 @@
+"""
+Journal des requêtes lentes : empreintes et détection des parcours complets
+"""
+
+import json
+import sqlite3
+import time
+
+import pytest
+
+from backend import config, slow_queries
+from backend.database import Dialect, MySQLDialect, SQLiteStorage
+
+
+def _plan(sql: str):
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, age INTEGER, objectif TEXT)")
+    conn.execute("CREATE TABLE daily_data (id INTEGER PRIMARY KEY, user_id INTEGER, date TEXT)")
+    conn.execute("CREATE INDEX idx_users_age ON users (age, id)")
+    conn.execute("CREATE INDEX idx_daily_data_user_date ON daily_data (user_id, date)")
+    try:
+        return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize("sql, expected", [
+    ("SELECT * FROM users", ["users"]),
+    ("SELECT * FROM users u WHERE objectif = 'x'", ["u"]),
+    ("SELECT * FROM users WHERE age = 30", []),
+    ("SELECT * FROM daily_data WHERE user_id = 1 AND date >= '2025-01-01'", []),
+    ("SELECT COUNT(*) FROM users", []),
+    # Lignes constantes et sous-requêtes : aucune table parcourue
+    ("SELECT 1", []),
+    ("SELECT * FROM (SELECT 1 AS a UNION ALL SELECT 2) q", []),
+    ("SELECT id FROM (SELECT id, ROW_NUMBER() OVER (ORDER BY id DESC) AS n FROM daily_data) AS ranked "
+     "WHERE n > 3", ["daily_data"]),
+])
+def test_sqlite_full_scans(sql, expected):
+    assert Dialect().full_scans(_plan(sql)) == expected
+
+
+def test_sqlite_legacy_plan_format():
+    plan = ["SCAN TABLE users AS u", "SCAN TABLE daily_data USING INDEX idx", "SCAN SUBQUERY 1",
+            "SCAN CONSTANT ROW"]
+    assert Dialect().full_scans(plan) == ["users"]
+
+
+def test_mysql_full_scans():
+    dialect = MySQLDialect()
+    plan = dialect.plan_details([
+        {"table": "users", "type": "ALL", "key": None, "rows": 1000},
+        {"table": "daily_data", "type": "ref", "key": "idx_daily_data_user_date", "rows": 30},
+    ])
+    assert dialect.full_scans(plan) == ["users"]
+
+
+def test_fingerprint_ignores_literals_and_in_lists():
+    a = slow_queries.fingerprint("SELECT * FROM t WHERE id IN (?, ?, ?) AND name = 'a'  AND n = 3")
+    b = slow_queries.fingerprint("SELECT *   FROM t WHERE id IN (?, ?) AND name = 'bob' AND n = 42")
+    assert a == b
+    assert a[1] == "SELECT * FROM t WHERE id IN (?+) AND name = ? AND n = ?"
+
+
+def test_params_shape_never_keeps_values():
+    assert slow_queries.params_shape((1, "secret", None), many=4) == {
+        "count": 3, "types": ["int", "str", "NoneType"], "rows": 4,
+    }
+
+
+def test_scan_paid_in_fetchall_is_logged(tmp_path, monkeypatch):
+    conn = SQLiteStorage(tmp_path / "scan.db").connect()
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY)")
+    conn.cursor().executemany("INSERT INTO t (id) VALUES (?)", [(i,) for i in range(5)])
+    # 20 ms par ligne : execute ne calcule que la première, le reste se paie dans fetchall
+    conn.raw.create_function("slow", 1, lambda v: time.sleep(0.02) or v)
+    monkeypatch.setattr(slow_queries, "threshold_s", 0.06)
+    slow_queries.reset()
+
+    cursor = conn.cursor()
+    started = time.perf_counter()
+    cursor.execute("SELECT slow(id) AS v FROM t WHERE id >= ?", (0,))
+    assert time.perf_counter() - started < 0.06
+    assert slow_queries.snapshot()["recent"] == []
+    assert len(cursor.fetchall()) == 5
+    conn.close()
+
+    recent = slow_queries.snapshot()["recent"]
+    assert [entry["query"] for entry in recent] == ["SELECT slow(id) AS v FROM t WHERE id >= ?"]
+    assert recent[0]["elapsed_ms"] >= 90
+    with open(config.SLOW_QUERY_LOG, encoding="utf-8") as f:
+        logged = [json.loads(line) for line in f]
+    assert logged[-1]["fingerprint"] == recent[0]["fingerprint"]
+    slow_queries.reset()
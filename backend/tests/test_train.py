@@ -0,0 +1,156 @@
+"""
+Rafraîchissement incrémental : fenêtre glissante d'arbres, filigrane et promotion ;
+séries synthétiques indépendantes du découpage en blocs
+"""
+
+import json
+from datetime import date, timedelta
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+from backend import database
+from backend.database import SQLiteStorage, init_db
+from backend.ml import distill, train
+from backend.models import DailyDataCreate
+from backend.routers.data import insert_daily_data
+
+
+def _dataset(n, seed):
+    rng = np.random.default_rng(seed)
+    X = rng.random((n, 7))
+    return X, X @ np.arange(1, 8) * 10
+
+
+def _forest(n_estimators=5):
+    X, y = _dataset(100, 0)
+    return RandomForestRegressor(n_estimators=n_estimators, max_depth=4, random_state=42).fit(X, y)
+
+
+def test_refresh_forest_keeps_size_and_drops_oldest_trees():
+    model = _forest()
+    original = list(model.estimators_)
+    X, y = _dataset(60, 1)
+
+    train.refresh_forest(model, X, y, n_trees=2, random_state=43)
+
+    assert len(model.estimators_) == 5
+    assert model.n_estimators == 5
+    assert model.estimators_[:3] == original[2:]
+    assert not set(map(id, model.estimators_[3:])) & set(map(id, original))
+    assert model.predict(X).shape == (60,)
+
+
+def test_refresh_forest_seeds_differ_between_refreshes():
+    X, y = _dataset(60, 1)
+    first = train.refresh_forest(_forest(), X, y, n_trees=2, random_state=43)
+    second = train.refresh_forest(_forest(), X, y, n_trees=2, random_state=44)
+    same = train.refresh_forest(_forest(), X, y, n_trees=2, random_state=43)
+
+    seeds = lambda model: [tree.random_state for tree in model.estimators_[3:]]
+    assert seeds(first) != seeds(second)
+    assert seeds(first) == seeds(same)
+
+
+def test_synthetic_series_do_not_depend_on_chunk_size():
+    def series(chunk_users):
+        chunks = list(train.iter_user_series(10, 14, seed=5, chunk_users=chunk_users))
+        return {key: np.concatenate([cols[key] for cols in chunks]) for key in chunks[0]}
+
+    reference = series(10)
+    for chunk_users in (1, 3, 4):
+        other = series(chunk_users)
+        assert other.keys() == reference.keys()
+        for key in reference:
+            np.testing.assert_array_equal(other[key], reference[key])
+    # Un utilisateur généré seul a la même série qu'au sein de la population
+    alone = train.generate_user_series(1, 14, seed=5, first_user=7)
+    np.testing.assert_array_equal(alone["sommeil_h"], reference["sommeil_h"][7 * 14:8 * 14])
+    assert not np.array_equal(series(10)["pas"], next(train.iter_user_series(10, 14, seed=6))["pas"])
+
+
+@pytest.fixture
+def db():
+    """Base des tests (DB_SHARDS=1) avec un utilisateur"""
+    init_db()
+    conn = database.get_connection(shard=0)
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM daily_data")
+    cursor.execute("INSERT INTO users (age, genre, taille_cm, poids_kg) VALUES (30, 'F', 165, 60)")
+    user_id = cursor.lastrowid
+    conn.commit()
+    yield conn, user_id
+    conn.close()
+
+
+def _ingest(conn, user_id, day, sommeil_h):
+    row = insert_daily_data(conn.cursor(), DailyDataCreate(
+        user_id=user_id, date=day, sommeil_h=sommeil_h, pas=8000, sport_min=30, calories=2200,
+        humeur_0_5=3, stress_0_5=2, fc_repos=62
+    ))
+    conn.commit()
+    return row
+
+
+def test_corrected_day_is_above_watermark(db):
+    conn, user_id = db
+    start = date(2024, 3, 1)
+    for offset in range(5):
+        _ingest(conn, user_id, start + timedelta(days=offset), 7)
+    watermark = train.current_watermark()
+    # Filigrane d'avant updated_at (seulement les ids) : toujours accepté
+    assert train.load_rows_since({"shards": 1, "daily_data_id": watermark["daily_data_id"]})[0] == []
+
+    corrected = _ingest(conn, user_id, start + timedelta(days=1), 5)
+    rows, new_watermark = train.load_rows_since(watermark)
+
+    assert corrected["id"] <= watermark["daily_data_id"][0]
+    assert corrected["id"] in [row["id"] for row in rows]
+    assert [row["sommeil_h"] for row in rows if row["id"] == corrected["id"]] == [5]
+    assert new_watermark["daily_data_id"] == watermark["daily_data_id"]
+    assert new_watermark["updated_at"][0] >= watermark["updated_at"][0]
+
+
+def test_init_db_adds_updated_at_to_existing_database(tmp_path):
+    storage = SQLiteStorage(tmp_path / "legacy.db")
+    conn = storage.connect()
+    conn.execute("CREATE TABLE daily_data (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, "
+                 "date TEXT NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)")
+    conn.execute("INSERT INTO daily_data (user_id, date) VALUES (1, '2024-01-01')")
+    conn.commit()
+    conn.close()
+
+    init_db(storage)
+
+    conn = storage.connect()
+    cursor = conn.cursor()
+    assert storage.column_exists(cursor, "daily_data", "updated_at")
+    assert storage.index_exists(cursor, "daily_data", "idx_daily_data_updated")
+    assert cursor.execute("SELECT updated_at FROM daily_data").fetchone()["updated_at"] is None
+    conn.close()
+
+
+def test_rejected_refresh_leaves_model_and_manifest_unchanged(db, tmp_path, monkeypatch):
+    conn, user_id = db
+    monkeypatch.setattr(train, "MODEL_PATH", str(tmp_path / "model.pkl"))
+    monkeypatch.setattr(distill, "MANIFEST_PATH", str(tmp_path / "manifest.json"))
+    model = _forest()
+    training = train.promote(model, {"mode": "full", "watermark": train.current_watermark()})
+    manifest = (tmp_path / "manifest.json").read_text()
+    trees = [tree.random_state for tree in joblib.load(train.MODEL_PATH).estimators_]
+
+    start = date(2024, 1, 1)
+    for offset in range(30):
+        _ingest(conn, user_id, start + timedelta(days=offset), 5 + offset % 4)
+
+    # Tolérance négative : aucune forêt rafraîchie ne peut être promue
+    report = train.refresh_model(n_trees=2, min_rows=10, tolerance=-1.0)
+
+    assert report["new_rows"] == 30
+    assert not report["promoted"]
+    assert report["reason"] == "MSE de validation dégradée"
+    assert (tmp_path / "manifest.json").read_text() == manifest
+    assert json.loads(manifest)["training"]["version"] == training["version"]
+    assert [tree.random_state for tree in joblib.load(train.MODEL_PATH).estimators_] == trees
@@ -0,0 +1,50 @@
+"""
+Cache d'existence des utilisateurs : un utilisateur créé par un autre worker est vu aussitôt
+"""
+
+import pytest
+
+from backend import database
+from backend.database import SQLiteStorage, init_db
+from backend.user_cache import UserCache
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    storage = SQLiteStorage(tmp_path / "users.db")
+    init_db(storage)
+    monkeypatch.setattr(database, "storages", [storage])
+    return storage
+
+
+def _create_user(storage):
+    """Création par un autre processus : le cache testé n'en est pas informé"""
+    conn = storage.connect()
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO users (age, genre, taille_cm, poids_kg) VALUES (30, 'F', 165, 60)")
+    conn.commit()
+    user_id = cursor.lastrowid
+    conn.close()
+    return user_id
+
+
+def test_default_does_not_remember_missing_users(storage):
+    cache = UserCache(max_size=10, missing_ttl_s=0)
+    assert not cache.exists(1)
+
+    assert _create_user(storage) == 1
+    assert cache.exists(1)
+    assert cache.exists(1)
+    assert cache.snapshot()["lookups"] == 2
+    assert cache.snapshot()["missing"] == 0
+
+
+def test_missing_ttl_remembers_absences(storage):
+    cache = UserCache(max_size=10, missing_ttl_s=60)
+    assert not cache.exists(1)
+    _create_user(storage)
+    # Absence mémorisée : réservé à un seul worker, où add() l'invalide à la création
+    assert not cache.exists(1)
+    cache.add(1)
+    assert cache.exists(1)
+    assert cache.snapshot()["lookups"] == 1
@@ -0,0 +1,133 @@
+"""
+File d'écriture : une opération en échec n'annule que ses propres écritures,
+les autres opérations du même commit groupé sont validées ; une connexion
+indisponible fait échouer le lot sans arrêter le thread
+"""
+
+import sqlite3
+import threading
+
+import pytest
+
+from backend.database import SQLiteStorage, init_db
+from backend.writer import WriteQueue
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = SQLiteStorage(tmp_path / "writer.db")
+    init_db(storage)
+    return storage
+
+
+def _insert_user(cursor, age: int):
+    cursor.execute("INSERT INTO users (age, genre, taille_cm, poids_kg) VALUES (?, 'F', 165, 60)", (age,))
+    return cursor.lastrowid
+
+
+def _insert_then_fail(cursor, age: int):
+    _insert_user(cursor, age)
+    raise ValueError("échec volontaire")
+
+
+def _ages(storage):
+    conn = storage.connect_reader()
+    try:
+        return sorted(row["age"] for row in conn.execute("SELECT age FROM users").fetchall())
+    finally:
+        conn.close()
+
+
+def test_failed_op_is_rolled_back_alone(storage):
+    writer = WriteQueue(storage.connect_writer, max_batch=64)
+    running, gate = threading.Event(), threading.Event()
+
+    def blocking(cursor):
+        running.set()
+        gate.wait(5)
+        return _insert_user(cursor, 20)
+
+    # Première opération bloquante : les suivantes s'accumulent et partent dans un seul commit
+    first = writer.submit(blocking)
+    assert running.wait(5)
+    futures = [writer.submit(_insert_user, 21), writer.submit(_insert_then_fail, 99),
+               writer.submit(_insert_user, 22), writer.submit(_insert_then_fail, 98),
+               writer.submit(_insert_user, 23)]
+    gate.set()
+
+    first.result(timeout=5)
+    assert futures[0].result(timeout=5) > 0
+    with pytest.raises(ValueError):
+        futures[1].result(timeout=5)
+    with pytest.raises(ValueError):
+        futures[3].result(timeout=5)
+    assert futures[4].result(timeout=5) > 0
+    writer.stop()
+
+    assert _ages(storage) == [20, 21, 22, 23]
+    assert writer.stats["commits"] == 2
+    assert writer.stats["max_batch"] == 5
+    assert writer.stats["failed_ops"] == 2
+    assert writer.stats["failed_commits"] == 0
+
+
+def test_results_are_released_after_commit(storage):
+    writer = WriteQueue(storage.connect_writer, max_batch=8)
+    user_id = writer.execute(_insert_user, 40)
+    # Visible par une connexion de lecture dès le retour de execute
+    conn = storage.connect_reader()
+    try:
+        assert conn.execute("SELECT age FROM users WHERE id = ?", (user_id,)).fetchone()["age"] == 40
+    finally:
+        conn.close()
+    writer.stop()
+
+
+def test_connection_error_fails_batch_and_is_retried(storage):
+    attempts = []
+
+    def connect():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise sqlite3.OperationalError("serveur injoignable")
+        return storage.connect_writer()
+
+    writer = WriteQueue(connect, max_batch=8)
+    with pytest.raises(sqlite3.OperationalError, match="injoignable"):
+        writer.execute(_insert_user, 30)
+    # Thread toujours vivant : nouvelle tentative de connexion au lot suivant
+    assert writer.execute(_insert_user, 31) > 0
+    writer.stop()
+
+    assert _ages(storage) == [31]
+    assert len(attempts) == 2
+    assert writer.stats["failed_connects"] == 1
+
+
+def test_connection_is_pinged_before_each_batch(storage):
+    pings, connections = [], []
+
+    def connect():
+        conn = storage.connect_writer()
+
+        def ping():
+            pings.append(conn)
+            # Connexion perdue (wait_timeout) constatée au deuxième lot
+            if len(pings) == 1:
+                raise sqlite3.OperationalError("connexion perdue")
+
+        conn.ping = ping
+        connections.append(conn)
+        return conn
+
+    writer = WriteQueue(connect, max_batch=8)
+    writer.execute(_insert_user, 40)
+    with pytest.raises(sqlite3.OperationalError, match="perdue"):
+        writer.execute(_insert_user, 41)
+    writer.execute(_insert_user, 42)
+    writer.execute(_insert_user, 43)
+    writer.stop()
+
+    assert _ages(storage) == [40, 42, 43]
+    assert len(connections) == 2
+    assert pings == [connections[0], connections[1]]
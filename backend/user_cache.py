@@ -0,0 +1,91 @@
+"""
+Cache en mémoire de l'existence des utilisateurs
+
+Les routes par utilisateur vérifiaient l'existence de l'utilisateur par une
+requête dédiée avant tout travail. Les utilisateurs ne sont jamais supprimés :
+un id trouvé une fois reste valide, et la vérification ne coûte plus qu'une
+recherche dans un dictionnaire (taille bornée, éviction des moins récents).
+
+Par défaut seules les présences sont mémorisées : un id inconnu est recherché
+à chaque requête. Avec plusieurs workers, une absence mémorisée ferait refuser
+(404) un utilisateur tout juste créé par un autre worker, y compris sur les
+routes d'écriture. ELEVAI_USER_CACHE_MISSING_TTL_S > 0 mémorise aussi les
+absences, pour un seul worker face à un client insistant sur un id inconnu ;
+la création d'un utilisateur invalide alors son entrée dans ce processus.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict
+
+from backend import config
+from backend.database import get_read_connection
+
+
+class UserCache:
+    def __init__(self, max_size: int, missing_ttl_s: float):
+        self.max_size = max_size
+        self.missing_ttl_s = missing_ttl_s
+        self._known = OrderedDict()
+        self._missing: Dict[int, float] = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "lookups": 0}
+
+    def exists(self, user_id: int) -> bool:
+        """L'utilisateur existe-t-il ? N'interroge sa base qu'en l'absence d'entrée valide"""
+        with self._lock:
+            if user_id in self._known:
+                self._known.move_to_end(user_id)
+                self.stats["hits"] += 1
+                return True
+            expires = self._missing.get(user_id)
+            if expires is not None:
+                if expires > time.monotonic():
+                    self.stats["hits"] += 1
+                    return False
+                del self._missing[user_id]
+            self.stats["misses"] += 1
+
+        conn = get_read_connection(user_id)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id FROM users WHERE id = ?", (user_id,))
+            found = cursor.fetchone() is not None
+        finally:
+            conn.close()
+
+        with self._lock:
+            self.stats["lookups"] += 1
+            if found:
+                self._remember(user_id)
+            elif self.missing_ttl_s > 0:
+                if len(self._missing) >= self.max_size:
+                    self._missing.clear()
+                self._missing[user_id] = time.monotonic() + self.missing_ttl_s
+        return found
+
+    def add(self, user_id: int) -> None:
+        """Enregistre un utilisateur créé (invalide une absence mémorisée)"""
+        with self._lock:
+            self._missing.pop(user_id, None)
+            self._remember(user_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._known.clear()
+            self._missing.clear()
+
+    def _remember(self, user_id: int) -> None:
+        self._known[user_id] = True
+        self._known.move_to_end(user_id)
+        if len(self._known) > self.max_size:
+            self._known.popitem(last=False)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {"known": len(self._known), "missing": len(self._missing),
+                    "max_size": self.max_size, **self.stats}
+
+
+users = UserCache(config.USER_CACHE_SIZE, config.USER_CACHE_MISSING_TTL_S)
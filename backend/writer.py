@@ -0,0 +1,196 @@
+"""
+File d'écriture à écrivain unique
+
+SQLite n'autorise qu'un écrivain à la fois : plutôt que de laisser chaque
+route se disputer le verrou, un thread dédié possède la seule connexion en
+écriture et exécute les opérations mises en file (ingestion, création
+d'utilisateur, persistance des analyses, compaction).
+
+Les opérations en attente sont regroupées dans une même transaction
+(group commit) ; chacune s'exécute dans un SAVEPOINT, de sorte qu'un échec
+n'annule que sa propre opération. Une opération est une fonction
+op(cursor, *args) dont la valeur de retour est transmise à l'appelant une
+fois le commit effectué.
+
+La connexion est ouverte par le thread et vérifiée avant chaque lot (MySQL
+ferme les connexions inactives) ; si elle ne peut être établie, l'erreur est
+transmise aux opérations du lot et la connexion est retentée au lot suivant.
+
+Avec plusieurs bases (DB_SHARDS), chaque base a son propre écrivain :
+get_writer(user_id) retourne celui de la base de l'utilisateur.
+"""
+
+import queue
+import sys
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, List
+
+from backend import config
+from backend.database import SHARDS, get_storage, shard_of
+
+_STOP = object()
+
+
+class WriteQueue:
+    def __init__(self, connect: Callable, max_batch: int, name: str = "elevai-writer"):
+        self._connect = connect
+        self.name = name
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.stats = {"ops": 0, "failed_ops": 0, "commits": 0, "failed_commits": 0,
+                      "failed_connects": 0, "max_batch": 0}
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def submit(self, op: Callable, *args) -> Future:
+        """Met une opération en file et retourne immédiatement son Future"""
+        self.start()
+        future = Future()
+        self._queue.put((op, args, future))
+        return future
+
+    def execute(self, op: Callable, *args, timeout: float = 30):
+        """Met une opération en file et attend son commit ; relève son exception éventuelle"""
+        return self.submit(op, *args).result(timeout=timeout)
+
+    def stop(self, timeout: float = 10) -> None:
+        """Termine les opérations en file puis arrête le thread"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def snapshot(self) -> Dict:
+        return {"queued": self._queue.qsize(), **self.stats}
+
+    def _run(self) -> None:
+        conn = None
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _STOP:
+                    return
+                batch = [item]
+                stopping = False
+                while len(batch) < self.max_batch:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+                conn = self._checked(conn, batch)
+                if conn is not None:
+                    self._commit_batch(conn, batch)
+                if stopping:
+                    return
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def _checked(self, conn, batch):
+        """Connexion prête pour le lot, ou None après avoir transmis l'erreur de connexion au lot"""
+        try:
+            if conn is None:
+                return self._connect()
+            conn.ping()
+            return conn
+        except Exception as e:
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            self.stats["failed_connects"] += 1
+            print(f"Connexion d'écriture indisponible ({len(batch)} opérations): {e}", file=sys.stderr)
+            for _, _, future in batch:
+                future.set_exception(e)
+            return None
+
+    def _commit_batch(self, conn, batch) -> None:
+        cursor = conn.cursor()
+        results = []
+        try:
+            cursor.execute(conn.dialect.begin)
+            for index, (op, args, future) in enumerate(batch):
+                savepoint = f"op_{index}"
+                cursor.execute(f"SAVEPOINT {savepoint}")
+                try:
+                    result = op(cursor, *args)
+                except Exception as e:
+                    cursor.execute(f"ROLLBACK TO SAVEPOINT {savepoint}")
+                    cursor.execute(f"RELEASE SAVEPOINT {savepoint}")
+                    self.stats["failed_ops"] += 1
+                    print(f"Échec d'une opération d'écriture ({getattr(op, '__name__', op)}): {e}",
+                          file=sys.stderr)
+                    results.append((future, None, e))
+                    continue
+                cursor.execute(f"RELEASE SAVEPOINT {savepoint}")
+                results.append((future, result, None))
+            conn.commit()
+        except Exception as e:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            self.stats["failed_commits"] += 1
+            print(f"Échec du commit groupé ({len(batch)} opérations): {e}", file=sys.stderr)
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.stats["ops"] += len(batch)
+        self.stats["commits"] += 1
+        self.stats["max_batch"] = max(self.stats["max_batch"], len(batch))
+        # Les appelants ne sont libérés qu'une fois le commit effectué
+        for future, result, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+_writers: Dict[int, WriteQueue] = {}
+_writer_lock = threading.Lock()
+
+
+def get_writer(user_id: int = None, shard: int = None) -> WriteQueue:
+    """Écrivain de la base de l'utilisateur (ou de la base `shard`)"""
+    if shard is None:
+        if user_id is not None:
+            shard = shard_of(user_id)
+        elif len(SHARDS) > 1:
+            raise ValueError("Écrivain ambigu : préciser user_id ou shard (DB_SHARDS > 1)")
+        else:
+            shard = 0
+    with _writer_lock:
+        writer = _writers.get(shard)
+        if writer is None:
+            name = "elevai-writer" if len(SHARDS) == 1 else f"elevai-writer-{shard}"
+            writer = _writers[shard] = WriteQueue(get_storage(shard).connect_writer,
+                                                  config.WRITER_MAX_BATCH, name)
+        return writer
+
+
+def get_writers() -> List[WriteQueue]:
+    """Écrivains de toutes les bases"""
+    return [get_writer(shard=shard) for shard in SHARDS]
+
+
+def stop_writers() -> None:
+    with _writer_lock:
+        writers = list(_writers.values())
+    for writer in writers:
+        writer.stop()
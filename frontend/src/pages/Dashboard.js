@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from "react";
+import React, { useState, useEffect, useRef } from "react";
 import axios from "axios";
 import ScoreCard from "../components/ScoreCard";
 import RadarCard from "../components/RadarCard";
@@ -16,6 +16,8 @@ import {
 } from "chart.js";
 
 const API_URL = "http://localhost:8000";
+// Délai d'attente de l'analyse poussée par SSE après une ingestion avant de la recharger
+const ANALYSIS_EVENT_TIMEOUT_MS = 3000;
 
 ChartJS.register(
   CategoryScale,
@@ -45,13 +47,39 @@ function Dashboard({ user }) {
     fc_repos: ""
   });
 
+  const eventsRef = useRef(null);
+  const analysisTimerRef = useRef(null);
+
   useEffect(() => {
     if (user) fetchData();
   }, [user]);
 
-  const fetchData = async () => {
-    setLoading(true);
-    setError(null);
+  // Flux SSE : l'analyse recalculée et la journée enregistrée arrivent après chaque ingestion
+  useEffect(() => {
+    if (!user || typeof EventSource === "undefined") return;
+    const events = new EventSource(`${API_URL}/events/${user.id}`);
+    events.addEventListener("data", (e) => mergeHistoryRow(JSON.parse(e.data)));
+    events.addEventListener("analysis", (e) => {
+      clearTimeout(analysisTimerRef.current);
+      setAnalysis(JSON.parse(e.data));
+    });
+    eventsRef.current = events;
+    return () => {
+      events.close();
+      eventsRef.current = null;
+      clearTimeout(analysisTimerRef.current);
+    };
+  }, [user]);
+
+  // Remplace la journée de même date ou l'ajoute, l'historique restant trié du plus récent au plus ancien
+  const mergeHistoryRow = (row) => {
+    setHistory((previous) =>
+      [row, ...previous.filter((item) => item.date !== row.date)]
+        .sort((a, b) => new Date(b.date) - new Date(a.date))
+    );
+  };
+
+  const fetchAnalysis = async () => {
     try {
       const analysisResponse = await axios.get(`${API_URL}/analyze/${user.id}`);
       setAnalysis(analysisResponse.data);
@@ -59,6 +87,12 @@ function Dashboard({ user }) {
       if (err.response?.status === 404) setAnalysis(null);
       else setError(err.response?.data?.detail || "Erreur lors du chargement de l'analyse");
     }
+  };
+
+  const fetchData = async () => {
+    setLoading(true);
+    setError(null);
+    await fetchAnalysis();
 
     try {
       const historyResponse = await axios.get(`${API_URL}/data/${user.id}`);
@@ -98,11 +132,20 @@ function Dashboard({ user }) {
     };
 
     try {
-      await axios.post(`${API_URL}/data`, payload, {
+      const response = await axios.post(`${API_URL}/data`, payload, {
         headers: { "Content-Type": "application/json" }
       });
       alert("Données journalières ajoutées !");
-      fetchData();
+      mergeHistoryRow(response.data);
+      // Sans flux SSE ouvert, l'analyse ne sera pas poussée : rechargement complet.
+      // Flux ouvert : le hub est propre à chaque worker, l'ingestion a pu être traitée
+      // par un autre ; sans événement "analysis" dans le délai, l'analyse est rechargée
+      const events = eventsRef.current;
+      if (!events || events.readyState !== events.OPEN) fetchData();
+      else {
+        clearTimeout(analysisTimerRef.current);
+        analysisTimerRef.current = setTimeout(fetchAnalysis, ANALYSIS_EVENT_TIMEOUT_MS);
+      }
       setDailyForm({
         date: "",
         sommeil_h: "",
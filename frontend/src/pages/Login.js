@@ -6,6 +6,7 @@ const API_URL = "http://localhost:8000";
 
 function Login({ setUser }) {
   const [users, setUsers] = useState([]);
+  const [nextBefore, setNextBefore] = useState(null);
   const [loading, setLoading] = useState(true);
   const [showCreateForm, setShowCreateForm] = useState(false);
   const [formData, setFormData] = useState({
@@ -21,10 +22,14 @@ function Login({ setUser }) {
     fetchUsers();
   }, []);
 
-  const fetchUsers = async () => {
+  // Pages d'utilisateurs, des plus récents aux plus anciens
+  const fetchUsers = async (before = null) => {
     try {
-      const response = await axios.get(`${API_URL}/users`);
-      setUsers(response.data);
+      const response = await axios.get(`${API_URL}/users`, {
+        params: before ? { before } : {}
+      });
+      setUsers((previous) => (before ? [...previous, ...response.data.items] : response.data.items));
+      setNextBefore(response.data.next_before);
     } catch (error) {
       console.error("Erreur lors du chargement des utilisateurs:", error);
     } finally {
@@ -124,6 +129,11 @@ function Login({ setUser }) {
               </li>
             ))}
           </ul>
+          {nextBefore && (
+            <button className="btn" onClick={() => fetchUsers(nextBefore)}>
+              Afficher plus d'utilisateurs
+            </button>
+          )}
         </div>
       )}
 
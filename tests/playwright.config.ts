@@ -1,5 +1,10 @@
 import { defineConfig, devices } from '@playwright/test';
 
+// Matrice de stockage : DB_BACKEND=sqlite (défaut) ou DB_BACKEND=mysql (voir run-backends.js)
+const dbBackend = process.env.DB_BACKEND || 'sqlite';
+// Backend imposé : l'API doit être démarrée avec lui, jamais une API déjà lancée réutilisée
+const apiReuse = !process.env.CI && !process.env.DB_BACKEND;
+
 export default defineConfig({
   testDir: './e2e',
   fullyParallel: true,
@@ -23,7 +28,11 @@ export default defineConfig({
     {
       command: 'cd ../backend && python -m uvicorn app:app --reload --port 8000',
       url: 'http://localhost:8000',
-      reuseExistingServer: !process.env.CI,
+      reuseExistingServer: apiReuse,
+      env: {
+        DB_BACKEND: dbBackend,
+        ...(dbBackend === 'mysql' ? { DB_NAME: process.env.DB_NAME || 'elevai_test' } : {}),
+      },
     },
     {
       command: 'cd ../frontend && npm start',
@@ -0,0 +1,35 @@
+// Lance les tests E2E sur un ou plusieurs backends de stockage, l'un après l'autre
+// Utilisation : node run-backends.js sqlite mysql [options playwright]
+//
+// Chaque backend démarre sa propre API (DB_BACKEND transmis par playwright.config.ts) :
+// une API déjà lancée sur le port 8000 ferait échouer le test au lieu d'être réutilisée,
+// sinon les deux passes testeraient silencieusement le même backend.
+const { spawnSync } = require('child_process');
+
+const BACKENDS = ['sqlite', 'mysql'];
+const args = process.argv.slice(2);
+const backends = args.filter((arg) => BACKENDS.includes(arg));
+const playwrightArgs = args.filter((arg) => !BACKENDS.includes(arg));
+
+if (backends.length === 0) {
+  console.error(`Préciser au moins un backend : ${BACKENDS.join(', ')}`);
+  process.exit(2);
+}
+
+const failed = [];
+for (const backend of backends) {
+  console.log(`\n=== Tests E2E, DB_BACKEND=${backend}`);
+  const result = spawnSync('npx', ['playwright', 'test', ...playwrightArgs], {
+    stdio: 'inherit',
+    shell: process.platform === 'win32',
+    env: { ...process.env, DB_BACKEND: backend },
+  });
+  if (result.status !== 0) {
+    failed.push(backend);
+  }
+}
+
+if (failed.length > 0) {
+  console.error(`\nÉchec sur : ${failed.join(', ')}`);
+  process.exit(1);
+}